@@ -1,21 +1,27 @@
 import streamlit as st
-import requests
-from bs4 import BeautifulSoup
 import pandas as pd
-from datetime import datetime, timedelta
-import plotly.express as px
-import os
+import tempfile
 import time
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import cloudscraper
-import json
-from st_aggrid import AgGrid, GridOptionsBuilder
+from datetime import datetime, timedelta
+# UI-Bibliotheken (plotly, st_aggrid) werden erst in den Funktionen geladen, die sie brauchen
 
-# ========== KONFIGURATION ==========
-TIMEZONE = None
-DATA_DIR = "preis_daten"
-os.makedirs(DATA_DIR, exist_ok=True)
+from preis_checker.downsampling import duenne_aus
+from preis_checker.engine import AUSFALLGRUENDE
+from preis_checker.export import FORMATE, exportiere
+from preis_checker.historie import Historie
+from preis_checker.index import PreisIndex
+from preis_checker.konfiguration import (
+    DATEIPFAD, EXPORT_MAX_ZEILEN, METRIKEN_JSON_PFAD, METRIKEN_PROM_PFAD, SPALTENPFAD, STATUSPFAD, alle_produkte, produkte_5080,
+)
+from preis_checker.alarme import REGELTYPEN
+from preis_checker.metriken import METRIKEN, lade_schnappschuss
+from preis_checker.planer import merke_interesse
+from preis_checker.rollups import GRANULARITAET_FUER_TAGE
+from preis_checker.speicher import (
+    datenstand, hat_pyarrow, lade_alarme, lade_marktbild, lade_regeln, lade_statistik, lade_status, lade_tabelle,
+    lege_regel_an, loesche_regel,
+)
+from preis_checker.tabelle import bereite_tabelle_vor, filtere, hole_seite
 
 # ========== DESIGN-EINSTELLUNGEN ==========
 primary_color = "#4B8DFF"  # Blau statt Rot für technisches Thema
@@ -24,205 +30,228 @@ bg_color = "#F0F2F6"
 text_color = "#333"
 font = "Helvetica Neue, sans-serif"
 
-st.set_page_config(
-    page_title="RTX 5080 Preis-Tracker Pro",
-    page_icon="🖥️",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
-
-st.markdown(f"""
-    <style>
-        .main {{
-            background-color: {bg_color};
-            color: {text_color};
-            font-family: {font};
-        }}
-        .stButton>button {{
-            background-color: {primary_color};
-            color: white;
-            border-radius: 8px;
-            padding: 0.5rem 1rem;
-            transition: all 0.3s ease;
-            border: none;
-            box-shadow: 0 2px 5px rgba(0,0,0,0.1);
-        }}
-        .stButton>button:hover {{
-            background-color: #3A7BFF;
-            transform: translateY(-1px);
-            box-shadow: 0 4px 8px rgba(0,0,0,0.15);
-        }}
-        .stAlert {{
-            border-left: 4px solid {primary_color};
-        }}
-        .stProgress > div > div > div {{
-            background-color: {primary_color};
-        }}
-        h1, h2, h3 {{
-            font-family: 'Arial', sans-serif;
-            font-weight: 600;
-            color: #2c3e50;
-        }}
-        .css-1aumxhk {{
-            background-color: #FFF;
-            border-radius: 12px;
-            padding: 25px;
-            box-shadow: 0px 2px 15px rgba(0, 0, 0, 0.08);
-            margin-bottom: 20px;
-        }}
-        .timeframe-btn {{
-            margin: 5px !important;
-        }}
-        .price-card {{
-            background: linear-gradient(135deg, #f5f9ff 0%, #e0e9ff 100%);
-            border-radius: 12px;
-            padding: 20px;
-            margin-bottom: 20px;
-            box-shadow: 0 4px 12px rgba(0, 0, 0, 0.08);
-            transition: all 0.3s ease;
-            border-left: 4px solid {primary_color};
-        }}
-        .price-card:hover {{
-            transform: translateY(-3px);
-            box-shadow: 0 8px 16px rgba(0, 0, 0, 0.12);
-        }}
-        .price-change-positive {{
-            color: #e74c3c;
-            font-weight: bold;
-        }}
-        .price-change-negative {{
-            color: #27ae60;
-            font-weight: bold;
-        }}
-        .stTabs [data-baseweb="tab-list"] {{
-            gap: 10px;
-        }}
-        .stTabs [data-baseweb="tab"] {{
-            padding: 10px 20px;
-            border-radius: 8px 8px 0 0 !important;
-            background-color: #f0f2f6 !important;
-            transition: all 0.3s ease;
-        }}
-        .stTabs [aria-selected="true"] {{
-            background-color: {primary_color} !important;
-            color: white !important;
-        }}
-        .stDataFrame {{
-            border-radius: 10px;
-            box-shadow: 0 2px 10px rgba(0,0,0,0.05);
-        }}
-    </style>
-""", unsafe_allow_html=True)
-
-# ========== PRODUKTLISTEN ==========
-produkte_5080 = {
-    "Palit GeForce RTX 5080 GamingPro V1": "https://geizhals.at/gainward-geforce-rtx-5080-phoenix-v1-5615-ne75080s19t2-gb2031c-a3491334.html",
-    "Zotac GeForce RTX 5080": "https://geizhals.at/zotac-geforce-rtx-5080-v186817.html",
-    "INNO3D GeForce RTX 5080 X3": "https://geizhals.at/inno3d-geforce-rtx-5080-x3-n50803-16d7-176068n-a3382794.html",
-    "Gainward GeForce RTX 5080 Phoenix GS V1": "https://geizhals.at/gainward-geforce-rtx-5080-phoenix-v1-5615-ne75080s19t2-gb2031c-a3491334.html",
-    "Palit GeForce RTX 5080 GamingPro": "https://geizhals.at/palit-geforce-rtx-5080-gamingpro-ne75080019t2-gb2031a-a3382521.html",
-    "Manli Nebula GeForce RTX 5080": "https://geizhals.at/manli-nebula-geforce-rtx-5080-a3449904.html?hloc=eu&nocookie=1",
-    "MSI GeForce RTX 5080 16G Shadow 3X OC": "https://geizhals.at/msi-geforce-rtx-5080-16g-shadow-3x-oc-v531-003r-a3448293.html",
-    "Gigabyte GeForce RTX 5080 Gaming OC": "https://geizhals.at/gigabyte-geforce-rtx-5080-windforce-oc-sff-16g-gv-n5080wf3oc-16gd-a3381809.html",
-}
+# ========== DIAGRAMM-EINSTELLUNGEN ==========
+DIAGRAMM_BREITE = 1200        # Zielpunkte je Linie im sichtbaren Bereich (~Pixelbreite)
+MAX_DIAGRAMM_PUNKTE = 20_000  # Obergrenze aller ausgelieferten Punkte im Diagramm
+WEBGL_AB = 5_000              # Ab so vielen Punkten wird mit Scattergl (WebGL) gezeichnet
+MARKER_BIS = 200              # Marker nur bei wenigen Punkten je Linie
 
-# ========== FUNKTIONEN ==========
-@st.cache_data(ttl=3600, show_spinner="Scraping Preisdaten...")
-def robust_scrape(url, max_retries=3):
-    """Robuste Funktion zum Scrapen von Preisdaten mit Cloudflare-Umgehung"""
-    scraper = cloudscraper.create_scraper()
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
-                      '(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36'
-    }
-
-    for attempt in range(max_retries):
-        try:
-            res = scraper.get(url, headers=headers, timeout=15)
-            res.raise_for_status()
-            soup = BeautifulSoup(res.text, 'html.parser')
-
-            # Verbesserte Preisermittlung
-            preis_element = (
-                soup.find('strong', id='pricerange-min') or
-                soup.find('span', class_='price__amount') or
-                soup.find('span', class_='gh_price') or
-                soup.find('meta', {'itemprop': 'price'})
-            )
+def richte_seite_ein():
+    """Seitenkonfiguration und CSS; muss der erste Streamlit-Aufruf eines Laufs sein"""
+    st.set_page_config(
+        page_title="RTX 5080 Preis-Tracker Pro",
+        page_icon="🖥️",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
 
-            if preis_element:
-                preis_text = preis_element.get('content') if preis_element.name == 'meta' else preis_element.get_text(strip=True)
-                preis = float(''.join(c for c in preis_text if c.isdigit() or c in ',.').replace('.', '').replace(',', '.'))
-                datum = datetime.now(TIMEZONE)
-                
-                # Zusätzliche Infos sammeln
-                shop_element = soup.find('span', class_='gh_offer_shop') or soup.find('a', class_='offer__seller')
-                shop = shop_element.get_text(strip=True) if shop_element else "Unbekannt"
-                
-                return {
-                    'price': preis,
-                    'date': datum,
-                    'shop': shop,
-                    'url': url
-                }
-        except Exception as e:
-            print(f"Fehler bei Versuch {attempt + 1} für {url}: {e}")
-            time.sleep(2 ** attempt)  # Exponentielles Backoff
-
-    return None
-
-def speichere_daten(daten, dateipfad):
-    """Speichert Daten im JSON-Format mit Backup-System"""
-    try:
-        # Backup alter Daten falls vorhanden
-        if os.path.exists(dateipfad):
-            backup_path = f"{dateipfad}.bak"
-            with open(dateipfad, 'r') as f, open(backup_path, 'w') as b:
-                b.write(f.read())
-        
-        # Neue Daten speichern
-        with open(dateipfad, 'w') as f:
-            json.dump(daten, f, indent=2, default=str)
-    except Exception as e:
-        st.error(f"Fehler beim Speichern der Daten: {e}")
+    st.markdown(f"""
+        <style>
+            .main {{
+                background-color: {bg_color};
+                color: {text_color};
+                font-family: {font};
+            }}
+            .stButton>button {{
+                background-color: {primary_color};
+                color: white;
+                border-radius: 8px;
+                padding: 0.5rem 1rem;
+                transition: all 0.3s ease;
+                border: none;
+                box-shadow: 0 2px 5px rgba(0,0,0,0.1);
+            }}
+            .stButton>button:hover {{
+                background-color: #3A7BFF;
+                transform: translateY(-1px);
+                box-shadow: 0 4px 8px rgba(0,0,0,0.15);
+            }}
+            .stAlert {{
+                border-left: 4px solid {primary_color};
+            }}
+            .stProgress > div > div > div {{
+                background-color: {primary_color};
+            }}
+            h1, h2, h3 {{
+                font-family: 'Arial', sans-serif;
+                font-weight: 600;
+                color: #2c3e50;
+            }}
+            .css-1aumxhk {{
+                background-color: #FFF;
+                border-radius: 12px;
+                padding: 25px;
+                box-shadow: 0px 2px 15px rgba(0, 0, 0, 0.08);
+                margin-bottom: 20px;
+            }}
+            .timeframe-btn {{
+                margin: 5px !important;
+            }}
+            .price-card {{
+                background: linear-gradient(135deg, #f5f9ff 0%, #e0e9ff 100%);
+                border-radius: 12px;
+                padding: 20px;
+                margin-bottom: 20px;
+                box-shadow: 0 4px 12px rgba(0, 0, 0, 0.08);
+                transition: all 0.3s ease;
+                border-left: 4px solid {primary_color};
+            }}
+            .price-card:hover {{
+                transform: translateY(-3px);
+                box-shadow: 0 8px 16px rgba(0, 0, 0, 0.12);
+            }}
+            .price-change-positive {{
+                color: #e74c3c;
+                font-weight: bold;
+            }}
+            .price-change-negative {{
+                color: #27ae60;
+                font-weight: bold;
+            }}
+            .stTabs [data-baseweb="tab-list"] {{
+                gap: 10px;
+            }}
+            .stTabs [data-baseweb="tab"] {{
+                padding: 10px 20px;
+                border-radius: 8px 8px 0 0 !important;
+                background-color: #f0f2f6 !important;
+                transition: all 0.3s ease;
+            }}
+            .stTabs [aria-selected="true"] {{
+                background-color: {primary_color} !important;
+                color: white !important;
+            }}
+            .stDataFrame {{
+                border-radius: 10px;
+                box-shadow: 0 2px 10px rgba(0,0,0,0.05);
+            }}
+        </style>
+    """, unsafe_allow_html=True)
 
-def lade_daten(dateipfad):
-    """Lädt Daten aus JSON-Datei mit Fehlerbehandlung"""
+# ========== FUNKTIONEN ==========
+@st.cache_resource(show_spinner=False, max_entries=2)
+def lade_historie(dateipfad, stand):
+    """Lädt die Historie einmal pro Datenstand als kompakte Spalten, geteilt von allen Sitzungen"""
+    spalten = ['product', 'shop', 'price', 'date', 'url']
     try:
-        if os.path.exists(dateipfad):
-            with open(dateipfad, 'r') as f:
-                daten = json.load(f)
-                
-                # Konvertiere String-Datumsangaben zurück zu datetime-Objekten
-                for eintrag in daten:
-                    if 'date' in eintrag:
-                        eintrag['date'] = datetime.strptime(eintrag['date'], '%Y-%m-%d %H:%M:%S.%f')
-                
-                return daten
-        return []
+        historie = Historie.aus_tabelle(lade_tabelle(dateipfad, spalten=spalten, spaltenpfad=SPALTENPFAD))
     except Exception as e:
         st.error(f"Fehler beim Laden der Daten: {e}")
-        return []
+        return Historie.leer()
+    METRIKEN.setze('historie_zeilen', len(historie))
+    METRIKEN.setze('historie_bytes', historie.nbytes)
+    return historie
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def baue_preisindex(_historie, stand):
+    """Baut den Preisindex einmal pro Datenstand und teilt ihn zwischen allen Reruns"""
+    return PreisIndex(_historie)
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def lade_angebotsliste(dateipfad, stand, produkt):
+    """Alle Shop-Angebote eines Produkts aus dem jüngsten Marktbild"""
+    angebote = pd.DataFrame(lade_marktbild(dateipfad, produkt),
+                            columns=['shop', 'price', 'shipping', 'availability', 'date'])
+    angebote['gesamt'] = angebote['price'] + angebote['shipping'].fillna(0)
+    return angebote
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def lade_preisstatistik(dateipfad, stand, tage, stunde):
+    """Preisstatistik für den gewählten Zeitraum aus den vorab aggregierten Rollups"""
+    von = stunde - timedelta(days=tage)
+    kennzahlen = lade_statistik(dateipfad, GRANULARITAET_FUER_TAGE.get(tage, 'tag'), von=von)
+    stats = pd.DataFrame.from_dict(kennzahlen, orient='index',
+                                   columns=['min', 'max', 'mean', 'median', 'std', 'count'])
+    return stats.sort_index()
+
+def zeige_aktualisierungsstand(status):
+    """Zeigt an, wann der Hintergrund-Worker zuletzt Preise abgerufen hat"""
+    if not status:
+        st.warning("Noch kein Abruf erfolgt. Starte den Hintergrund-Worker mit "
+                   "`python -m preis_checker worker`.")
+        return
 
-def berechne_preisänderung(aktueller_preis, historische_daten, tage):
+    text = (f"🕒 Letzte Aktualisierung: {status['letzte_aktualisierung']:%d.%m.%Y %H:%M} Uhr | "
+            f"{status.get('neue_preise', 0)} neue Preise")
+    if status.get('veraltet'):
+        ausfälle = ", ".join(f"{name} ({AUSFALLGRUENDE.get(eintrag['grund'], eintrag['grund'])})"
+                             for name, eintrag in status['veraltet'].items())
+        text += f" | ⚠️ Veraltet: {ausfälle}"
+    elif status.get('fehlgeschlagen'):
+        text += f" | ⚠️ Nicht erreichbar: {', '.join(status['fehlgeschlagen'])}"
+    st.caption(text)
+
+def aktuelle_stunde():
+    """Beginn der laufenden Stunde; als Teil der Cache-Schlüssel wandern Zeitfenster stündlich mit"""
+    return datetime.now().replace(minute=0, second=0, microsecond=0)
+
+def berechne_preisänderung(aktueller_preis, index, produkt, tage, bis=None):
     """Berechnet Preisänderung über einen bestimmten Zeitraum"""
-    if not historische_daten or len(historische_daten) < 2:
+    if index.anzahl(produkt) < 2:
         return None, None
     
-    cutoff_date = datetime.now() - timedelta(days=tage)
-    historische_preise = [d['price'] for d in historische_daten if d['date'] >= cutoff_date]
+    cutoff_date = (bis or datetime.now()) - timedelta(days=tage)
+    start_eintrag = index.erster_ab(produkt, cutoff_date)
     
-    if not historische_preise:
+    if start_eintrag is None:
         return None, None
     
-    start_preis = historische_preise[0]
+    start_preis = start_eintrag['price']
     änderung = aktueller_preis - start_preis
     prozent = (änderung / start_preis) * 100
     
     return änderung, prozent
 
-def erstelle_preiskarte(name, preis, änderung, prozent, shop):
-    """Erstellt eine visuelle Preiskarte mit allen relevanten Infos"""
+# ========== ABGELEITETE ANSICHTEN ==========
+# Karten, Änderungen, Diagramm und Tabellenseite hängen nur von Datenstand, Auswahl und Zeitraum ab.
+# Der Datenstand ist Teil jedes Schlüssels: neue Beobachtungen erzeugen neue Einträge, alte fallen
+# über max_entries (LRU) heraus. Index und Tabelle (mit _) sind durch den Datenstand eindeutig bestimmt.
+# Ansichten mit Zeitfenster relativ zu jetzt erhalten zusätzlich die laufende Stunde als Schlüssel,
+# sonst bliebe das Fenster stehen, solange keine neuen Beobachtungen eintreffen.
+@st.cache_data(show_spinner=False, max_entries=64)
+def berechne_preiskarten(_index, stand, produkte, tage, stunde):
+    """Werte der Preiskarten je Produkt (None, wenn keine Daten vorliegen)"""
+    METRIKEN.zaehle('ansicht_berechnet', ansicht='preiskarten')
+    karten = {}
+    for produkt in produkte:
+        eintrag = _index.neuester(produkt)
+        if not eintrag:
+            karten[produkt] = None
+            continue
+        änderung, prozent = berechne_preisänderung(eintrag['price'], _index, produkt, tage, bis=stunde)
+        karten[produkt] = {'preis': eintrag['price'], 'änderung': änderung, 'prozent': prozent,
+                           'shop': eintrag['shop']}
+    return karten
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def berechne_preisänderungen(_index, stand, produkte):
+    """Tabelle der Preisänderungen vom ältesten zum neuesten Eintrag je Produkt"""
+    METRIKEN.zaehle('ansicht_berechnet', ansicht='preisänderungen')
+    änderungen = []
+    for produkt in produkte:
+        if _index.anzahl(produkt) >= 2:
+            neuester = _index.neuester(produkt)
+            ältester = _index.aeltester(produkt)
+            
+            änderung = neuester['price'] - ältester['price']
+            prozent = (änderung / ältester['price']) * 100
+            
+            änderungen.append({
+                'Modell': produkt,
+                'Startpreis': f"{ältester['price']:.2f}€",
+                'Aktueller Preis': f"{neuester['price']:.2f}€",
+                'Änderung (€)': f"{änderung:+.2f}€",
+                'Änderung (%)': f"{prozent:+.2f}%",
+                'Zeitraum': f"{(neuester['date'] - ältester['date']).days} Tage"
+            })
+    return pd.DataFrame(änderungen)
+
+def erstelle_preiskarte(name, preis, änderung, prozent, shop, veraltet=None):
+    """Erstellt eine visuelle Preiskarte mit allen relevanten Infos
+
+    `veraltet` ist der Statuseintrag eines Produkts, das im letzten Zyklus nicht
+    abgerufen werden konnte; die Karte zeigt dann Stand und Grund an.
+    """
     if änderung is not None and prozent is not None:
         änderung_text = f"{'📈' if änderung > 0 else '📉'} {änderung:+.2f}€ ({prozent:+.2f}%)"
         änderung_class = "price-change-positive" if änderung > 0 else "price-change-negative"
@@ -238,35 +267,53 @@ def erstelle_preiskarte(name, preis, änderung, prozent, shop):
             <small style="color: #7f8c8d;">{shop}</small>
         </div>
         <p><span class="{änderung_class}">{änderung_text}</span></p>
+        {veraltet_hinweis(veraltet)}
     </div>
     """, unsafe_allow_html=True)
 
-def erstelle_preisdiagramm(daten, ausgewählte_modelle):
-    """Erstellt ein interaktives Preisdiagramm mit Plotly"""
-    if not daten or not ausgewählte_modelle:
+def veraltet_hinweis(veraltet):
+    """HTML-Zeile für eine Preiskarte mit veraltetem Preis"""
+    if not veraltet:
+        return ""
+    stand = f"Stand {datetime.fromisoformat(veraltet['date']):%d.%m.%Y %H:%M} – " if veraltet.get('date') else ""
+    grund = AUSFALLGRUENDE.get(veraltet['grund'], veraltet['grund'])
+    return f'<small style="color: #e67e22;">⚠️ Veraltet: {stand}{grund}</small>'
+
+def erstelle_preisdiagramm(index, ausgewählte_modelle, sichtbereich=None):
+    """Erstellt ein interaktives Preisdiagramm mit Plotly
+
+    Jede Linie wird serverseitig per LTTB auf die Zielbreite ausgedünnt; große
+    Diagramme werden mit WebGL gezeichnet. `sichtbereich=(von, bis)` legt den
+    anfangs sichtbaren Ausschnitt fest, der die volle Auflösung erhält.
+    """
+    if not len(index) or not ausgewählte_modelle:
         return None
     
+    import plotly.express as px
+    import plotly.graph_objects as go
+    
     fig = go.Figure()
     
     farben = px.colors.qualitative.Plotly
     farb_index = 0
     
-    for produkt in ausgewählte_modelle:
-        produkt_daten = [d for d in daten if d['product'] == produkt]
-        if not produkt_daten:
-            continue
-            
-        # Sortiere nach Datum
-        produkt_daten.sort(key=lambda x: x['date'])
-        
-        datum = [d['date'] for d in produkt_daten]
-        preis = [d['price'] for d in produkt_daten]
-        
-        fig.add_trace(go.Scatter(
+    reihen = [(produkt, *index.reihe(produkt)) for produkt in ausgewählte_modelle]
+    reihen = [(produkt, datum, preis) for produkt, datum, preis in reihen if len(preis)]
+    if not reihen:
+        return None
+    
+    # Punktbudget je Linie, damit die Nutzlast unabhängig von der Historie begrenzt bleibt
+    budget = max(3, min(DIAGRAMM_BREITE, MAX_DIAGRAMM_PUNKTE // len(reihen)))
+    ausgedünnt = [(produkt, *duenne_aus(datum, preis, budget, sichtbereich)) for produkt, datum, preis in reihen]
+    webgl = sum(len(preis) for _, _, preis in ausgedünnt) > WEBGL_AB
+    trace_typ = go.Scattergl if webgl else go.Scatter
+    
+    for produkt, datum, preis in ausgedünnt:
+        fig.add_trace(trace_typ(
             x=datum,
             y=preis,
             name=produkt,
-            mode='lines+markers',
+            mode='lines+markers' if len(preis) <= MARKER_BIS else 'lines',
             line=dict(width=2.5, color=farben[farb_index % len(farben)]),
             marker=dict(size=8, color=farben[farb_index % len(farben)]),
             hovertemplate="<b>%{y:.2f}€</b><br>%{x|%d.%m.%Y}",
@@ -294,9 +341,9 @@ def erstelle_preisdiagramm(daten, ausgewählte_modelle):
         )
     )
     
-    # Range Selector hinzufügen
+    # Range Selector hinzufügen (der Rangeslider kann keine WebGL-Linien darstellen)
     fig.update_xaxes(
-        rangeslider_visible=True,
+        rangeslider_visible=not webgl,
         rangeselector=dict(
             buttons=list([
                 dict(count=7, label="1W", step="day", stepmode="backward"),
@@ -308,59 +355,279 @@ def erstelle_preisdiagramm(daten, ausgewählte_modelle):
         )
     )
     
+    if sichtbereich and sichtbereich[0] is not None:
+        fig.update_xaxes(range=[sichtbereich[0], sichtbereich[1] or datetime.now()])
+    
     return fig
 
-def erstelle_preisvergleichstabelle(daten):
-    """Erstellt eine interaktive Tabelle mit allen Preisdaten"""
-    if not daten:
+# Figur statt JSON: st.plotly_chart validiert ein JSON-Dict erneut (~45 ms), eine fertige Figur nicht.
+# Sie wird beim Anzeigen nur gelesen und kann daher ohne Kopie zwischen Reruns geteilt werden.
+@st.cache_resource(show_spinner=False, max_entries=32)
+def baue_preisdiagramm(_index, stand, produkte, tage, stunde):
+    """Preisdiagramm je Datenstand, Auswahl, Zeitraum und Stunde"""
+    METRIKEN.zaehle('ansicht_berechnet', ansicht='diagramm')
+    # Bis zum Ende der laufenden Stunde, damit die jüngsten Punkte sichtbar bleiben
+    sichtbereich = (stunde - timedelta(days=tage), stunde + timedelta(hours=1))
+    return erstelle_preisdiagramm(_index, list(produkte), sichtbereich)
+
+# Sortieroptionen der Tabelle; None = Modell aufsteigend, Datum absteigend
+TABELLEN_SORTIERUNG = {
+    None: "Modell & Datum",
+    'date': "Datum",
+    'price': "Preis",
+    'price_change': "Änderung (€)",
+    'percent_change': "Änderung (%)",
+    'shop': "Shop",
+}
+
+# Zahlen bleiben numerisch, formatiert wird erst im Browser
+EURO_FORMAT = "function(p) { return p.value == null ? '' : p.value.toFixed(2) + '€'; }"
+ÄNDERUNG_EURO_FORMAT = (
+    "function(p) { return p.value == null ? '' : (p.value > 0 ? '+' : '') + p.value.toFixed(2) + '€'; }"
+)
+ÄNDERUNG_PROZENT_FORMAT = (
+    "function(p) { return p.value == null ? '' : (p.value > 0 ? '+' : '') + p.value.toFixed(2) + '%'; }"
+)
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def baue_tabellenquelle(_historie, stand):
+    """Bereitet die Tabelle einmal pro Datenstand vor (Preisänderungen vektorisiert)"""
+    return bereite_tabelle_vor(_historie.als_dataframe())
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def formatiere_tabellenseite(_tabelle, stand, produkte, seite, seitengröße, sortierung, absteigend):
+    """Sortierte, für die Anzeige formatierte Seite der Tabelle"""
+    METRIKEN.zaehle('ansicht_berechnet', ansicht='tabellenseite')
+    positionen = filtere(_tabelle, produkte=list(produkte))
+    df = hole_seite(_tabelle, positionen, seite - 1, seitengröße, sortierung, absteigend).copy()
+    
+    # Nur die Zeilen dieser Seite werden formatiert
+    df['date'] = df['date'].dt.strftime('%d.%m.%Y %H:%M')
+    for spalte in ('product', 'shop', 'url'):
+        if spalte in df:
+            df[spalte] = df[spalte].astype(str)
+    return df
+
+def erstelle_preisvergleichstabelle(tabelle, stand):
+    """Erstellt eine interaktive Tabelle; AG Grid erhält nur die angeforderte Seite"""
+    if tabelle.empty:
         return None
     
-    # Erstelle DataFrame für die Tabelle
-    df = pd.DataFrame(daten)
-    
-    # Sortiere nach Produkt und Datum
-    df = df.sort_values(['product', 'date'], ascending=[True, False])
-    
-    # Berechne Preisänderungen
-    df['price_change'] = df.groupby('product')['price'].diff(-1)
-    df['percent_change'] = (df['price_change'] / df['price'].shift(-1)) * 100
-    
-    # Formatierung
-    df['date'] = df['date'].dt.strftime('%d.%m.%Y %H:%M')
-    df['price'] = df['price'].apply(lambda x: f"{x:.2f}€")
-    df['price_change'] = df['price_change'].apply(lambda x: f"{x:+.2f}€" if pd.notnull(x) else "")
-    df['percent_change'] = df['percent_change'].apply(lambda x: f"{x:+.2f}%" if pd.notnull(x) else "")
+    # Filter, Sortierung und Seitenwahl werden serverseitig ausgewertet
+    col1, col2, col3, col4 = st.columns([3, 2, 1, 1])
+    with col1:
+        produkte = st.multiselect("Modelle filtern", options=list(tabelle['product'].cat.categories),
+                                  key="grid_produkte")
+    with col2:
+        sortierung = st.selectbox("Sortieren nach", options=list(TABELLEN_SORTIERUNG),
+                                  format_func=TABELLEN_SORTIERUNG.get, key="grid_sortierung")
+    with col3:
+        absteigend = st.toggle("Absteigend", value=True, key="grid_absteigend")
+    with col4:
+        seitengröße = st.selectbox("Zeilen", options=[10, 25, 50, 100], key="grid_seitengroesse")
+    
+    positionen = filtere(tabelle, produkte=produkte)
+    seiten = max(1, -(-len(positionen) // seitengröße))
+    if st.session_state.get("grid_seite", 1) > seiten:
+        st.session_state.grid_seite = seiten
+    seite = st.number_input(f"Seite (von {seiten})", min_value=1, max_value=seiten, key="grid_seite")
+    
+    df = formatiere_tabellenseite(tabelle, stand, tuple(produkte), seite, seitengröße, sortierung, absteigend)
     
     # AG Grid konfigurieren
+    from st_aggrid import AgGrid, GridOptionsBuilder, JsCode
+    
     gb = GridOptionsBuilder.from_dataframe(df)
-    gb.configure_pagination(paginationPageSize=10)
     gb.configure_side_bar()
-    gb.configure_default_column(groupable=True, value=True, enableRowGroup=True, aggFunc='sum', editable=False)
+    gb.configure_default_column(groupable=True, value=True, enableRowGroup=True, aggFunc='sum',
+                                editable=False, sortable=False)
     
     # Spalten konfigurieren
     gb.configure_column("product", header_name="Modell", pinned=True)
-    gb.configure_column("price", header_name="Preis", type=["numericColumn","numberColumnFilter","customNumericFormat"], 
-                       valueFormatter="data.price")
+    gb.configure_column("price", header_name="Preis", type=["numericColumn","numberColumnFilter"],
+                       valueFormatter=JsCode(EURO_FORMAT))
     gb.configure_column("date", header_name="Datum")
     gb.configure_column("shop", header_name="Shop")
-    gb.configure_column("price_change", header_name="Änderung (€)", type=["numericColumn","numberColumnFilter"])
-    gb.configure_column("percent_change", header_name="Änderung (%)", type=["numericColumn","numberColumnFilter"])
+    gb.configure_column("price_change", header_name="Änderung (€)", type=["numericColumn","numberColumnFilter"],
+                       valueFormatter=JsCode(ÄNDERUNG_EURO_FORMAT))
+    gb.configure_column("percent_change", header_name="Änderung (%)", type=["numericColumn","numberColumnFilter"],
+                       valueFormatter=JsCode(ÄNDERUNG_PROZENT_FORMAT))
     
     gridOptions = gb.build()
     
+    st.caption(f"{len(positionen):,} Einträge".replace(",", "."))
     return AgGrid(
         df,
         gridOptions=gridOptions,
         enable_enterprise_modules=True,
-        height=500,
+        allow_unsafe_jscode=True,
+        height=min(500, 60 + 35 * len(df)),
         width='100%',
         theme='streamlit',
         update_mode='MODEL_CHANGED',
         fit_columns_on_grid_load=True
     )
 
+def erzeuge_export(format_, von, bis, produkte):
+    """Schreibt den Export blockweise in eine temporäre Datei und liefert deren Inhalt
+
+    Streamlit hält den Download vollständig im Speicher; zeige_export begrenzt die Größe daher
+    auf EXPORT_MAX_ZEILEN.
+    """
+    with tempfile.TemporaryFile() as ziel:
+        exportiere(DATEIPFAD, ziel, format_, von, bis, produkte)
+        ziel.seek(0)
+        return ziel.read()
+
+def zeige_export(historie):
+    """Exportfilter; die Datei entsteht erst beim Klick, nicht bei jedem Rerun"""
+    with st.expander("📥 Daten exportieren"):
+        erster = pd.Timestamp(historie.zeiten.min()).date()
+        letzter = pd.Timestamp(historie.zeiten.max()).date()
+        col1, col2, col3 = st.columns([2, 3, 1])
+        with col1:
+            zeitraum = st.date_input("Zeitraum", value=(erster, letzter), min_value=erster, max_value=letzter,
+                                     format="DD.MM.YYYY", key="export_zeitraum")
+        with col2:
+            produkte = st.multiselect("Modelle (leer = alle)", options=historie.kategorien['product'],
+                                      key="export_produkte")
+        with col3:
+            formate = [f for f in FORMATE if f != 'parquet' or hat_pyarrow()]
+            format_ = st.selectbox("Format", formate, key="export_format")
+        
+        # Während der Auswahl liefert date_input kurzzeitig nur ein Datum
+        von = datetime.combine(zeitraum[0], datetime.min.time()) if zeitraum else None
+        bis = datetime.combine(zeitraum[-1], datetime.min.time()) + timedelta(days=1) if zeitraum else None
+        mime, endung = FORMATE[format_]
+        zeilen = historie.anzahl(von, bis, produkte)
+        zu_gross = zeilen > EXPORT_MAX_ZEILEN
+        if zu_gross:
+            st.warning(
+                f"Die Auswahl umfasst {zeilen:,} Einträge (höchstens {EXPORT_MAX_ZEILEN:,} im Dashboard). ".replace(",", ".")
+                + "Zeitraum oder Modelle eingrenzen oder vollständig exportieren mit "
+                "`python -m preis_checker exportiere ZIEL`."
+            )
+        st.download_button(
+            label="Daten exportieren",
+            data=lambda: erzeuge_export(format_, von, bis, produkte),
+            file_name=f"rtx5080_preise{endung}",
+            mime=mime,
+            on_click="ignore",
+            disabled=zu_gross,
+            key="export"
+        )
+
+def zeige_preisalarme():
+    """Regeln anlegen/löschen und ausgelöste Alarme anzeigen"""
+    with st.form("neue_regel", clear_on_submit=True):
+        st.markdown("**Neue Regel**")
+        col1, col2, col3, col4 = st.columns([3, 2, 1, 1])
+        with col1:
+            # Der Worker wertet Regeln für den ganzen Katalog aus, nicht nur für die angezeigten Modelle
+            produkt = st.selectbox("Produkt", list(alle_produkte.keys()))
+        with col2:
+            typ = st.selectbox("Bedingung", list(REGELTYPEN), format_func=REGELTYPEN.get)
+        with col3:
+            # Ohne Vorgabe: eine Schwelle von 0 könnte nie auslösen und muss bewusst gesetzt werden
+            schwelle = st.number_input("Schwelle (€ bzw. %)", min_value=0.0, value=None, step=10.0)
+        with col4:
+            fenster = st.number_input("Fenster (Tage)", min_value=1, value=7, step=1)
+        if st.form_submit_button("Regel anlegen"):
+            try:
+                lege_regel_an(DATEIPFAD, produkt, typ,
+                              schwelle=schwelle if typ in ('preis_unter', 'rueckgang') else None,
+                              fenster_tage=int(fenster) if typ == 'rueckgang' else None)
+                st.success("Regel angelegt – sie wird beim nächsten Abrufzyklus geprüft.")
+            except ValueError as e:
+                st.error(str(e))
+    
+    regeln = lade_regeln(DATEIPFAD)
+    st.markdown(f"**Aktive Regeln ({len(regeln)})**")
+    for regel in regeln:
+        col1, col2 = st.columns([6, 1])
+        with col1:
+            bedingung = REGELTYPEN[regel['typ']]
+            if regel['typ'] == 'preis_unter':
+                bedingung += f" {regel['schwelle']:.2f} €"
+            elif regel['typ'] == 'rueckgang':
+                bedingung += f": {regel['schwelle']:.1f}% in {regel['fenster_tage']} Tagen"
+            st.write(f"{regel['product']} – {bedingung}")
+        with col2:
+            if st.button("Löschen", key=f"regel_loeschen_{regel['id']}"):
+                loesche_regel(DATEIPFAD, regel['id'])
+                st.rerun()
+    
+    ausgelöst = lade_alarme(DATEIPFAD)
+    st.markdown("**Ausgelöste Alarme**")
+    if ausgelöst:
+        df = pd.DataFrame(ausgelöst)[['date', 'product', 'nachricht', 'shop', 'price', 'zugestellt']]
+        df['date'] = pd.to_datetime(df['date']).dt.strftime('%d.%m.%Y %H:%M')
+        df['zugestellt'] = df['zugestellt'].astype(bool)
+        df.columns = ['Datum', 'Modell', 'Alarm', 'Shop', 'Preis (€)', 'Zugestellt']
+        st.dataframe(df.style.format({'Preis (€)': "{:.2f}"}), use_container_width=True, hide_index=True)
+    else:
+        st.info("Noch keine Alarme ausgelöst.")
+
+def metrik_tabelle(einträge, spalten):
+    """Wandelt Metrik-Einträge in eine Tabelle mit lesbaren Labels um"""
+    zeilen = []
+    for eintrag in einträge:
+        labels = ", ".join(f"{k}={v}" for k, v in eintrag['labels'].items())
+        zeilen.append({'Metrik': eintrag['name'], 'Labels': labels,
+                       **{titel: eintrag[schlüssel] for schlüssel, titel in spalten.items()}})
+    return pd.DataFrame(zeilen)
+
+def zeige_laufzeiten(einträge):
+    """Laufzeit-Summaries mit Perzentilen in Millisekunden"""
+    if not einträge:
+        st.info("Noch keine Messungen vorhanden.")
+        return
+    df = metrik_tabelle(einträge, {'anzahl': 'Anzahl', 'p50': 'p50 (ms)', 'p90': 'p90 (ms)', 'p99': 'p99 (ms)'})
+    for spalte in ('p50 (ms)', 'p90 (ms)', 'p99 (ms)'):
+        df[spalte] = df[spalte] * 1000
+    st.dataframe(df.style.format({'p50 (ms)': "{:.1f}", 'p90 (ms)': "{:.1f}", 'p99 (ms)': "{:.1f}"}),
+                 use_container_width=True, hide_index=True)
+
+def zeige_diagnose():
+    """Diagnose-Tab: Metriken des Workers und Renderzeiten dieses Dashboards"""
+    st.subheader("Hintergrund-Worker")
+    schnappschuss = lade_schnappschuss(METRIKEN_JSON_PFAD)
+    if not schnappschuss:
+        st.info("Der Worker hat noch keine Metriken geschrieben.")
+    else:
+        st.caption(f"Stand: {datetime.fromtimestamp(schnappschuss['zeitpunkt']):%d.%m.%Y %H:%M:%S}")
+        zeige_laufzeiten(schnappschuss['laufzeiten'])
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown("**Zähler**")
+            if schnappschuss['zaehler']:
+                st.dataframe(metrik_tabelle(schnappschuss['zaehler'], {'wert': 'Wert'}),
+                             use_container_width=True, hide_index=True)
+        with col2:
+            st.markdown("**Messwerte**")
+            if schnappschuss['messwerte']:
+                st.dataframe(metrik_tabelle(schnappschuss['messwerte'], {'wert': 'Wert'}),
+                             use_container_width=True, hide_index=True)
+        with st.expander("Prometheus-Format"):
+            try:
+                with open(METRIKEN_PROM_PFAD) as f:
+                    st.code(f.read(), language="text")
+            except FileNotFoundError:
+                st.info("Keine Prometheus-Datei vorhanden.")
+    
+    st.subheader("Dashboard")
+    dashboard = METRIKEN.schnappschuss()
+    zeige_laufzeiten(dashboard['laufzeiten'])
+    berechnet = [e for e in dashboard['zaehler'] if e['name'] == 'ansicht_berechnet']
+    if berechnet:
+        st.markdown("**Neu berechnete Ansichten** (alle übrigen Reruns kamen aus dem Cache)")
+        st.dataframe(metrik_tabelle(berechnet, {'wert': 'Wert'}),
+                     use_container_width=True, hide_index=True)
+
 # ========== HAUPTPROGRAMM ==========
 def main():
+    render_start = time.perf_counter()
+    richte_seite_ein()
     st.title("🖥️ RTX 5080 Preis-Tracker Pro")
     st.markdown("""
     <div style="background-color: #e8f4ff; padding: 15px; border-radius: 10px; margin-bottom: 20px;">
@@ -375,58 +642,20 @@ def main():
     if 'timeframe' not in st.session_state:
         st.session_state.timeframe = 30  # Standard: 1 Monat
     
-    # Fortschrittsbalken für Scraping
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-    
-    # Aktuelle Preise abrufen
-    daten = []
-    total_products = len(produkte_5080)
-    
-    for i, (name, url) in enumerate(produkte_5080.items()):
-        status_text.text(f"Scrape {name}... ({i+1}/{total_products})")
-        progress_bar.progress((i + 1) / total_products)
-        
-        produkt_daten = robust_scrape(url)
-        if produkt_daten:
-            produkt_daten['product'] = name
-            daten.append(produkt_daten)
-        
-        time.sleep(1)  # Höfliches Crawling
-    
-    progress_bar.empty()
-    status_text.empty()
-    
-    # Alte Daten laden und mit neuen kombinieren
-    dateipfad = os.path.join(DATA_DIR, "preise_5080.json")
-    alte_daten = lade_daten(dateipfad)
-    
-    # Prüfe auf Duplikate (gleiches Produkt, gleicher Preis, gleicher Shop, gleicher Tag)
-    heute = datetime.now().date()
-    neue_daten = []
-    
-    for eintrag in daten:
-        ist_duplikat = any(
-            (e['product'] == eintrag['product'] and 
-             e['price'] == eintrag['price'] and 
-             e['shop'] == eintrag['shop'] and 
-             e['date'].date() == heute)
-            for e in alte_daten
-        )
-        
-        if not ist_duplikat:
-            neue_daten.append(eintrag)
-    
-    if neue_daten:
-        alle_daten = alte_daten + neue_daten
-        speichere_daten(alle_daten, dateipfad)
-        st.success(f"{len(neue_daten)} neue Preise aktualisiert!")
-    else:
-        alle_daten = alte_daten
-        st.info("Keine neuen Preisänderungen gefunden.")
+    # Preise werden vom Hintergrund-Worker gesammelt, das Dashboard liest nur
+    status = lade_status(STATUSPFAD)
+    zeige_aktualisierungsstand(status)
+    veraltet = (status or {}).get('veraltet', {})
+    stand = datenstand(DATEIPFAD)
+    stunde = aktuelle_stunde()
+    alle_daten = lade_historie(DATEIPFAD, stand)
+    index = baue_preisindex(alle_daten, stand)
     
     # Dashboard Layout
-    tab1, tab2, tab3 = st.tabs(["📊 Übersicht", "📈 Preisverlauf", "📋 Alle Daten"])
+    diagnose = st.sidebar.checkbox("🩺 Diagnose anzeigen", key="diagnose")
+    tabs = st.tabs(["📊 Übersicht", "📈 Preisverlauf", "📋 Alle Daten", "🔔 Preisalarme"]
+                   + (["🩺 Diagnose"] if diagnose else []))
+    tab1, tab2, tab3, tab4 = tabs[:4]
     
     with tab1:
         st.header("Aktuelle Preise & Trends")
@@ -448,7 +677,9 @@ def main():
             "Modelle auswählen",
             options=list(produkte_5080.keys()),
             default=st.session_state.selected_products,  # Alle vorausgewählt
-            key="product_select"
+            key="product_select",
+            # Gezielt gewählte Modelle ruft der Worker häufiger ab
+            on_change=lambda: merke_interesse(DATEIPFAD, st.session_state.product_select)
         )
         
         # Automatisch alle Produkte auswählen, wenn keine spezifische Auswahl getroffen wurde
@@ -459,6 +690,8 @@ def main():
         
         # Preiskarten anzeigen - in zwei Spalten für bessere Lesbarkeit
         if st.session_state.selected_products:
+            karten = berechne_preiskarten(index, stand, tuple(st.session_state.selected_products),
+                                          st.session_state.timeframe, stunde)
             # Erstelle zwei Spalten
             col1, col2 = st.columns(2)
             
@@ -467,82 +700,72 @@ def main():
                 current_col = col1 if idx % 2 == 0 else col2
                 
                 with current_col:
-                    produkt_daten = [d for d in alle_daten if d['product'] == produkt]
-                    if produkt_daten:
-                        aktuellster_eintrag = max(produkt_daten, key=lambda x: x['date'])
-                        änderung, prozent = berechne_preisänderung(
-                            aktuellster_eintrag['price'],
-                            produkt_daten,
-                            st.session_state.timeframe
-                        )
-                        
-                        erstelle_preiskarte(
-                            produkt,
-                            aktuellster_eintrag['price'],
-                            änderung,
-                            prozent,
-                            aktuellster_eintrag['shop']
-                        )
+                    karte = karten[produkt]
+                    if karte:
+                        erstelle_preiskarte(produkt, karte['preis'], karte['änderung'], karte['prozent'],
+                                            karte['shop'], veraltet.get(produkt))
                     else:
                         st.warning(f"Keine Daten für {produkt} verfügbar")
         
+        # Vollständige Angebotsliste aus dem letzten Abruf
+        with st.expander("🛒 Alle Angebote eines Modells"):
+            produkt = st.selectbox("Modell", st.session_state.selected_products, key="angebote_produkt")
+            angebote = lade_angebotsliste(DATEIPFAD, stand, produkt)
+            if not angebote.empty:
+                st.caption(f"Stand: {pd.to_datetime(angebote['date'].iloc[0]):%d.%m.%Y %H:%M} – "
+                           f"{len(angebote)} Angebote")
+                df = angebote[['shop', 'price', 'shipping', 'gesamt', 'availability']]
+                df.columns = ['Shop', 'Preis (€)', 'Versand (€)', 'Gesamt (€)', 'Verfügbarkeit']
+                st.dataframe(df.style.format({'Preis (€)': "{:.2f}", 'Versand (€)': "{:.2f}", 'Gesamt (€)': "{:.2f}"},
+                                             na_rep="–"),
+                             use_container_width=True, hide_index=True)
+            else:
+                st.info("Für dieses Modell wurde noch keine Angebotsliste erfasst.")
+        
         # Preisstatistiken
-        st.subheader("Preisstatistiken")
-        if alle_daten:
-            df = pd.DataFrame(alle_daten)
-            stats = df.groupby('product')['price'].agg(['min', 'max', 'mean', 'median', 'std', 'count'])
+        st.subheader(f"Preisstatistiken (letzte {st.session_state.timeframe} Tage)")
+        stats = lade_preisstatistik(DATEIPFAD, stand, st.session_state.timeframe, stunde)
+        if not stats.empty:
             stats.columns = ['Tiefstpreis', 'Höchstpreis', 'Durchschnitt', 'Median', 'Standardabweichung', 'Anzahl']
             st.dataframe(stats.style.format("{:.2f}€"), use_container_width=True)
     
     with tab2:
         st.header("Preisverlauf analysieren")
         
-        if alle_daten and st.session_state.selected_products:
-            fig = erstelle_preisdiagramm(alle_daten, st.session_state.selected_products)
+        if not alle_daten.empty and st.session_state.selected_products:
+            auswahl = tuple(st.session_state.selected_products)
+            fig = baue_preisdiagramm(index, stand, auswahl, st.session_state.timeframe, stunde)
             if fig:
                 st.plotly_chart(fig, use_container_width=True)
             
             # Preisänderungen berechnen
             st.subheader("Preisänderungen")
-            änderungen = []
+            änderungen = berechne_preisänderungen(index, stand, auswahl)
             
-            for produkt in st.session_state.selected_products:
-                produkt_daten = [d for d in alle_daten if d['product'] == produkt]
-                if len(produkt_daten) >= 2:
-                    neuester = max(produkt_daten, key=lambda x: x['date'])
-                    ältester = min(produkt_daten, key=lambda x: x['date'])
-                    
-                    änderung = neuester['price'] - ältester['price']
-                    prozent = (änderung / ältester['price']) * 100
-                    
-                    änderungen.append({
-                        'Modell': produkt,
-                        'Startpreis': f"{ältester['price']:.2f}€",
-                        'Aktueller Preis': f"{neuester['price']:.2f}€",
-                        'Änderung (€)': f"{änderung:+.2f}€",
-                        'Änderung (%)': f"{prozent:+.2f}%",
-                        'Zeitraum': f"{(neuester['date'] - ältester['date']).days} Tage"
-                    })
-            
-            if änderungen:
-                st.table(pd.DataFrame(änderungen))
+            if not änderungen.empty:
+                st.table(änderungen)
             else:
                 st.info("Nicht genügend Daten für Preisvergleich vorhanden.")
     
     with tab3:
         st.header("Alle Preisdaten")
-        if alle_daten:
-            grid = erstelle_preisvergleichstabelle(alle_daten)
+        if not alle_daten.empty:
+            grid = erstelle_preisvergleichstabelle(baue_tabellenquelle(alle_daten, stand), stand)
             
             # Datenexport
-            st.download_button(
-                label="Daten als CSV exportieren",
-                data=pd.DataFrame(alle_daten).to_csv(index=False).encode('utf-8'),
-                file_name="rtx5080_preise.csv",
-                mime="text/csv"
-            )
+            zeige_export(alle_daten)
         else:
             st.warning("Noch keine Daten verfügbar.")
+    
+    with tab4:
+        st.header("Preisalarme")
+        zeige_preisalarme()
+    
+    if diagnose:
+        with tabs[4]:
+            zeige_diagnose()
+    
+    METRIKEN.beobachte('render_sekunden', time.perf_counter() - render_start)
 
 if __name__ == "__main__":
     main()
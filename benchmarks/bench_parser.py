@@ -0,0 +1,86 @@
+"""Micro-Benchmark der Preis-Extraktoren auf gespeicherten Produktseiten
+
+Start: python -m benchmarks.bench_parser [--wiederholungen N] [--json DATEI]
+
+Liest alle *.html aus benchmarks/fixtures (dort können echte, gespeicherte
+Geizhals-Seiten abgelegt werden) und misst je Extraktor Parse-Zeit und
+Spitzen-Speicher pro Seite, ebenso für die Extraktoren der vollständigen
+Angebotsliste. Abweichende Ergebnisse zum vollständigen BeautifulSoup-Parser
+werden gemeldet und beenden den Lauf mit Fehlercode; die Fixtures dienen so
+auch als Regressionsprüfung der Schnellwege (z. B. verschachteltes Preis-Markup).
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import time
+import tracemalloc
+
+from preis_checker.extraktor import (
+    regex_angebote, regex_extraktor, soup_angebote, soup_extraktor, strainer_extraktor,
+)
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+EXTRAKTOREN = [regex_extraktor, strainer_extraktor, soup_extraktor]
+ANGEBOTS_EXTRAKTOREN = [regex_angebote, soup_angebote]
+
+
+def miss(extraktor, html, wiederholungen):
+    """Median der Laufzeit in ms und Spitzen-Speicher in KiB für eine Seite"""
+    zeiten = []
+    for _ in range(wiederholungen):
+        start = time.perf_counter()
+        extraktor(html)
+        zeiten.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    extraktor(html)
+    _, spitze = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return statistics.median(zeiten), spitze / 1024
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Vergleicht die Preis-Extraktoren")
+    parser.add_argument("--wiederholungen", type=int, default=20)
+    parser.add_argument("--json", help="Ergebnisse zusätzlich als JSON speichern")
+    args = parser.parse_args(argv)
+
+    seiten = sorted(glob.glob(os.path.join(FIXTURES, "*.html")))
+    if not seiten:
+        raise SystemExit(f"Keine Fixtures in {FIXTURES}")
+
+    ergebnisse = []
+    for pfad in seiten:
+        with open(pfad, encoding='utf-8') as f:
+            html = f.read()
+        referenz = soup_extraktor(html)
+        angebote_referenz = soup_angebote(html)
+        print(f"\n{os.path.basename(pfad)} ({len(html) / 1024:.0f} KiB) – Referenz: {referenz}, "
+              f"{len(angebote_referenz)} Angebote")
+        for extraktor in EXTRAKTOREN + ANGEBOTS_EXTRAKTOREN:
+            ms, kib = miss(extraktor, html, args.wiederholungen)
+            gleich = extraktor(html) == (angebote_referenz if extraktor in ANGEBOTS_EXTRAKTOREN else referenz)
+            print(f"  {extraktor.__name__:<20} {ms:9.2f} ms {kib:10.0f} KiB"
+                  f"{'' if gleich else '  ABWEICHUNG'}")
+            ergebnisse.append({
+                'seite': os.path.basename(pfad),
+                'extraktor': extraktor.__name__,
+                'median_ms': round(ms, 3),
+                'spitze_kib': round(kib, 1),
+                'gleich_referenz': gleich,
+            })
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(ergebnisse, f, indent=2)
+
+    abweichungen = [f"{e['seite']}: {e['extraktor']}" for e in ergebnisse if not e['gleich_referenz']]
+    if abweichungen:
+        raise SystemExit("Abweichung zur Referenz: " + ", ".join(abweichungen))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Simulation: adaptive Abrufplanung gegen festes Round-Robin bei gleichem Budget
+
+Start: python -m benchmarks.bench_planer [--produkte N] [--tage T] [--budget B] [--json DATEI]
+
+Jedes simulierte Produkt ändert seinen Preis als Poisson-Prozess; wenige sind
+volatil, die meisten fast statisch. Beide Verfahren dürfen pro Stunde gleich
+viele Abrufe machen. Gemessen werden der Anteil erfasster Preisänderungen
+(vor dem nächsten Wechsel mindestens einmal gesehen) und der mittlere Anteil
+veralteter Produkte im Speicher.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+
+from preis_checker.planer import Planer
+
+# (Anteil der Produkte, mittlere Zeit zwischen zwei Preisänderungen in Stunden)
+PROFILE = [(0.05, 2), (0.15, 12), (0.30, 72), (0.50, 24 * 14)]
+
+
+class Markt:
+    """Preisverläufe aller Produkte als vorab gezogene Änderungszeitpunkte"""
+
+    def __init__(self, anzahl, dauer, seed):
+        zufall = random.Random(seed)
+        self.aenderungen = {}
+        for i in range(anzahl):
+            mittel = self._profil(i / anzahl) * 3600
+            zeiten, t = [], zufall.expovariate(1 / mittel)
+            while t < dauer:
+                zeiten.append(t)
+                t += zufall.expovariate(1 / mittel)
+            self.aenderungen[f"Produkt {i:05d}"] = zeiten
+
+    @staticmethod
+    def _profil(anteil):
+        for grenze, stunden in PROFILE:
+            if anteil < grenze:
+                return stunden
+            anteil -= grenze
+        return PROFILE[-1][1]
+
+    def preis(self, name, t):
+        """Preis zum Zeitpunkt t: Index der letzten Änderung (eindeutig je Preisstand)"""
+        zeiten = self.aenderungen[name]
+        lo, hi = 0, len(zeiten)
+        while lo < hi:
+            mitte = (lo + hi) // 2
+            if zeiten[mitte] <= t:
+                lo = mitte + 1
+            else:
+                hi = mitte
+        return lo
+
+
+def simuliere(markt, waehle, verbuche, dauer, takt):
+    """Führt die Simulation aus und liefert (erfasste Änderungen, Anteil veralteter Produkte)"""
+    gesehen = {name: set() for name in markt.aenderungen}
+    gespeichert = dict.fromkeys(markt.aenderungen, 0)
+    veraltet, abrufe, schritte = 0.0, 0, 0
+    t = 0.0
+    while t < dauer:
+        auswahl = waehle(t)
+        daten = []
+        for name in auswahl:
+            preis = markt.preis(name, t)
+            gesehen[name].add(preis)
+            gespeichert[name] = preis
+            daten.append({'product': name, 'price': float(preis), 'shop': 'Shop'})
+        verbuche(daten, t)
+        abrufe += len(auswahl)
+        veraltet += sum(gespeichert[name] != markt.preis(name, t) for name in markt.aenderungen) / len(gespeichert)
+        schritte += 1
+        t += takt
+
+    gesamt = sum(len(zeiten) for zeiten in markt.aenderungen.values())
+    erfasst = sum(len(preise - {0}) for preise in gesehen.values())
+    return {'abrufe': abrufe, 'erfasst': erfasst / max(1, gesamt), 'veraltet': veraltet / schritte}
+
+
+def round_robin(produkte, budget, takt):
+    """Festes Intervall: jedes Produkt der Reihe nach, gleichmäßig über die Stunde verteilt"""
+    pro_takt = budget * takt / 3600
+    zustand = {'position': 0, 'guthaben': 0.0}
+
+    def waehle(t):
+        zustand['guthaben'] += pro_takt
+        anzahl = int(zustand['guthaben'])
+        zustand['guthaben'] -= anzahl
+        auswahl = [produkte[(zustand['position'] + i) % len(produkte)] for i in range(anzahl)]
+        zustand['position'] += anzahl
+        return auswahl
+
+    return waehle, lambda daten, t: None
+
+
+def adaptiv(produkte, budget, takt, dateipfad):
+    planer = Planer(dateipfad, budget_pro_stunde=budget, takt=takt)
+    katalog = dict.fromkeys(produkte, "")
+    return (lambda t: list(planer.faellige(katalog, jetzt=t)),
+            lambda daten, t: planer.verbuche(daten, [], jetzt=t))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simuliert adaptive gegen feste Abrufplanung")
+    parser.add_argument("--produkte", type=int, default=800)
+    parser.add_argument("--tage", type=float, default=7)
+    parser.add_argument("--budget", type=int, default=200, help="Abrufe pro Stunde")
+    parser.add_argument("--takt", type=int, default=300, help="Sekunden pro Planungsschritt")
+    parser.add_argument("--seed", type=int, default=5080)
+    parser.add_argument("--json", help="Ergebnisse zusätzlich als JSON speichern")
+    args = parser.parse_args(argv)
+
+    dauer = args.tage * 24 * 3600
+    markt = Markt(args.produkte, dauer, args.seed)
+    produkte = sorted(markt.aenderungen)
+    print(f"{args.produkte} Produkte, {args.tage:g} Tage, Budget {args.budget}/h "
+          f"(Round-Robin-Intervall {args.produkte / args.budget:.1f} h)")
+
+    ergebnisse = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        verfahren = {
+            'round_robin': round_robin(produkte, args.budget, args.takt),
+            'adaptiv': adaptiv(produkte, args.budget, args.takt, os.path.join(tmp, "planer.sqlite")),
+        }
+        for name, (waehle, verbuche) in verfahren.items():
+            ergebnis = simuliere(markt, waehle, verbuche, dauer, args.takt)
+            ergebnisse[name] = ergebnis
+            print(f"{name:<12} {ergebnis['abrufe']:>7} Abrufe  "
+                  f"{ergebnis['erfasst']:>6.1%} Änderungen erfasst  "
+                  f"{ergebnis['veraltet']:>6.1%} im Mittel veraltet")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'parameter': vars(args), 'ergebnisse': ergebnisse}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Startzeit und Speicherbedarf: Kommandozeile gegen Dashboard-Import
+
+Start: python -m benchmarks.bench_start [--wiederholungen N] [--urls N] [--json DATEI]
+
+Misst in frischen Prozessen Importzeit und maximalen RSS für die
+Kommandozeile (`python -m preis_checker`) und das Dashboard (`Preisalarm.py`)
+und führt anschließend einen vollständigen `scrape`-Zyklus gegen den lokalen
+Stub-Shop aus. Gemeldet wird auch, welche UI-Bibliotheken geladen wurden.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.stub_server import StubEinstellungen, starte_stub
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UI_MODULE = ['streamlit', 'pandas', 'plotly', 'st_aggrid', 'bs4', 'cloudscraper']
+
+# Läuft im Kindprozess: misst die Anweisung und meldet Zeit, RSS und geladene UI-Module als letzte Zeile
+MESSUNG = """
+import json, resource, sys, time
+start = time.perf_counter()
+{anweisung}
+print(json.dumps({{
+    'sekunden': time.perf_counter() - start,
+    'rss_mib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'module': [m for m in {module!r} if m in sys.modules],
+}}))
+"""
+
+FAELLE = {
+    'cli_import': "import preis_checker.__main__, preis_checker.worker",
+    'dashboard_import': "import Preisalarm",
+    'cli_scrape': "from preis_checker.__main__ import main; main(['scrape'])",
+}
+
+
+def miss(anweisung, cwd, env):
+    ausgabe = subprocess.run(
+        [sys.executable, "-c", MESSUNG.format(anweisung=anweisung, module=UI_MODULE)],
+        cwd=cwd, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(ausgabe.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Misst Start von Kommandozeile und Dashboard")
+    parser.add_argument("--wiederholungen", type=int, default=5)
+    parser.add_argument("--urls", type=int, default=4, help="Produkte im Stub-Katalog für cli_scrape")
+    parser.add_argument("--json", help="Ergebnisse zusätzlich als JSON speichern")
+    args = parser.parse_args(argv)
+
+    server, basis = starte_stub(einstellungen=StubEinstellungen(seed=1))
+    ergebnisse = {}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            katalog = os.path.join(tmp, "katalog.json")
+            with open(katalog, 'w') as f:
+                json.dump({'produkte': [
+                    {'name': f"Stub-Produkt {i:04d}", 'url': f"{basis}/testkarte-{i:04d}.html", 'kategorie': "RTX 5080"}
+                    for i in range(args.urls)
+                ]}, f)
+            env = {**os.environ, 'PYTHONPATH': REPO, 'PREISALARM_KATALOG': katalog}
+
+            for fall, anweisung in FAELLE.items():
+                laeufe = [miss(anweisung, tmp, env)
+                          for _ in range(1 if fall == 'cli_scrape' else args.wiederholungen)]
+                ergebnisse[fall] = {
+                    'sekunden': statistics.median(l['sekunden'] for l in laeufe),
+                    'rss_mib': statistics.median(l['rss_mib'] for l in laeufe),
+                    'module': laeufe[-1]['module'],
+                }
+                e = ergebnisse[fall]
+                print(f"{fall:<18} {e['sekunden'] * 1000:8.0f} ms {e['rss_mib']:7.1f} MiB  "
+                      f"geladen: {', '.join(e['module']) or '–'}")
+    finally:
+        server.shutdown()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(ergebnisse, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""Offline-Ende-zu-Ende-Benchmark aller Stufen des Preis-Trackers
+
+Start: python -m benchmarks.e2e [--groesse 10k|1m|10m] [--urls 200] [--latenz-ms 80]
+                                [--fehlerrate 0.02] [--cf-verzoegerung-ms 500] [--ausgabe DATEI]
+
+Startet den lokalen Stub-Shop, erzeugt eine synthetische Historie und misst
+Abruf, Parsing, Laden, Deduplizierung, Speichern, Statistik, Export sowie Diagramm-
+und Tabellenaufbereitung. Die Ergebnisse werden als JSON geschrieben, damit
+Messungen vor und nach einer Änderung verglichen werden können.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from benchmarks.stub_server import StubEinstellungen, lade_seiten, starte_stub
+from benchmarks.synthetische_daten import erzeuge_historie, groesse, schreibe_json
+
+ERGEBNIS_DIR = os.path.join(os.path.dirname(__file__), "ergebnisse")
+
+
+class Messung:
+    """Sammelt Laufzeiten und Zusatzinfos je Stufe"""
+
+    def __init__(self):
+        self.stufen = {}
+
+    @contextmanager
+    def stufe(self, name, **info):
+        print(f"  {name:<24}", end="", flush=True)
+        eintrag = dict(info)
+        start = time.perf_counter()
+        yield eintrag
+        eintrag['sekunden'] = round(time.perf_counter() - start, 4)
+        self.stufen[name] = eintrag
+        details = ", ".join(f"{k}={v}" for k, v in eintrag.items() if k != 'sekunden')
+        print(f"{eintrag['sekunden']:10.3f} s  {details}")
+
+
+def git_stand():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def miss_abruf(messung, args):
+    from preis_checker.engine import HostLimiter, Sicherungen, scrape_parallel
+    from preis_checker.scraper import Revalidierung, SessionPool, scrape_versuch
+
+    server, basis = starte_stub(einstellungen=StubEinstellungen(
+        args.latenz_ms, args.jitter_ms, args.fehlerrate, args.cf_verzoegerung_ms, seed=1
+    ))
+    limits = {"127.0.0.1": (args.rate, args.parallel)}
+    pool = SessionPool(limits)
+    revalidierung = Revalidierung()
+    katalog = {f"Stub-Produkt {i:04d}": f"{basis}/testkarte-{i:04d}.html" for i in range(args.urls)}
+
+    def scrape(url):
+        return scrape_versuch(url, pool=pool, revalidierung=revalidierung)
+
+    try:
+        for name in ("abruf_kalt", "abruf_revalidiert"):
+            vorher = dict(server.einstellungen.zaehler)
+            with messung.stufe(name, urls=len(katalog)) as info:
+                ausfaelle = {}
+                ergebnisse = scrape_parallel(katalog, scrape, limiter=HostLimiter(limits),
+                                             max_worker=args.parallel * 2, versuche=3,
+                                             sicherungen=Sicherungen(), ausfaelle=ausfaelle)
+            nachher = server.einstellungen.zaehler
+            info.update({
+                'erfolgreich': sum(1 for e in ergebnisse.values() if e),
+                'ausfaelle': len(ausfaelle),
+                **{k: nachher[k] - vorher[k] for k in nachher},
+            })
+    finally:
+        pool.schliessen()
+        server.shutdown()
+
+
+def miss_parsing(messung, wiederholungen=20):
+    from preis_checker.extraktor import extrahiere, soup_extraktor
+
+    seiten = [seite.decode('utf-8') for seite in lade_seiten()]
+    for name, extraktoren in (("parse_schnellweg", None), ("parse_beautifulsoup", [soup_extraktor])):
+        with messung.stufe(name, seiten=len(seiten) * wiederholungen):
+            for _ in range(wiederholungen):
+                for seite in seiten:
+                    extrahiere(seite, extraktoren)
+        eintrag = messung.stufen[name]
+        eintrag['ms_pro_seite'] = round(eintrag['sekunden'] * 1000 / eintrag['seiten'], 3)
+
+
+def miss_speicher(messung, args, verzeichnis):
+    from preis_checker import speicher
+    from preis_checker.export import FORMATE, exportiere
+    from preis_checker.historie import Historie
+    from preis_checker.index import PreisIndex
+
+    anzahl = groesse(args.groesse)
+    json_pfad = os.path.join(verzeichnis, "preise_5080.json")
+    db_pfad = os.path.join(verzeichnis, "historie.sqlite")
+    parquet_pfad = os.path.join(verzeichnis, "historie.parquet")
+
+    with messung.stufe("historie_erzeugen", beobachtungen=anzahl, produkte=args.produkte):
+        schreibe_json(erzeuge_historie(anzahl, args.produkte), json_pfad)
+    messung.stufen["historie_erzeugen"]['json_mib'] = round(os.path.getsize(json_pfad) / 2**20, 1)
+
+    if not args.ohne_json_laden:
+        with messung.stufe("lade_daten_json_alt"):
+            # Entspricht dem früheren lade_daten: json.load plus strptime je Zeile
+            with open(json_pfad) as f:
+                daten = json.load(f)
+            for eintrag in daten:
+                eintrag['date'] = datetime.strptime(eintrag['date'], '%Y-%m-%d %H:%M:%S.%f')
+        del daten
+
+    with messung.stufe("migration_sqlite") as info:
+        info['zeilen'] = speicher.migriere_json(json_pfad, db_pfad)
+    if speicher.hat_pyarrow():
+        with messung.stufe("kompaktiere_parquet") as info:
+            info['zeilen'] = speicher.kompaktiere(db_pfad, parquet_pfad)
+    else:
+        parquet_pfad = None
+
+    # Ein Abrufzyklus: je Produkt eine neue Beobachtung, danach derselbe Stapel erneut
+    jetzt = datetime.now()
+    stapel = [{**eintrag, 'date': jetzt + timedelta(seconds=i)}
+              for i, eintrag in enumerate(erzeuge_historie(args.produkte, args.produkte, seed=7))]
+    with messung.stufe("speichere_daten", zeilen=len(stapel)) as info:
+        info['neu'] = len(speicher.speichere_daten(stapel, db_pfad))
+    with messung.stufe("dedup_duplikate", zeilen=len(stapel)) as info:
+        info['neu'] = len(speicher.speichere_daten(stapel, db_pfad))
+
+    with messung.stufe("lade_tabelle_sqlite") as info:
+        info['zeilen'] = len(speicher.lade_tabelle(db_pfad))
+    if parquet_pfad:
+        with messung.stufe("lade_tabelle_parquet") as info:
+            historie = speicher.lade_tabelle(db_pfad, spaltenpfad=parquet_pfad)
+            info['zeilen'] = len(historie)
+        with messung.stufe("lade_tabelle_monat") as info:
+            info['zeilen'] = len(speicher.lade_tabelle(
+                db_pfad, spalten=['product', 'price', 'date'],
+                von=jetzt - timedelta(days=30), spaltenpfad=parquet_pfad
+            ))
+    else:
+        historie = speicher.lade_tabelle(db_pfad)
+
+    with messung.stufe("historie_spalten") as info:
+        spalten = Historie.aus_tabelle(historie)
+        info['bytes_je_beobachtung'] = round(spalten.nbytes / max(1, len(spalten)), 1)
+        info['dataframe_bytes_je_beobachtung'] = round(
+            historie.memory_usage(deep=True).sum() / max(1, len(historie)), 1)
+    with messung.stufe("index_bauen"):
+        index = PreisIndex(spalten)
+
+    for granularitaet, tage in (('stunde', 7), ('tag', 30), ('woche', 365)):
+        with messung.stufe(f"statistik_{tage}_tage") as info:
+            info['produkte'] = len(speicher.lade_statistik(db_pfad, granularitaet, jetzt - timedelta(days=tage)))
+
+    # Bisheriger Export (kompletter CSV-String im Speicher) gegen den gestreamten Export in eine Datei
+    with messung.stufe("export_csv_alt") as info:
+        info['kib'] = len(historie.to_csv(index=False).encode('utf-8')) // 1024
+    for format_, (_, endung) in FORMATE.items():
+        if format_ == 'parquet' and not speicher.hat_pyarrow():
+            continue
+        ziel = os.path.join(verzeichnis, f"export{endung}")
+        with messung.stufe(f"export_{format_.replace('.', '_')}") as info:
+            with open(ziel, 'wb') as f:
+                info['zeilen'] = exportiere(db_pfad, f, format_)
+        info['kib'] = os.path.getsize(ziel) // 1024
+
+    return historie, index
+
+
+def miss_ansichten(messung, historie, index, anzeigen=8):
+    from preis_checker.tabelle import bereite_tabelle_vor, filtere, hole_seite
+
+    produkte = index.produkte[:anzeigen]
+    try:
+        from Preisalarm import erstelle_preisdiagramm
+    except Exception as e:
+        print(f"  Diagramm übersprungen: {e}")
+    else:
+        with messung.stufe("diagramm", linien=len(produkte)) as info:
+            fig = erstelle_preisdiagramm(index, produkte, (datetime.now() - timedelta(days=30), None))
+            info['json_kib'] = round(len(fig.to_json()) / 1024, 1)
+
+    # Rerun ohne neue Daten: Karten, Diagramm und Änderungen kommen aus dem Cache je Datenstand
+    try:
+        from Preisalarm import baue_preisdiagramm, berechne_preisänderungen, berechne_preiskarten
+    except Exception as e:
+        print(f"  Ansichts-Cache übersprungen: {e}")
+    else:
+        stunde = datetime.now().replace(minute=0, second=0, microsecond=0)
+
+        def ansichten():
+            berechne_preiskarten(index, len(historie), tuple(produkte), 30, stunde)
+            berechne_preisänderungen(index, len(historie), tuple(produkte))
+            baue_preisdiagramm(index, len(historie), tuple(produkte), 30, stunde)
+
+        with messung.stufe("ansichten_erster_lauf", linien=len(produkte)):
+            ansichten()
+        with messung.stufe("ansichten_rerun", linien=len(produkte)):
+            ansichten()
+
+    with messung.stufe("tabelle_vorbereiten"):
+        tabelle = bereite_tabelle_vor(historie)
+    with messung.stufe("tabelle_seite", sortierung='price'):
+        hole_seite(tabelle, filtere(tabelle, produkte=produkte), 0, 10, 'price', True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline-Benchmark des Preis-Trackers")
+    parser.add_argument("--groesse", default="10k", help="Beobachtungen der Historie: 10k, 1m, 10m")
+    parser.add_argument("--produkte", type=int, default=200)
+    parser.add_argument("--urls", type=int, default=200, help="Produktseiten pro Abrufzyklus")
+    parser.add_argument("--rate", type=float, default=50.0, help="Anfragen/Sekunde an den Stub")
+    parser.add_argument("--parallel", type=int, default=8, help="max. parallele Anfragen an den Stub")
+    parser.add_argument("--latenz-ms", type=float, default=80.0)
+    parser.add_argument("--jitter-ms", type=float, default=40.0)
+    parser.add_argument("--fehlerrate", type=float, default=0.0)
+    parser.add_argument("--cf-verzoegerung-ms", type=float, default=0.0)
+    parser.add_argument("--ohne-abruf", action="store_true")
+    parser.add_argument("--ohne-json-laden", action="store_true", help="alten JSON-Lader nicht messen")
+    parser.add_argument("--ausgabe", help="JSON-Ergebnisdatei (Standard: benchmarks/ergebnisse/...)")
+    args = parser.parse_args(argv)
+
+    messung = Messung()
+    print(f"Benchmark mit {args.groesse} Beobachtungen")
+    if not args.ohne_abruf:
+        miss_abruf(messung, args)
+    miss_parsing(messung)
+    with tempfile.TemporaryDirectory() as verzeichnis:
+        historie, index = miss_speicher(messung, args, verzeichnis)
+        miss_ansichten(messung, historie, index)
+
+    ergebnis = {
+        'zeitpunkt': datetime.now().isoformat(timespec='seconds'),
+        'git': git_stand(),
+        'python': platform.python_version(),
+        'parameter': vars(args),
+        'stufen': messung.stufen,
+    }
+    ausgabe = args.ausgabe or os.path.join(
+        ERGEBNIS_DIR, f"e2e_{args.groesse}_{datetime.now():%Y%m%d_%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(ausgabe)), exist_ok=True)
+    with open(ausgabe, 'w') as f:
+        json.dump(ergebnis, f, indent=2, default=str)
+    print(f"Ergebnisse: {ausgabe}")
+
+
+if __name__ == "__main__":
+    main()
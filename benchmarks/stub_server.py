@@ -0,0 +1,126 @@
+"""Lokaler Stub-Shop, der aufgezeichnete Produktseiten ausliefert
+
+Start: python -m benchmarks.stub_server [--port 8765] [--latenz-ms 80] [--fehlerrate 0.05]
+
+Jeder Pfad /<name>.html liefert eine der Seiten aus benchmarks/fixtures
+(gleicher Pfad -> gleiche Seite, mit ETag). Optional simuliert der Server
+Latenz mit Jitter, zufällige 503-Fehler und eine Cloudflare-artige
+Verzögerung für Clients ohne `cf_clearance`-Cookie.
+"""
+import argparse
+import glob
+import hashlib
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+class StubEinstellungen:
+    def __init__(self, latenz_ms=0.0, jitter_ms=0.0, fehlerrate=0.0, cf_verzoegerung_ms=0.0, seed=None):
+        self.latenz_ms = latenz_ms
+        self.jitter_ms = jitter_ms
+        self.fehlerrate = fehlerrate
+        self.cf_verzoegerung_ms = cf_verzoegerung_ms
+        self.zufall = random.Random(seed)
+        self.lock = threading.Lock()
+        self.zaehler = {'anfragen': 0, 'fehler': 0, 'nicht_geaendert': 0, 'challenges': 0, 'bytes': 0}
+
+    def zaehle(self, schluessel, wert=1):
+        with self.lock:
+            self.zaehler[schluessel] += wert
+
+
+def lade_seiten(verzeichnis=FIXTURES):
+    """Liest alle Fixture-Seiten als Bytes"""
+    seiten = []
+    for pfad in sorted(glob.glob(os.path.join(verzeichnis, "*.html"))):
+        with open(pfad, 'rb') as f:
+            seiten.append(f.read())
+    if not seiten:
+        raise SystemExit(f"Keine Fixtures in {verzeichnis}")
+    return seiten
+
+
+def erstelle_handler(seiten, einstellungen):
+    etags = [f'"{hashlib.sha1(seite).hexdigest()[:16]}"' for seite in seiten]
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _antworte(self, status, inhalt=b'', header=None):
+            self.send_response(status)
+            for name, wert in (header or {}).items():
+                self.send_header(name, wert)
+            self.send_header("Content-Length", str(len(inhalt)))
+            self.end_headers()
+            self.wfile.write(inhalt)
+            einstellungen.zaehle('bytes', len(inhalt))
+
+        def do_GET(self):
+            einstellungen.zaehle('anfragen')
+            with einstellungen.lock:
+                latenz = einstellungen.latenz_ms + einstellungen.zufall.uniform(0, einstellungen.jitter_ms)
+                fehler = einstellungen.zufall.random() < einstellungen.fehlerrate
+            time.sleep(latenz / 1000)
+
+            header = {}
+            if einstellungen.cf_verzoegerung_ms and 'cf_clearance' not in (self.headers.get('Cookie') or ''):
+                # Wie eine Cloudflare-Prüfseite: einmal warten, danach per Cookie durchgelassen
+                einstellungen.zaehle('challenges')
+                time.sleep(einstellungen.cf_verzoegerung_ms / 1000)
+                header['Set-Cookie'] = 'cf_clearance=stub; Path=/'
+
+            if fehler:
+                einstellungen.zaehle('fehler')
+                return self._antworte(503, b'Service Unavailable', header)
+
+            nummer = int(hashlib.md5(self.path.split('?')[0].encode()).hexdigest(), 16) % len(seiten)
+            header['ETag'] = etags[nummer]
+            if self.headers.get('If-None-Match') == etags[nummer]:
+                einstellungen.zaehle('nicht_geaendert')
+                return self._antworte(304, header=header)
+
+            header['Content-Type'] = 'text/html; charset=utf-8'
+            self._antworte(200, seiten[nummer], header)
+
+    return Handler
+
+
+def starte_stub(port=0, einstellungen=None, verzeichnis=FIXTURES):
+    """Startet den Stub im Hintergrund-Thread und liefert (Server, Basis-URL)"""
+    einstellungen = einstellungen or StubEinstellungen()
+    server = ThreadingHTTPServer(("127.0.0.1", port), erstelle_handler(lade_seiten(verzeichnis), einstellungen))
+    server.daemon_threads = True
+    server.einstellungen = einstellungen
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lokaler Stub-Shop für Benchmarks")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latenz-ms", type=float, default=80.0)
+    parser.add_argument("--jitter-ms", type=float, default=40.0)
+    parser.add_argument("--fehlerrate", type=float, default=0.0)
+    parser.add_argument("--cf-verzoegerung-ms", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    server, basis = starte_stub(args.port, StubEinstellungen(
+        args.latenz_ms, args.jitter_ms, args.fehlerrate, args.cf_verzoegerung_ms
+    ))
+    print(f"Stub-Shop läuft auf {basis} (Strg+C beendet)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Erzeugt synthetische Preishistorien im Schema von preise_5080.json
+
+Start: python -m benchmarks.synthetische_daten 1m ziel.json [--produkte 200]
+"""
+import argparse
+import json
+import random
+from datetime import datetime, timedelta
+
+SHOPS = ["Alternate", "Caseking", "Mindfactory", "Cyberport", "notebooksbilliger.de",
+         "e-tec", "DiTech", "Proshop", "Galaxus", "Amazon.de"]
+
+
+def groesse(text):
+    """'10k', '1m', '10m' oder eine Zahl -> Anzahl Beobachtungen"""
+    text = str(text).strip().lower()
+    faktor = {'k': 1_000, 'm': 1_000_000}.get(text[-1], 1)
+    return int(float(text.rstrip('km')) * faktor)
+
+
+def erzeuge_historie(anzahl, produkte=200, ende=None, intervall=timedelta(hours=1), seed=5080):
+    """Liefert `anzahl` Beobachtungen, reihum je Produkt im festen Intervall, bis `ende`
+
+    Preise laufen als Random Walk im Cent-Bereich mit seltenen Sprüngen, damit fast
+    jede Beobachtung den Duplikat-Schlüssel (Produkt, Shop, Preis, Tag) passiert.
+    Shops wechseln gelegentlich.
+    """
+    zufall = random.Random(seed)
+    ende = ende or datetime.now().replace(minute=0, second=0, microsecond=0)
+    runden = -(-anzahl // produkte)
+    start = ende - intervall * runden
+    namen = [f"Testkarte RTX 5080 Modell {i:04d}" for i in range(produkte)]
+    preise = [zufall.uniform(1100, 1600) for _ in range(produkte)]
+    shops = [zufall.choice(SHOPS) for _ in range(produkte)]
+
+    erzeugt = 0
+    for runde in range(runden):
+        datum = start + intervall * runde
+        for i, name in enumerate(namen):
+            if erzeugt >= anzahl:
+                return
+            if zufall.random() < 0.05:
+                preise[i] = max(800.0, preise[i] * zufall.uniform(0.97, 1.03))
+            else:
+                preise[i] = max(800.0, preise[i] + zufall.choice((-1, 1)) * zufall.randint(1, 500) / 100)
+            if zufall.random() < 0.02:
+                shops[i] = zufall.choice(SHOPS)
+            yield {
+                'price': round(preise[i], 2),
+                'date': datum + timedelta(microseconds=zufall.randrange(1, 1_000_000)),
+                'shop': shops[i],
+                'url': f"https://geizhals.at/testkarte-{i:04d}.html",
+                'product': name,
+            }
+            erzeugt += 1
+
+
+def schreibe_json(daten, pfad):
+    """Schreibt die Historie wie das frühere speichere_daten (ohne Einrückung, um Platz zu sparen)
+
+    Eintrag für Eintrag, damit auch 10 Mio. Beobachtungen nicht im Speicher liegen.
+    """
+    kodiere = json.JSONEncoder(default=str).encode
+    with open(pfad, 'w') as f:
+        f.write('[')
+        for i, eintrag in enumerate(daten):
+            if i:
+                f.write(', ')
+            f.write(kodiere(eintrag))
+        f.write(']')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Synthetische Preishistorie erzeugen")
+    parser.add_argument("groesse", help="z. B. 10k, 1m, 10m")
+    parser.add_argument("ziel", help="Zieldatei (.json)")
+    parser.add_argument("--produkte", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    schreibe_json(erzeuge_historie(groesse(args.groesse), args.produkte), args.ziel)
+
+
+if __name__ == "__main__":
+    main()
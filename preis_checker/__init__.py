@@ -0,0 +1 @@
+"""Hintergrundbausteine des RTX 5080 Preis-Trackers (Abruf, Parsing, Speicherung)"""
@@ -0,0 +1,51 @@
+"""Kommandozeile ohne UI-Abhängigkeiten, z. B. für cron oder systemd
+
+    python -m preis_checker scrape [--nur-faellige]   einen Abrufzyklus ausführen und beenden
+    python -m preis_checker worker [--takt SEKUNDEN]  dauerhaft im Planertakt abrufen
+    python -m preis_checker migriere [JSON_PFAD]      alte JSON-Historie übernehmen
+    python -m preis_checker kompaktiere               Parquet-Snapshot neu schreiben
+    python -m preis_checker exportiere ZIEL [--format csv|csv.gz|parquet] [--von/--bis/--produkt]
+
+Streamlit, pandas und plotly werden dabei nicht geladen; die Unterbefehle
+importieren nur die Module, die sie brauchen.
+"""
+import argparse
+
+BEFEHLE = {
+    'scrape': "Einen Abrufzyklus ausführen und beenden",
+    'worker': "Dauerhaft im Planertakt abrufen",
+    'migriere': "JSON-Historie in SQLite/Parquet übernehmen",
+    'kompaktiere': "Parquet-Snapshot neu schreiben",
+    'exportiere': "Historie gefiltert als CSV/Parquet exportieren",
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m preis_checker",
+        description="RTX 5080 Preis-Tracker ohne Dashboard",
+        epilog="\n".join(f"  {befehl:<12} {hilfe}" for befehl, hilfe in BEFEHLE.items()),
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("befehl", choices=list(BEFEHLE))
+    parser.add_argument("argumente", nargs=argparse.REMAINDER, help="Optionen des Unterbefehls")
+    args = parser.parse_args(argv)
+
+    if args.befehl in ('scrape', 'worker'):
+        from . import worker
+
+        einmal = ['--einmal'] if args.befehl == 'scrape' else []
+        return worker.main(einmal + args.argumente)
+
+    if args.befehl == 'exportiere':
+        from . import export
+
+        return export.main(args.argumente)
+
+    from . import speicher
+
+    return speicher.main([args.befehl] + args.argumente)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
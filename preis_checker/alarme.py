@@ -0,0 +1,289 @@
+"""Inkrementelle Auswertung von Preisalarmen
+
+Regeln werden pro Produkt indiziert und nur gegen neu gespeicherte
+Beobachtungen geprüft. Der laufende Zustand je Produkt (bisheriges Tief,
+zuletzt günstigster Shop) liegt in einer eigenen Tabelle, sodass ein Zyklus
+nur O(neue Zeilen) kostet statt die Historie erneut zu lesen.
+
+Regeltypen:
+    preis_unter   Preis fällt auf oder unter `schwelle` (Euro)
+    rueckgang     Preis liegt `schwelle` Prozent unter dem Höchstpreis der letzten `fenster_tage`
+    allzeittief   Neuer Tiefstpreis seit Beginn der Aufzeichnung
+    shopwechsel   Der günstigste Shop hat gewechselt
+
+Schwellenregeln lösen flankengesteuert aus: erst wenn die Bedingung wieder
+verletzt war, kann dieselbe Regel erneut feuern.
+"""
+import json
+import os
+from datetime import datetime, timedelta
+
+from .rollups import BUCKETFORMAT, bucket_start
+
+REGELTYPEN = {
+    'preis_unter': "Preis unter",
+    'rueckgang': "Preisrückgang in %",
+    'allzeittief': "Neues Allzeittief",
+    'shopwechsel': "Günstigster Shop wechselt",
+}
+
+ALARM_SCHEMA = """
+CREATE TABLE IF NOT EXISTS regeln (
+    id           INTEGER PRIMARY KEY,
+    product      TEXT NOT NULL,
+    typ          TEXT NOT NULL,
+    schwelle     REAL,
+    fenster_tage INTEGER,
+    ausgeloest   INTEGER NOT NULL DEFAULT 0,
+    erstellt     TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS regeln_produkt ON regeln (product);
+CREATE TABLE IF NOT EXISTS alarm_zustand (
+    product      TEXT PRIMARY KEY,
+    tiefstpreis  REAL,
+    letzter_shop TEXT
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS alarme (
+    id         INTEGER PRIMARY KEY,
+    regel_id   INTEGER NOT NULL,
+    product    TEXT NOT NULL,
+    typ        TEXT NOT NULL,
+    price      REAL NOT NULL,
+    shop       TEXT NOT NULL,
+    url        TEXT,
+    nachricht  TEXT NOT NULL,
+    date       TEXT NOT NULL,
+    schluessel TEXT NOT NULL,
+    zugestellt INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (regel_id, schluessel)
+);
+"""
+
+
+def lege_regel_an(conn, product, typ, schwelle=None, fenster_tage=None):
+    """Speichert eine neue Regel und liefert ihre id"""
+    if typ not in REGELTYPEN:
+        raise ValueError(f"Unbekannter Regeltyp: {typ}")
+    if typ in ('preis_unter', 'rueckgang') and schwelle is None:
+        raise ValueError(f"Regeltyp {typ} braucht eine Schwelle")
+    if typ in ('preis_unter', 'rueckgang') and schwelle <= 0:
+        # Eine Schwelle von 0 € bzw. 0 % könnte nie auslösen
+        raise ValueError(f"Die Schwelle für {REGELTYPEN[typ]} muss größer als 0 sein")
+    if typ == 'rueckgang' and not fenster_tage:
+        raise ValueError("Regeltyp rueckgang braucht ein Zeitfenster")
+    with conn:
+        return conn.execute(
+            "INSERT INTO regeln (product, typ, schwelle, fenster_tage, erstellt) VALUES (?, ?, ?, ?, ?)",
+            (product, typ, schwelle, fenster_tage, datetime.now().isoformat(timespec='seconds'))
+        ).lastrowid
+
+
+def loesche_regel(conn, regel_id):
+    """Entfernt eine Regel; bereits ausgelöste Alarme bleiben erhalten"""
+    with conn:
+        conn.execute("DELETE FROM regeln WHERE id = ?", (regel_id,))
+
+
+def regeln(conn):
+    """Alle Regeln als Liste von Dicts"""
+    cursor = conn.execute(
+        "SELECT id, product, typ, schwelle, fenster_tage, ausgeloest, erstellt FROM regeln ORDER BY product, id"
+    )
+    spalten = [beschreibung[0] for beschreibung in cursor.description]
+    return [dict(zip(spalten, zeile)) for zeile in cursor]
+
+
+def alarme(conn, limit=100):
+    """Die zuletzt ausgelösten Alarme, neueste zuerst"""
+    cursor = conn.execute(
+        "SELECT id, regel_id, product, typ, price, shop, url, nachricht, date, zugestellt "
+        "FROM alarme ORDER BY id DESC LIMIT ?", (limit,)
+    )
+    spalten = [beschreibung[0] for beschreibung in cursor.description]
+    return [dict(zip(spalten, zeile)) for zeile in cursor]
+
+
+def ausstehende(conn, limit=100):
+    """Noch nicht zugestellte Alarme, älteste zuerst, in derselben Form wie frisch ausgelöste"""
+    cursor = conn.execute(
+        "SELECT id, regel_id, product, typ, price, shop, url, nachricht, date "
+        "FROM alarme WHERE zugestellt = 0 ORDER BY id LIMIT ?", (limit,)
+    )
+    spalten = [beschreibung[0] for beschreibung in cursor.description]
+    return [dict(zip(spalten, zeile)) for zeile in cursor]
+
+
+def _regelindex(conn, produkte):
+    """Regeln nur der betroffenen Produkte, gruppiert nach Produkt"""
+    index = {}
+    platzhalter = ", ".join("?" * len(produkte))
+    for zeile in conn.execute(
+        f"SELECT id, product, typ, schwelle, fenster_tage, ausgeloest FROM regeln WHERE product IN ({platzhalter})",
+        list(produkte)
+    ):
+        regel = dict(zip(('id', 'product', 'typ', 'schwelle', 'fenster_tage', 'ausgeloest'), zeile))
+        index.setdefault(regel['product'], []).append(regel)
+    return index
+
+
+def _zustand(conn, product, vor_datum):
+    """Laufender Zustand eines Produkts; beim ersten Mal aus der Historie vor den neuen Zeilen"""
+    zeile = conn.execute(
+        "SELECT tiefstpreis, letzter_shop FROM alarm_zustand WHERE product = ?", (product,)
+    ).fetchone()
+    if zeile:
+        return {'tiefstpreis': zeile[0], 'letzter_shop': zeile[1]}
+
+    tiefstpreis = conn.execute(
+        "SELECT MIN(price) FROM preise WHERE product = ? AND date < ?", (product, vor_datum)
+    ).fetchone()[0]
+    letzter = conn.execute(
+        "SELECT shop FROM preise WHERE product = ? AND date < ? ORDER BY date DESC LIMIT 1",
+        (product, vor_datum)
+    ).fetchone()
+    return {'tiefstpreis': tiefstpreis, 'letzter_shop': letzter[0] if letzter else None}
+
+
+def _hoechstpreis(conn, product, von):
+    """Höchstpreis seit `von` aus den Tages-Rollups (einschließlich des Tages, in den `von` fällt)"""
+    return conn.execute(
+        "SELECT MAX(high) FROM rollups WHERE granularitaet = 'tag' AND product = ? AND bucket >= ?",
+        (product, bucket_start(von, 'tag').strftime(BUCKETFORMAT))
+    ).fetchone()[0]
+
+
+def _pruefe(conn, regel, eintrag, zustand):
+    """Liefert (Bedingung erfüllt, Nachricht) für eine Regel und eine neue Beobachtung"""
+    preis, shop, typ = eintrag['price'], eintrag['shop'], regel['typ']
+    if typ == 'preis_unter':
+        return preis <= regel['schwelle'], f"Preis {preis:.2f} € liegt unter {regel['schwelle']:.2f} €"
+    if typ == 'rueckgang':
+        von = eintrag['date'] - timedelta(days=regel['fenster_tage'])
+        hoechst = _hoechstpreis(conn, eintrag['product'], von)
+        if not hoechst:
+            return False, ""
+        rueckgang = (hoechst - preis) / hoechst * 100
+        return (rueckgang >= regel['schwelle'],
+                f"Preis {preis:.2f} € liegt {rueckgang:.1f}% unter dem Höchstpreis "
+                f"der letzten {regel['fenster_tage']} Tage ({hoechst:.2f} €)")
+    if typ == 'allzeittief':
+        bisher = zustand['tiefstpreis']
+        return (bisher is not None and preis < bisher,
+                f"Neues Allzeittief: {preis:.2f} € (bisher {bisher or 0:.2f} €)")
+    if typ == 'shopwechsel':
+        bisher = zustand['letzter_shop']
+        return (bisher is not None and shop != bisher,
+                f"Günstigster Shop wechselt von {bisher} zu {shop} ({preis:.2f} €)")
+    return False, ""
+
+
+def werte_aus(conn, neue_daten):
+    """Prüft die Regeln gegen neue Beobachtungen, speichert ausgelöste Alarme und liefert sie"""
+    if not neue_daten:
+        return []
+
+    from .speicher import DATUMSFORMAT
+
+    index = _regelindex(conn, {eintrag['product'] for eintrag in neue_daten})
+    zustaende = {}
+    ausgeloest = []
+    with conn:
+        for eintrag in sorted(neue_daten, key=lambda e: e['date']):
+            product = eintrag['product']
+            zeitstempel = eintrag['date'].strftime(DATUMSFORMAT)
+            if product not in zustaende:
+                zustaende[product] = _zustand(conn, product, zeitstempel)
+            zustand = zustaende[product]
+
+            for regel in index.get(product, ()):
+                erfuellt, nachricht = _pruefe(conn, regel, eintrag, zustand)
+                if regel['typ'] in ('preis_unter', 'rueckgang'):
+                    # Flanke: nur beim Übergang von "nicht erfüllt" zu "erfüllt" auslösen
+                    if erfuellt == bool(regel['ausgeloest']):
+                        continue
+                    regel['ausgeloest'] = int(erfuellt)
+                    conn.execute("UPDATE regeln SET ausgeloest = ? WHERE id = ?", (regel['ausgeloest'], regel['id']))
+                if not erfuellt:
+                    continue
+
+                alarm = {
+                    'regel_id': regel['id'], 'product': product, 'typ': regel['typ'],
+                    'price': eintrag['price'], 'shop': eintrag['shop'], 'url': eintrag.get('url'),
+                    'nachricht': nachricht, 'date': zeitstempel,
+                }
+                schluessel = f"{eintrag['date'].date().isoformat()}|{eintrag['shop']}|{eintrag['price']:.2f}"
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO alarme (regel_id, product, typ, price, shop, url, nachricht, date, schluessel) "
+                    "VALUES (:regel_id, :product, :typ, :price, :shop, :url, :nachricht, :date, :schluessel)",
+                    {**alarm, 'schluessel': schluessel}
+                )
+                if cursor.rowcount:
+                    alarm['id'] = cursor.lastrowid
+                    ausgeloest.append(alarm)
+
+            if zustand['tiefstpreis'] is None or eintrag['price'] < zustand['tiefstpreis']:
+                zustand['tiefstpreis'] = eintrag['price']
+            zustand['letzter_shop'] = eintrag['shop']
+
+        conn.executemany(
+            "INSERT OR REPLACE INTO alarm_zustand (product, tiefstpreis, letzter_shop) VALUES (?, ?, ?)",
+            [(product, z['tiefstpreis'], z['letzter_shop']) for product, z in zustaende.items()]
+        )
+    return ausgeloest
+
+
+def markiere_zugestellt(conn, alarm_ids):
+    """Vermerkt erfolgreich zugestellte Alarme"""
+    with conn:
+        conn.executemany("UPDATE alarme SET zugestellt = 1 WHERE id = ?", [(i,) for i in alarm_ids])
+
+
+# ========== BENACHRICHTIGUNG ==========
+class DateiBenachrichtiger:
+    """Hängt Alarme als JSON-Zeilen an eine lokale Datei an"""
+
+    def __init__(self, pfad):
+        self.pfad = pfad
+
+    def sende(self, alarm):
+        verzeichnis = os.path.dirname(self.pfad)
+        if verzeichnis:
+            os.makedirs(verzeichnis, exist_ok=True)
+        with open(self.pfad, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(alarm, ensure_ascii=False) + "\n")
+
+
+class WebhookBenachrichtiger:
+    """Schickt jeden Alarm als JSON per POST an eine URL"""
+
+    def __init__(self, url, timeout=10):
+        self.url = url
+        self.timeout = timeout
+
+    def sende(self, alarm):
+        import urllib.request
+
+        anfrage = urllib.request.Request(
+            self.url,
+            data=json.dumps(alarm, ensure_ascii=False).encode('utf-8'),
+            headers={'Content-Type': 'application/json'},
+            method='POST'
+        )
+        with urllib.request.urlopen(anfrage, timeout=self.timeout) as antwort:
+            antwort.read()
+
+
+def benachrichtige(alarme, benachrichtiger):
+    """Stellt Alarme über alle Benachrichtiger zu und liefert die ids der vollständig zugestellten"""
+    zugestellt = []
+    for alarm in alarme:
+        erfolgreich = True
+        for kanal in benachrichtiger:
+            try:
+                kanal.sende(alarm)
+            except Exception as e:
+                erfolgreich = False
+                print(f"Alarm {alarm['id']} über {type(kanal).__name__} nicht zugestellt: {e}")
+        if erfolgreich:
+            zugestellt.append(alarm['id'])
+    return zugestellt
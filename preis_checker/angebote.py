@@ -0,0 +1,132 @@
+"""Kompakte Speicherung vollständiger Angebotslisten (Marktbilder)
+
+Jeder Abruf einer Produktseite liefert alle Angebote (Shop, Preis, Versand,
+Verfügbarkeit). Ein Marktbild fasst sie unter dem Zeitstempel der Beobachtung
+zusammen; Shops werden interniert, Beträge als Cent-Ganzzahlen und die
+Verfügbarkeit als kleiner Code abgelegt. Ist die Angebotsliste identisch mit
+dem letzten Marktbild des Produkts, wird kein neues angelegt – der Stand zu
+einem Zeitpunkt ist immer das jüngste Marktbild davor.
+"""
+import hashlib
+
+# Position = Rang im Marktbild; ein Shop kann mehrere Angebote zum selben Preis haben
+ANGEBOTE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shops (
+    id   INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS marktbilder (
+    id      INTEGER PRIMARY KEY,
+    product TEXT NOT NULL,
+    date    TEXT NOT NULL,
+    hash    TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS marktbilder_produkt_datum ON marktbilder (product, date);
+CREATE TABLE IF NOT EXISTS angebote (
+    marktbild      INTEGER NOT NULL,
+    position       INTEGER NOT NULL,
+    shop           INTEGER NOT NULL,
+    preis_cent     INTEGER NOT NULL,
+    versand_cent   INTEGER,
+    verfuegbarkeit INTEGER NOT NULL,
+    PRIMARY KEY (marktbild, position)
+) WITHOUT ROWID;
+"""
+
+VERFUEGBARKEITEN = {0: "unbekannt", 1: "lagernd", 2: "kurzfristig", 3: "bestellt", 4: "nicht lagernd"}
+
+
+def verfuegbarkeit_code(text):
+    """Ordnet den Verfügbarkeitstext eines Shops einer der Stufen in VERFUEGBARKEITEN zu"""
+    text = (text or '').lower()
+    if 'nicht lagernd' in text or 'nicht verfügbar' in text:
+        return 4
+    if text.startswith('lagernd') or 'sofort' in text:
+        return 1
+    if 'kurzfristig' in text:
+        return 2
+    if 'bestellt' in text or 'lieferung' in text:
+        return 3
+    return 0
+
+
+def _cent(betrag):
+    return None if betrag is None else round(betrag * 100)
+
+
+def _zeilen(angebote):
+    """Angebote als sortierte, vergleichbare Tupel (Shopname, Preis, Versand, Verfügbarkeit)"""
+    # Liste statt Menge: auch völlig gleiche Angebote eines Shops bleiben einzeln erhalten
+    return sorted([
+        (angebot['shop'], _cent(angebot['price']), _cent(angebot.get('shipping')),
+         verfuegbarkeit_code(angebot.get('availability')))
+        for angebot in angebote
+    ], key=lambda z: (z[1], z[0], -1 if z[2] is None else z[2], z[3]))
+
+
+def _shop_ids(conn, namen):
+    conn.executemany("INSERT OR IGNORE INTO shops (name) VALUES (?)", ((name,) for name in namen))
+    platzhalter = ", ".join("?" * len(namen))
+    return dict(conn.execute(f"SELECT name, id FROM shops WHERE name IN ({platzhalter})", list(namen)))
+
+
+def speichere(conn, daten):
+    """Legt für Beobachtungen mit Angebotsliste ein Marktbild an, sofern es sich geändert hat"""
+    from .speicher import DATUMSFORMAT
+
+    angelegt = 0
+    for eintrag in daten:
+        if not eintrag.get('angebote'):
+            continue
+        zeilen = _zeilen(eintrag['angebote'])
+        inhalt_hash = hashlib.sha1(repr(zeilen).encode('utf-8')).hexdigest()
+        letzter = conn.execute(
+            "SELECT hash FROM marktbilder WHERE product = ? ORDER BY date DESC LIMIT 1", (eintrag['product'],)
+        ).fetchone()
+        if letzter and letzter[0] == inhalt_hash:
+            continue
+
+        marktbild = conn.execute(
+            "INSERT INTO marktbilder (product, date, hash) VALUES (?, ?, ?)",
+            (eintrag['product'], eintrag['date'].strftime(DATUMSFORMAT), inhalt_hash)
+        ).lastrowid
+        shop_ids = _shop_ids(conn, {zeile[0] for zeile in zeilen})
+        conn.executemany(
+            "INSERT INTO angebote (marktbild, position, shop, preis_cent, versand_cent, verfuegbarkeit) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            ((marktbild, position, shop_ids[shop], preis, versand, code)
+             for position, (shop, preis, versand, code) in enumerate(zeilen))
+        )
+        angelegt += 1
+    return angelegt
+
+
+def marktbild(conn, product, zeitpunkt=None):
+    """Angebote des jüngsten Marktbilds bis `zeitpunkt` (Standard: aktuell), günstigste zuerst"""
+    from .speicher import DATUMSFORMAT
+
+    sql = "SELECT id, date FROM marktbilder WHERE product = ?"
+    parameter = [product]
+    if zeitpunkt is not None:
+        sql += " AND date <= ?"
+        parameter.append(zeitpunkt.strftime(DATUMSFORMAT))
+    kopf = conn.execute(sql + " ORDER BY date DESC LIMIT 1", parameter).fetchone()
+    if not kopf:
+        return []
+
+    marktbild_id, datum = kopf
+    return [
+        {
+            'shop': shop,
+            'price': preis / 100,
+            'shipping': None if versand is None else versand / 100,
+            'availability': VERFUEGBARKEITEN[code],
+            'date': datum,
+        }
+        for shop, preis, versand, code in conn.execute(
+            "SELECT s.name, a.preis_cent, a.versand_cent, a.verfuegbarkeit "
+            "FROM angebote a JOIN shops s ON s.id = a.shop WHERE a.marktbild = ? "
+            "ORDER BY a.preis_cent + COALESCE(a.versand_cent, 0), s.name",
+            (marktbild_id,)
+        )
+    ]
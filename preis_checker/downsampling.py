@@ -0,0 +1,83 @@
+"""Formerhaltendes Ausdünnen von Preisreihen vor der Übergabe an Plotly"""
+import numpy as np
+
+
+def lttb(x, y, ziel):
+    """Largest-Triangle-Three-Buckets; liefert die Indizes der beizubehaltenden Punkte
+
+    Erster und letzter Punkt bleiben immer erhalten. `x` darf datetime64 sein.
+    """
+    n = len(y)
+    if ziel >= n or ziel < 3:
+        return np.arange(n)
+
+    x = np.asarray(x).astype('int64').astype('float64')
+    y = np.asarray(y, dtype='float64')
+    # ziel - 2 innere Buckets zwischen erstem und letztem Punkt
+    kanten = np.linspace(1, n - 1, ziel - 1).astype('int64')
+
+    indizes = np.empty(ziel, dtype='int64')
+    indizes[0] = 0
+    a = 0
+    for i in range(ziel - 2):
+        start, ende = kanten[i], kanten[i + 1]
+        naechster_start = kanten[i + 1]
+        naechstes_ende = kanten[i + 2] if i + 2 < len(kanten) else n
+        mittel_x = x[naechster_start:naechstes_ende].mean()
+        mittel_y = y[naechster_start:naechstes_ende].mean()
+
+        flaechen = np.abs(
+            (x[a] - mittel_x) * (y[start:ende] - y[a])
+            - (x[a] - x[start:ende]) * (mittel_y - y[a])
+        )
+        a = start + int(flaechen.argmax())
+        indizes[i + 1] = a
+    indizes[-1] = n - 1
+    return indizes
+
+
+def minmax(y, buckets):
+    """Minimum und Maximum je Bucket (z. B. je Pixelspalte); liefert sortierte Indizes"""
+    n = len(y)
+    if 2 * buckets >= n or buckets < 1:
+        return np.arange(n)
+
+    y = np.asarray(y, dtype='float64')
+    kanten = np.linspace(0, n, buckets + 1).astype('int64')
+    minima = np.minimum.reduceat(y, kanten[:-1])
+    maxima = np.maximum.reduceat(y, kanten[:-1])
+
+    indizes = []
+    for start, ende, tief, hoch in zip(kanten[:-1], kanten[1:], minima, maxima):
+        abschnitt = y[start:ende]
+        indizes.append(start + int(np.argmax(abschnitt == tief)))
+        indizes.append(start + int(np.argmax(abschnitt == hoch)))
+    return np.unique(np.array(indizes + [0, n - 1], dtype='int64'))
+
+
+def duenne_aus(x, y, ziel, sichtbereich=None, verfahren='lttb'):
+    """Dünnt eine Reihe auf etwa `ziel` Punkte im sichtbaren Bereich aus
+
+    Außerhalb von `sichtbereich=(von, bis)` bleibt nur ein Achtel des Budgets,
+    damit Rangeslider und "Alles" weiterhin den Gesamtverlauf zeigen.
+    """
+    def indizes_fuer(auswahl, budget):
+        if verfahren == 'minmax':
+            return minmax(y[auswahl], max(1, budget // 2))
+        return lttb(x[auswahl], y[auswahl], budget)
+
+    if sichtbereich is None:
+        auswahl = indizes_fuer(slice(None), ziel)
+        return x[auswahl], y[auswahl]
+
+    von, bis = (np.datetime64(grenze, 'us') if grenze is not None else None for grenze in sichtbereich)
+    start = np.searchsorted(x, von) if von is not None else 0
+    ende = np.searchsorted(x, bis, side='right') if bis is not None else len(x)
+    rand_budget = max(3, ziel // 8)
+
+    teile = []
+    for anfang, schluss, budget in ((0, start, rand_budget), (start, ende, ziel), (ende, len(x), rand_budget)):
+        if schluss > anfang:
+            teile.append(anfang + indizes_fuer(slice(anfang, schluss), budget))
+    auswahl = np.concatenate(teile) if teile else np.arange(0)
+    return x[auswahl], y[auswahl]
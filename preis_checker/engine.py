@@ -0,0 +1,379 @@
+"""Paralleler Abruf aller Produktseiten mit Höflichkeitsbudget pro Host
+
+Produkte mit derselben kanonischen URL werden nur einmal abgerufen; über
+`EinzelFlug` teilen sich gleichzeitige Abrufe derselben URL eine Anfrage und
+frische Ergebnisse werden prozessweit kurz vorgehalten.
+
+Fehlgeschlagene Abrufe werden nicht im Worker-Thread abgewartet, sondern mit
+zufällig gestreutem Backoff neu eingeplant. Eine Sicherung je Host sperrt einen
+ausgefallenen Shop vorübergehend, und eine Frist begrenzt die Dauer des ganzen
+Zyklus; was bis dahin fehlt, wird mit Grund als Ausfall gemeldet.
+"""
+import heapq
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from .metriken import METRIKEN
+
+# (Anfragen pro Sekunde, max. gleichzeitige Anfragen) für Hosts ohne eigenen Eintrag
+STANDARD_LIMIT = (1.0, 2)
+
+# Query-Parameter, die nur Darstellung/Tracking steuern und dieselbe Seite liefern
+TRACKING_PARAMETER = {'hloc', 'nocookie', 'fbclid', 'gclid', 'ref'}
+
+# Warum ein Produkt im Zyklus kein Ergebnis erhalten hat
+AUSFALLGRUENDE = {
+    'fehler': "Abruf fehlgeschlagen",
+    'kein_preis': "Kein Preis auf der Seite",
+    'sicherung': "Shop vorübergehend gesperrt",
+    'frist': "Zeitlimit des Abrufzyklus erreicht",
+}
+
+
+def host_von(url):
+    """Liefert den Hostnamen einer URL ohne führendes 'www.'"""
+    host = (urlsplit(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def normalisiere_url(url):
+    """Kanonische Form einer URL: Schema/Host klein, ohne Tracking-Parameter und Fragment"""
+    teile = urlsplit(url.strip())
+    parameter = sorted(
+        (schluessel, wert)
+        for schluessel, wert in parse_qsl(teile.query, keep_blank_values=True)
+        if schluessel.lower() not in TRACKING_PARAMETER and not schluessel.lower().startswith('utm_')
+    )
+    return urlunsplit((teile.scheme.lower(), teile.netloc.lower(), teile.path or '/', urlencode(parameter), ''))
+
+
+class EinzelFlug:
+    """Bündelt gleichzeitige Aufrufe mit gleichem Schlüssel zu einer Ausführung (Single-Flight)
+
+    Erfolgreiche Ergebnisse (nicht None) bleiben `ttl` Sekunden im Cache; Aufrufer
+    dürfen sie daher nicht verändern.
+    """
+
+    def __init__(self, ttl=0.0, max_eintraege=4096):
+        self.ttl = ttl
+        self.max_eintraege = max_eintraege
+        self._lock = threading.Lock()
+        self._laufend = {}
+        self._cache = {}
+
+    def fuehre_aus(self, schluessel, funktion):
+        with self._lock:
+            treffer = self._cache.get(schluessel)
+            if treffer and time.monotonic() - treffer[0] < self.ttl:
+                METRIKEN.zaehle('abrufe_zusammengelegt', grund='cache')
+                return treffer[1]
+            future = self._laufend.get(schluessel)
+            fuehrend = future is None
+            if fuehrend:
+                future = self._laufend[schluessel] = Future()
+
+        if not fuehrend:
+            METRIKEN.zaehle('abrufe_zusammengelegt', grund='laufend')
+            return future.result()
+
+        try:
+            ergebnis = funktion()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._laufend.pop(schluessel, None)
+        if ergebnis is not None and self.ttl > 0:
+            self._merke(schluessel, ergebnis)
+        future.set_result(ergebnis)
+        return ergebnis
+
+    def _merke(self, schluessel, ergebnis):
+        jetzt = time.monotonic()
+        with self._lock:
+            if len(self._cache) >= self.max_eintraege:
+                self._cache = {k: v for k, v in self._cache.items() if jetzt - v[0] < self.ttl}
+            self._cache[schluessel] = (jetzt, ergebnis)
+
+
+class HostLimit:
+    """Token-Bucket (Rate) plus Semaphore (parallele Anfragen) für einen Host"""
+
+    def __init__(self, rate, max_parallel):
+        self.intervall = 1.0 / rate if rate and rate > 0 else 0.0
+        self._semaphore = threading.BoundedSemaphore(max(1, int(max_parallel)))
+        self._lock = threading.Lock()
+        self._naechster_slot = 0.0
+
+    def _warte_auf_slot(self):
+        # Slots werden unter dem Lock vergeben, gewartet wird außerhalb
+        with self._lock:
+            slot = max(time.monotonic(), self._naechster_slot)
+            self._naechster_slot = slot + self.intervall
+        wartezeit = slot - time.monotonic()
+        if wartezeit > 0:
+            time.sleep(wartezeit)
+
+    def __enter__(self):
+        self._betrete()
+        return self
+
+    def __exit__(self, *exc):
+        self._semaphore.release()
+        return False
+
+    def _betrete(self, vorab=None):
+        self._semaphore.acquire()
+        try:
+            if vorab:
+                vorab()
+            self._warte_auf_slot()
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+    @contextmanager
+    def slot(self, vorab=None):
+        """Wie `with limit:`; `vorab()` läuft nach dem Semaphor und vor dem Reservieren des Zeitslots
+
+        Bricht `vorab` mit einer Ausnahme ab, wird kein Zeitslot verbraucht.
+        """
+        self._betrete(vorab)
+        try:
+            yield self
+        finally:
+            self._semaphore.release()
+
+
+class HostLimiter:
+    """Verwaltet je Host ein eigenes HostLimit"""
+
+    def __init__(self, limits=None, standard=STANDARD_LIMIT):
+        self._limits = {host.lower(): wert for host, wert in (limits or {}).items()}
+        self._standard = standard
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def fuer(self, url):
+        """Liefert das (ggf. neu angelegte) Limit für den Host der URL"""
+        host = host_von(url)
+        with self._lock:
+            if host not in self._hosts:
+                rate, max_parallel = self._limits.get(host, self._standard)
+                self._hosts[host] = HostLimit(rate, max_parallel)
+            return self._hosts[host]
+
+
+class SicherungOffen(Exception):
+    """Die Sicherung des Hosts war beim Absenden offen; es ging keine Anfrage raus"""
+
+
+class HostSicherung:
+    """Sicherung (Circuit Breaker) für einen Host
+
+    Nach `schwelle` Fehlern in Folge ist sie offen und lässt `abkuehlzeit`
+    Sekunden lang keine Anfrage durch. Danach ist sie halb offen: genau ein
+    Probeabruf darf durch, sein Erfolg schließt sie, ein Fehler öffnet sie erneut.
+    """
+
+    GESCHLOSSEN, OFFEN, HALBOFFEN = 'geschlossen', 'offen', 'halboffen'
+
+    def __init__(self, host, schwelle=5, abkuehlzeit=300.0):
+        self.host = host
+        self.schwelle = schwelle
+        self.abkuehlzeit = abkuehlzeit
+        self.zustand = self.GESCHLOSSEN
+        self._fehler_in_folge = 0
+        self._seit = 0.0
+        self._lock = threading.Lock()
+
+    def gesperrt(self, jetzt=None):
+        """Ist der Host gerade gesperrt? Ändert den Zustand nicht und verbraucht keine Probe"""
+        jetzt = time.monotonic() if jetzt is None else jetzt
+        with self._lock:
+            return self.zustand != self.GESCHLOSSEN and jetzt - self._seit < self.abkuehlzeit
+
+    def erlaubt(self, jetzt=None):
+        """Darf jetzt eine Anfrage an den Host gehen? Im halb offenen Zustand nur die Probe"""
+        jetzt = time.monotonic() if jetzt is None else jetzt
+        with self._lock:
+            if self.zustand == self.GESCHLOSSEN:
+                return True
+            # Offen nach Ablauf der Abkühlzeit, oder eine Probe ist verschollen (z. B. an der Frist abgebrochen)
+            if jetzt - self._seit >= self.abkuehlzeit:
+                self._setze(self.HALBOFFEN, jetzt)
+                return True
+            return False
+
+    def erfolg(self):
+        with self._lock:
+            self._fehler_in_folge = 0
+            if self.zustand != self.GESCHLOSSEN:
+                self._setze(self.GESCHLOSSEN, time.monotonic())
+
+    def fehler(self, jetzt=None):
+        jetzt = time.monotonic() if jetzt is None else jetzt
+        with self._lock:
+            self._fehler_in_folge += 1
+            if self.zustand == self.HALBOFFEN or (
+                    self.zustand == self.GESCHLOSSEN and self._fehler_in_folge >= self.schwelle):
+                METRIKEN.zaehle('sicherung_ausgeloest', host=self.host)
+                self._setze(self.OFFEN, jetzt)
+
+    def _setze(self, zustand, jetzt):
+        self.zustand = zustand
+        self._seit = jetzt
+        METRIKEN.setze('sicherung_offen', int(zustand != self.GESCHLOSSEN), host=self.host)
+
+
+class Sicherungen:
+    """Verwaltet je Host eine eigene HostSicherung"""
+
+    def __init__(self, schwelle=5, abkuehlzeit=300.0):
+        self.schwelle = schwelle
+        self.abkuehlzeit = abkuehlzeit
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def fuer(self, url):
+        """Liefert die (ggf. neu angelegte) Sicherung für den Host der URL"""
+        host = host_von(url)
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = HostSicherung(host, self.schwelle, self.abkuehlzeit)
+            return self._hosts[host]
+
+
+def backoff(versuch, basis=1.0, maximum=30.0):
+    """Wartezeit vor Wiederholung `versuch + 1`: zufällig zwischen 0 und basis * 2**versuch (Full Jitter)"""
+    return random.uniform(0, min(maximum, basis * 2 ** versuch))
+
+
+def scrape_parallel(produkte, scrape_funktion, limiter=None, max_worker=16, bei_fortschritt=None,
+                    einzelflug=None, versuche=1, backoff_basis=1.0, sicherungen=None, frist=None,
+                    ausfaelle=None):
+    """Scrapt alle Produkte parallel und liefert {Produktname: Ergebnis oder None}
+
+    Jede kanonische URL wird nur einmal abgerufen; Produkte mit derselben Seite
+    erhalten je eine eigene Kopie des Ergebnisses. Mit `einzelflug` teilen sich
+    auch Abrufe aus anderen Threads bzw. kurz aufeinanderfolgende Zyklen eine Anfrage.
+
+    `scrape_funktion(url)` führt genau einen Versuch aus. Ohne Ergebnis wird die
+    URL bis zu `versuche` Mal mit Backoff neu eingeplant, ohne einen Thread zu
+    blockieren. Mit `sicherungen` wird unmittelbar vor dem Absenden (nach dem
+    Warten auf das Host-Limit) geprüft, ob der Host gesperrt ist. Nach `frist`
+    Sekunden endet der Zyklus, laufende Abrufe werden nicht mehr abgewartet.
+    In `ausfaelle` (Dict) wird je Produkt ohne Ergebnis der Grund aus
+    AUSFALLGRUENDE eingetragen.
+
+    `bei_fortschritt(fertig, gesamt, name)` wird im aufrufenden Thread aufgerufen,
+    sobald ein Ergebnis vorliegt, und darf daher Streamlit-Elemente aktualisieren.
+    """
+    if not produkte:
+        return {}
+
+    limiter = limiter or HostLimiter()
+    ende = time.monotonic() + frist if frist else None
+
+    namen_je_url = {}
+    for name, url in produkte.items():
+        namen_je_url.setdefault(normalisiere_url(url), []).append(name)
+    METRIKEN.zaehle('abrufe_zusammengelegt', len(produkte) - len(namen_je_url), grund='katalog')
+
+    def abruf(url):
+        sicherung = sicherungen.fuer(url) if sicherungen else None
+
+        def pruefe_vorab():
+            # Gesperrte Hosts verbrauchen keinen Zeitslot des Host-Limits
+            if sicherung and sicherung.gesperrt():
+                raise SicherungOffen(sicherung.host)
+
+        def begrenzt():
+            with limiter.fuer(url).slot(pruefe_vorab):
+                # Maßgeblich erst hier: Während des Wartens auf den Slot kann die Sicherung ausgelöst haben
+                if sicherung and not sicherung.erlaubt():
+                    raise SicherungOffen(sicherung.host)
+                return scrape_funktion(url)
+        return einzelflug.fuehre_aus(url, begrenzt) if einzelflug else begrenzt()
+
+    ergebnisse = {}
+    fertig = 0
+    # URLs, für die mindestens eine Anfrage tatsächlich abgeschickt wurde
+    gesendet = set()
+
+    def abschliessen(url, ergebnis, grund=None):
+        nonlocal fertig
+        for name in namen_je_url[url]:
+            ergebnisse[name] = dict(ergebnis) if ergebnis is not None else None
+            if ergebnis is None and ausfaelle is not None:
+                ausfaelle[name] = grund
+            fertig += 1
+            if bei_fortschritt:
+                bei_fortschritt(fertig, len(produkte), name)
+
+    # (bereit ab, URL, Versuch): fällige Abrufe und eingeplante Wiederholungen
+    geplant = [(0.0, url, 0) for url in namen_je_url]
+    laufend = {}
+    pool = ThreadPoolExecutor(max_workers=max(1, min(max_worker, len(namen_je_url))))
+    try:
+        while geplant or laufend:
+            jetzt = time.monotonic()
+            if ende is not None and jetzt >= ende:
+                break
+            while geplant and geplant[0][0] <= jetzt:
+                _, url, versuch = heapq.heappop(geplant)
+                laufend[pool.submit(abruf, url)] = (url, versuch)
+
+            # Warten, bis ein Abruf fertig, eine Wiederholung fällig oder die Frist erreicht ist
+            naechste = [zeit for zeit in (geplant[0][0] if geplant else None, ende) if zeit is not None]
+            timeout = max(0.0, min(naechste) - time.monotonic()) if naechste else None
+            if not laufend:
+                # Nur noch Wiederholungen eingeplant (oder nichts mehr offen)
+                if geplant:
+                    time.sleep(timeout)
+                continue
+            erledigt, _ = wait(laufend, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in erledigt:
+                url, versuch = laufend.pop(future)
+                host = host_von(url)
+                try:
+                    ergebnis, grund = future.result(), 'kein_preis'
+                    gesendet.add(url)
+                    if sicherungen:
+                        sicherungen.fuer(url).erfolg()
+                except SicherungOffen:
+                    METRIKEN.zaehle('abruf_uebersprungen', host=host, grund='sicherung')
+                    # Eine Wiederholung nach einem echten Fehlschlag bleibt ein Fehler
+                    abschliessen(url, None, 'fehler' if url in gesendet else 'sicherung')
+                    continue
+                except Exception as e:
+                    gesendet.add(url)
+                    ergebnis, grund = None, 'fehler'
+                    METRIKEN.zaehle('abruf_fehler', host=host, fehler=type(e).__name__)
+                    print(f"Fehler bei Versuch {versuch + 1} für {url}: {e}")
+                    if sicherungen:
+                        sicherungen.fuer(url).fehler()
+
+                if ergebnis is not None:
+                    abschliessen(url, ergebnis)
+                elif versuch + 1 < versuche:
+                    METRIKEN.zaehle('wiederholungen', host=host)
+                    heapq.heappush(geplant, (time.monotonic() + backoff(versuch, backoff_basis), url, versuch + 1))
+                else:
+                    METRIKEN.zaehle('abruf_aufgegeben', host=host)
+                    abschliessen(url, None, grund)
+    finally:
+        # Noch nicht gestartete Abrufe verwerfen; laufende enden spätestens mit ihrem HTTP-Timeout
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    for url in [url for _, url, _ in geplant] + [url for url, _ in laufend.values()]:
+        METRIKEN.zaehle('abruf_uebersprungen', host=host_von(url), grund='frist')
+        abschliessen(url, None, 'frist')
+
+    return ergebnisse
@@ -0,0 +1,159 @@
+"""Gestreamter Export der Preishistorie als CSV, komprimiertes CSV oder Parquet
+
+Die Zeilen werden blockweise über einen SQLite-Cursor gelesen und sofort in das
+Ziel geschrieben. Der Speicherbedarf hängt damit nur von der Blockgröße ab,
+nicht von der Länge der Historie; Parquet erhält je Block eine Row Group.
+
+Start: python -m preis_checker exportiere ZIEL [--format csv|csv.gz|parquet]
+       [--von JJJJ-MM-TT] [--bis JJJJ-MM-TT] [--produkt NAME ...]
+"""
+import argparse
+import csv
+import gzip
+import io
+import os
+import sys
+from datetime import datetime, timedelta
+
+from .metriken import METRIKEN
+
+EXPORT_SPALTEN = ['product', 'shop', 'price', 'date', 'url']
+BLOCKGROESSE = 50_000
+
+# Format -> (MIME-Typ, Dateiendung)
+FORMATE = {
+    'csv': ("text/csv", ".csv"),
+    'csv.gz': ("application/gzip", ".csv.gz"),
+    'parquet': ("application/vnd.apache.parquet", ".parquet"),
+}
+
+
+def bloecke(dateipfad, von=None, bis=None, produkte=None, blockgroesse=BLOCKGROESSE):
+    """Liefert die Zeilen im Zeitraum [von, bis) blockweise als Listen von Tupeln, nach Datum sortiert"""
+    from .speicher import DATUMSFORMAT, verbinde
+
+    if not os.path.exists(dateipfad):
+        return
+
+    bedingungen, parameter = [], []
+    if von is not None:
+        bedingungen.append("date >= ?")
+        parameter.append(von.strftime(DATUMSFORMAT))
+    if bis is not None:
+        bedingungen.append("date < ?")
+        parameter.append(bis.strftime(DATUMSFORMAT))
+    if produkte:
+        bedingungen.append(f"product IN ({', '.join('?' * len(produkte))})")
+        parameter.extend(produkte)
+
+    sql = f"SELECT {', '.join(EXPORT_SPALTEN)} FROM preise"
+    if bedingungen:
+        sql += " WHERE " + " AND ".join(bedingungen)
+    with verbinde(dateipfad, lesend=True) as conn:
+        cursor = conn.execute(sql + " ORDER BY date", parameter)
+        while True:
+            block = cursor.fetchmany(blockgroesse)
+            if not block:
+                return
+            yield block
+
+
+def _schreibe_csv(bloecke_, ziel):
+    anzahl = 0
+    text = io.TextIOWrapper(ziel, encoding='utf-8', newline='')
+    try:
+        schreiber = csv.writer(text, lineterminator='\n')
+        schreiber.writerow(EXPORT_SPALTEN)
+        for block in bloecke_:
+            schreiber.writerows(block)
+            anzahl += len(block)
+    finally:
+        # Das Ziel gehört dem Aufrufer und bleibt offen
+        text.flush()
+        text.detach()
+    return anzahl
+
+
+def _arrow_block(block):
+    """Wandelt einen Zeilenblock in eine Arrow-Tabelle mit kodierten Text- und echten Zeitspalten"""
+    import numpy as np
+    import pyarrow as pa
+
+    product, shop, price, date, url = zip(*block)
+    return pa.table({
+        'product': pa.array(product).dictionary_encode(),
+        'shop': pa.array(shop).dictionary_encode(),
+        'price': pa.array(price, type=pa.float64()),
+        'date': pa.array(np.array(date, dtype='datetime64[us]')),
+        'url': pa.array(url, type=pa.string()).dictionary_encode(),
+    })
+
+
+def _schreibe_parquet(bloecke_, ziel):
+    import pyarrow.parquet as pq
+
+    anzahl, schreiber = 0, None
+    try:
+        for block in bloecke_:
+            tabelle = _arrow_block(block)
+            if schreiber is None:
+                schreiber = pq.ParquetWriter(ziel, tabelle.schema, compression='zstd')
+            schreiber.write_table(tabelle)
+            anzahl += len(block)
+        if schreiber is None:
+            # Auch ein leerer Export ist eine gültige Datei mit Schema
+            import pyarrow as pa
+
+            leer = pa.schema([('product', pa.string()), ('shop', pa.string()), ('price', pa.float64()),
+                              ('date', pa.timestamp('us')), ('url', pa.string())])
+            schreiber = pq.ParquetWriter(ziel, leer, compression='zstd')
+    finally:
+        if schreiber is not None:
+            schreiber.close()
+    return anzahl
+
+
+def exportiere(dateipfad, ziel, format='csv', von=None, bis=None, produkte=None, blockgroesse=BLOCKGROESSE):
+    """Schreibt den gefilterten Export blockweise in die binär geöffnete Datei `ziel` und liefert die Zeilenzahl"""
+    if format not in FORMATE:
+        raise ValueError(f"Unbekanntes Exportformat: {format}")
+
+    zeilen = bloecke(dateipfad, von, bis, produkte, blockgroesse)
+    with METRIKEN.stoppe('export_sekunden', format=format):
+        if format == 'parquet':
+            anzahl = _schreibe_parquet(zeilen, ziel)
+        elif format == 'csv.gz':
+            # GzipFile schließt ein übergebenes fileobj nicht mit
+            with gzip.GzipFile(fileobj=ziel, mode='wb', compresslevel=6) as komprimiert:
+                anzahl = _schreibe_csv(zeilen, komprimiert)
+        else:
+            anzahl = _schreibe_csv(zeilen, ziel)
+    METRIKEN.zaehle('exportierte_zeilen', anzahl, format=format)
+    return anzahl
+
+
+def _datum(text):
+    return datetime.strptime(text, '%Y-%m-%d')
+
+
+def main(argv=None):
+    from .konfiguration import DATEIPFAD
+
+    parser = argparse.ArgumentParser(description="Preishistorie exportieren")
+    parser.add_argument("ziel", help="Zieldatei ('-' für die Standardausgabe)")
+    parser.add_argument("--format", choices=list(FORMATE), default=None,
+                        help="Standard: aus der Dateiendung, sonst csv")
+    parser.add_argument("--von", type=_datum, help="erster Tag (JJJJ-MM-TT)")
+    parser.add_argument("--bis", type=_datum, help="letzter Tag einschließlich (JJJJ-MM-TT)")
+    parser.add_argument("--produkt", action="append", dest="produkte", help="mehrfach angebbar")
+    args = parser.parse_args(argv)
+
+    format_ = args.format or ('parquet' if args.ziel.endswith('.parquet')
+                              else 'csv.gz' if args.ziel.endswith('.gz') else 'csv')
+    bis = args.bis + timedelta(days=1) if args.bis else None
+    if args.ziel == '-':
+        anzahl = exportiere(DATEIPFAD, sys.stdout.buffer, format_, args.von, bis, args.produkte)
+    else:
+        with open(args.ziel, 'wb') as f:
+            anzahl = exportiere(DATEIPFAD, f, format_, args.von, bis, args.produkte)
+    print(f"{anzahl} Einträge als {format_} exportiert", file=sys.stderr)
@@ -0,0 +1,254 @@
+"""Austauschbare Extraktoren für Preis und Shop aus Geizhals-Produktseiten
+
+`extrahiere()` probiert die Extraktoren der Reihe nach; der erste, der einen
+Preis liefert, gewinnt. Der Regex-Schnellweg liest nur die wenigen relevanten
+Stellen aus dem Rohtext, die vollständige BeautifulSoup-Kette bleibt Rückfall.
+
+`extrahiere_angebote()` liest nach demselben Muster die komplette Angebotsliste
+(Shop, Preis, Versand, Verfügbarkeit) aus derselben Seite.
+"""
+import html as html_modul
+import importlib.util
+import re
+
+# BeautifulSoup wird erst im Rückfall geladen; der Regex-Schnellweg kommt ohne aus
+PARSER = 'lxml' if importlib.util.find_spec('lxml') else 'html.parser'
+
+UNBEKANNT = "Unbekannt"
+
+
+def _klasse(name):
+    """Regex-Fragment für ein class-Attribut, das die Klasse `name` enthält"""
+    return rf'''class\s*=\s*["'][^"']*(?<![\w-]){re.escape(name)}(?![\w-])[^"']*["']'''
+
+
+def _inhalt(tag):
+    """Regex-Gruppe für den Inhalt bis zum schließenden `tag`; innere Elemente wie <span>…</span> gehören dazu"""
+    return rf'''((?:[^<]|<[a-z][^>]*>[^<]*</[a-z]+\s*>|<[a-z][^>]*>|</(?!{tag}\b)[a-z]+\s*>)*?)</{tag}\s*>'''
+
+
+# Ein Zeichen Text ohne Ziffern; Entities wie &#8364; zählen als ein Zeichen
+_KEINE_ZIFFER = r'(?:&#?\w+;|&(?!#)|[^<&\d])'
+# Vom Beginn des Preiselements bis zum Betrag: Text ohne Ziffern, öffnende Tags und vollständige
+# innere Elemente ohne Ziffern (etwa <span>€</span>); das schließende Tag des Elements beendet die Suche
+_BIS_BETRAG = rf'(?:{_KEINE_ZIFFER}|<[a-z][^>]*>{_KEINE_ZIFFER}*</[a-z]+\s*>|<[a-z][^>]*>)*?'
+# Deutsch formatierter Betrag wie '1.199,00' oder '1.199,-'
+_BETRAG = r'(\d[\d.]*(?:,(?:\d+|-+))?)'
+
+# Gleiche Priorität wie die Selektorkette in soup_extraktor
+_PREIS_MUSTER = [
+    re.compile(rf'''<strong\b[^>]*\bid\s*=\s*["']pricerange-min["'][^>]*>{_BIS_BETRAG}{_BETRAG}''', re.S | re.I),
+    re.compile(rf'''<span\b[^>]*{_klasse('price__amount')}[^>]*>{_BIS_BETRAG}{_BETRAG}''', re.S | re.I),
+    re.compile(rf'''<span\b[^>]*{_klasse('gh_price')}[^>]*>{_BIS_BETRAG}{_BETRAG}''', re.S | re.I),
+]
+_META_PREIS = re.compile(
+    r'''<meta\b(?=[^>]*\bitemprop\s*=\s*["']price["'])[^>]*\bcontent\s*=\s*["']([^"']*)["']''', re.I
+)
+_SHOP_MUSTER = [
+    re.compile(rf'''<span\b[^>]*{_klasse('gh_offer_shop')}[^>]*>{_inhalt('span')}''', re.S | re.I),
+    re.compile(rf'''<a\b[^>]*{_klasse('offer__seller')}[^>]*>{_inhalt('a')}''', re.S | re.I),
+]
+_TAG = re.compile(r'<[^>]+>')
+
+# Beginn eines Angebots: Element mit der Klasse "offer" (nicht "offer__..." oder "offer-list")
+_ANGEBOT_START = re.compile(rf'''<(?:div|li|article)\b[^>]*{_klasse('offer')}[^>]*>''', re.I)
+_ANGEBOT_PREIS = [
+    re.compile(rf'''<span\b[^>]*{_klasse('gh_price')}[^>]*>{_BIS_BETRAG}{_BETRAG}''', re.S | re.I),
+    re.compile(rf'''<span\b[^>]*{_klasse('price__amount')}[^>]*>{_BIS_BETRAG}{_BETRAG}''', re.S | re.I),
+]
+_ANGEBOT_VERSAND = re.compile(rf'''<span\b[^>]*{_klasse('offer__shipping')}[^>]*>{_inhalt('span')}''', re.S | re.I)
+_ANGEBOT_VERFUEGBARKEIT = re.compile(
+    rf'''<span\b[^>]*{_klasse('offer__availability')}[^>]*>{_inhalt('span')}''', re.S | re.I
+)
+
+
+def preis_aus_text(text):
+    """Wandelt deutsch formatierte Preise wie '€ 1.234,56' in float um"""
+    ziffern = ''.join(c for c in text if c.isdigit() or c in ',.')
+    if not any(c.isdigit() for c in ziffern):
+        return None
+    return float(ziffern.replace('.', '').replace(',', '.'))
+
+
+def preis_aus_meta(inhalt):
+    """meta[itemprop=price] enthält maschinenlesbare Werte wie '1234.56'"""
+    try:
+        return float(inhalt)
+    except (TypeError, ValueError):
+        return preis_aus_text(inhalt or '')
+
+
+def _text(fragment):
+    return html_modul.unescape(_TAG.sub('', fragment)).strip()
+
+
+def regex_extraktor(html):
+    """Schnellweg: sucht die bekannten Preis- und Shop-Elemente direkt im Rohtext"""
+    preis = None
+    for muster in _PREIS_MUSTER:
+        treffer = muster.search(html)
+        if treffer:
+            preis = preis_aus_text(_text(treffer.group(1)))
+            break
+    else:
+        treffer = _META_PREIS.search(html)
+        if treffer:
+            preis = preis_aus_meta(html_modul.unescape(treffer.group(1)))
+    if preis is None:
+        return None
+
+    shop = UNBEKANNT
+    for muster in _SHOP_MUSTER:
+        treffer = muster.search(html)
+        if treffer:
+            shop = _text(treffer.group(1)) or UNBEKANNT
+            break
+
+    return {'price': preis, 'shop': shop}
+
+
+def _soup_werte(soup):
+    """Die ursprüngliche Selektorkette auf einem (ggf. gefilterten) Baum"""
+    preis_element = (
+        soup.find('strong', id='pricerange-min') or
+        soup.find('span', class_='price__amount') or
+        soup.find('span', class_='gh_price') or
+        soup.find('meta', {'itemprop': 'price'})
+    )
+    if not preis_element:
+        return None
+
+    if preis_element.name == 'meta':
+        preis = preis_aus_meta(preis_element.get('content'))
+    else:
+        preis = preis_aus_text(preis_element.get_text(strip=True))
+    if preis is None:
+        return None
+
+    shop_element = soup.find('span', class_='gh_offer_shop') or soup.find('a', class_='offer__seller')
+    shop = shop_element.get_text(strip=True) if shop_element else UNBEKANNT
+
+    return {'price': preis, 'shop': shop}
+
+
+def strainer_extraktor(html):
+    """Parst nur strong/span/meta/a-Elemente (SoupStrainer) mit lxml, falls vorhanden"""
+    from bs4 import BeautifulSoup, SoupStrainer
+
+    return _soup_werte(BeautifulSoup(html, PARSER, parse_only=SoupStrainer(['strong', 'span', 'meta', 'a'])))
+
+
+def soup_extraktor(html):
+    """Rückfall: vollständiger BeautifulSoup-Baum wie bisher"""
+    from bs4 import BeautifulSoup
+
+    return _soup_werte(BeautifulSoup(html, 'html.parser'))
+
+
+EXTRAKTOREN = [regex_extraktor, soup_extraktor]
+
+
+def extrahiere(html, extraktoren=None):
+    """Liefert {'price', 'shop'} vom ersten erfolgreichen Extraktor oder None"""
+    for extraktor in extraktoren or EXTRAKTOREN:
+        try:
+            werte = extraktor(html)
+        except Exception as e:
+            print(f"Extraktor {extraktor.__name__} fehlgeschlagen: {e}")
+            continue
+        if werte:
+            return werte
+    return None
+
+
+# ========== ANGEBOTSLISTE ==========
+def versand_aus_text(text):
+    """'Versand ab € 5,99' -> 5.99, 'versandkostenfrei' -> 0.0, sonst None"""
+    if not text:
+        return None
+    if 'frei' in text.lower() or 'gratis' in text.lower():
+        return 0.0
+    return preis_aus_text(text)
+
+
+def _angebot(preis_text, shop, versand_text, verfuegbarkeit):
+    preis = preis_aus_text(preis_text) if preis_text else None
+    if preis is None:
+        return None
+    return {
+        'shop': shop or UNBEKANNT,
+        'price': preis,
+        'shipping': versand_aus_text(versand_text),
+        'availability': verfuegbarkeit or None,
+    }
+
+
+def _erster_text(muster_liste, fragment):
+    for muster in muster_liste:
+        treffer = muster.search(fragment)
+        if treffer:
+            return _text(treffer.group(1))
+    return None
+
+
+def regex_angebote(html):
+    """Schnellweg: zerlegt den Rohtext an jedem Angebotsbeginn und liest die Felder je Abschnitt"""
+    starts = [treffer.start() for treffer in _ANGEBOT_START.finditer(html)]
+    angebote = []
+    for start, ende in zip(starts, starts[1:] + [len(html)]):
+        abschnitt = html[start:ende]
+        angebot = _angebot(
+            _erster_text(_ANGEBOT_PREIS, abschnitt),
+            _erster_text(_SHOP_MUSTER, abschnitt),
+            _erster_text([_ANGEBOT_VERSAND], abschnitt),
+            _erster_text([_ANGEBOT_VERFUEGBARKEIT], abschnitt),
+        )
+        if angebot:
+            angebote.append(angebot)
+    return angebote
+
+
+def soup_angebote(html):
+    """Rückfall: Angebotsliste über CSS-Selektoren auf dem vollständigen Baum"""
+    from bs4 import BeautifulSoup
+
+    def text(element, selektor):
+        gefunden = element.select_one(selektor)
+        return gefunden.get_text(strip=True) if gefunden else None
+
+    angebote = []
+    for element in BeautifulSoup(html, PARSER).select('.offer'):
+        angebot = _angebot(
+            text(element, '.gh_price, .price__amount'),
+            text(element, '.gh_offer_shop, .offer__seller'),
+            text(element, '.offer__shipping'),
+            text(element, '.offer__availability'),
+        )
+        if angebot:
+            angebote.append(angebot)
+    return angebote
+
+
+ANGEBOTS_EXTRAKTOREN = [regex_angebote, soup_angebote]
+
+
+def extrahiere_angebote(html, extraktoren=None):
+    """Liefert alle Angebote der Seite vom ersten erfolgreichen Extraktor (ggf. leere Liste)"""
+    for extraktor in extraktoren or ANGEBOTS_EXTRAKTOREN:
+        try:
+            angebote = extraktor(html)
+        except Exception as e:
+            print(f"Angebots-Extraktor {extraktor.__name__} fehlgeschlagen: {e}")
+            continue
+        if angebote:
+            return angebote
+    return []
+
+
+def mit_angeboten(werte, html):
+    """Ergänzt die Werte um die Angebotsliste und füllt einen unbekannten Shop aus ihr auf"""
+    angebote = extrahiere_angebote(html)
+    if angebote and werte['shop'] == UNBEKANNT:
+        passend = [a for a in angebote if a['price'] == werte['price']] or angebote
+        werte = {**werte, 'shop': min(passend, key=lambda a: a['price'])['shop']}
+    return {**werte, 'angebote': angebote}
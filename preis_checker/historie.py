@@ -0,0 +1,103 @@
+"""Kompakte, schreibgeschützte Preishistorie im Spaltenformat
+
+Zeitstempel (datetime64[us]) und Preise (float64) liegen in NumPy-Arrays,
+Produkt, Shop und URL als kleine Ganzzahl-Codes mit alphabetisch sortierten
+Nachschlagetabellen. Die Zeilen sind nach (Produkt, Zeitstempel) sortiert, sodass
+Index und Tabelle ohne erneutes Sortieren darauf aufsetzen. Eine Beobachtung
+belegt so rund 22 Byte; das Objekt wird einmal pro Datenstand gebaut und von
+allen Sitzungen gemeinsam genutzt.
+"""
+import numpy as np
+
+ZEITEINHEIT = 'datetime64[us]'
+CODE_SPALTEN = ('product', 'shop', 'url')
+
+
+def _code_typ(anzahl):
+    """Kleinster Ganzzahltyp für `anzahl` Kategorien (-1 bleibt für fehlende Werte)"""
+    return np.int16 if anzahl < 2**15 else np.int32
+
+
+def _interniere(spalte):
+    """Codes und sortierte Kategorien einer (ggf. kategorialen) pandas-Spalte"""
+    if spalte.dtype.name != 'category':
+        spalte = spalte.astype('category')
+    kategorien = np.asarray(spalte.cat.categories, dtype=object)
+    codes = spalte.cat.codes.to_numpy()
+    # Kategorien aus angehängten Teilen sind nicht zwingend sortiert; Codes entsprechend umschlüsseln
+    reihenfolge = np.argsort(kategorien)
+    umschluessel = np.empty(len(kategorien) + 1, dtype=np.int64)
+    umschluessel[reihenfolge] = np.arange(len(kategorien))
+    umschluessel[-1] = -1
+    return umschluessel[codes].astype(_code_typ(len(kategorien))), list(kategorien[reihenfolge])
+
+
+class Historie:
+    """Unveränderliche Spalten der Preishistorie, sortiert nach Produkt und Zeit"""
+
+    def __init__(self, zeiten, preise, codes, kategorien):
+        self.zeiten = zeiten
+        self.preise = preise
+        self.codes = codes
+        self.kategorien = kategorien
+        for array in (zeiten, preise, *codes.values()):
+            array.setflags(write=False)
+
+    @classmethod
+    def aus_tabelle(cls, df):
+        """Baut die Historie aus einem DataFrame mit date/price/product und optional shop/url"""
+        zeiten = df['date'].to_numpy().astype(ZEITEINHEIT)
+        preise = df['price'].to_numpy(dtype='float64')
+        codes, kategorien = {}, {}
+        for spalte in CODE_SPALTEN:
+            if spalte in df:
+                codes[spalte], kategorien[spalte] = _interniere(df[spalte])
+
+        # lexsort sortiert nach dem letzten Schlüssel zuerst: Produkt, dann Zeit
+        reihenfolge = np.lexsort((zeiten, codes['product']))
+        return cls(
+            zeiten[reihenfolge],
+            preise[reihenfolge],
+            {spalte: werte[reihenfolge] for spalte, werte in codes.items()},
+            kategorien,
+        )
+
+    @classmethod
+    def leer(cls):
+        return cls(np.empty(0, ZEITEINHEIT), np.empty(0, 'float64'),
+                   {spalte: np.empty(0, np.int16) for spalte in CODE_SPALTEN},
+                   {spalte: [] for spalte in CODE_SPALTEN})
+
+    def __len__(self):
+        return len(self.preise)
+
+    @property
+    def empty(self):
+        return not len(self)
+
+    @property
+    def nbytes(self):
+        """Speicherbedarf der Arrays (ohne die kleinen Nachschlagetabellen)"""
+        return self.zeiten.nbytes + self.preise.nbytes + sum(codes.nbytes for codes in self.codes.values())
+
+    def anzahl(self, von=None, bis=None, produkte=None):
+        """Zeilen im Zeitraum [von, bis), optional nur für die genannten Produkte"""
+        maske = np.ones(len(self), dtype=bool)
+        if von is not None:
+            maske &= self.zeiten >= np.datetime64(von, 'us')
+        if bis is not None:
+            maske &= self.zeiten < np.datetime64(bis, 'us')
+        if produkte:
+            gesucht = [self.kategorien['product'].index(p) for p in produkte if p in self.kategorien['product']]
+            maske &= np.isin(self.codes['product'], gesucht)
+        return int(np.count_nonzero(maske))
+
+    def als_dataframe(self, spalten=None):
+        """DataFrame mit kategorialen Spalten über denselben Codes (für pandas-basierte Ansichten)"""
+        import pandas as pd
+
+        daten = {'date': self.zeiten, 'price': self.preise}
+        for spalte, codes in self.codes.items():
+            daten[spalte] = pd.Categorical.from_codes(codes, categories=self.kategorien[spalte], validate=False)
+        reihenfolge = spalten or ['product', 'shop', 'price', 'date', 'url']
+        return pd.DataFrame({spalte: daten[spalte] for spalte in reihenfolge if spalte in daten}, copy=False)
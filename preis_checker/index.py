@@ -0,0 +1,76 @@
+"""Nach Produkt partitionierter, zeitlich sortierter Index über die Preishistorie
+
+Alle Beobachtungen liegen in NumPy-Arrays, sortiert nach (Produkt, Zeitstempel).
+Jedes Produkt belegt einen zusammenhängenden Abschnitt [start, ende), sodass
+neuester/ältester Preis und Fensteranfänge per Binärsuche in O(log n) gefunden werden.
+"""
+import numpy as np
+
+from .historie import Historie
+
+
+class PreisIndex:
+    """Unveränderlicher Index; einmal pro Datenstand bauen und zwischen Reruns teilen
+
+    Arbeitet direkt auf den bereits sortierten Arrays einer `Historie` (ohne Kopie);
+    ein DataFrame wird vorher in eine Historie umgewandelt.
+    """
+
+    def __init__(self, historie):
+        if not isinstance(historie, Historie):
+            historie = Historie.aus_tabelle(historie)
+
+        self.zeiten = historie.zeiten
+        self.preise = historie.preise
+        self.shop_codes = historie.codes['shop']
+        self.shop_namen = historie.kategorien['shop']
+
+        kategorien = historie.kategorien['product']
+        grenzen = np.searchsorted(historie.codes['product'], np.arange(len(kategorien) + 1))
+        self._abschnitte = {
+            name: (int(grenzen[i]), int(grenzen[i + 1]))
+            for i, name in enumerate(kategorien)
+            if grenzen[i + 1] > grenzen[i]
+        }
+
+    def __len__(self):
+        return len(self.preise)
+
+    @property
+    def produkte(self):
+        return list(self._abschnitte)
+
+    def anzahl(self, produkt):
+        """Zahl der Beobachtungen eines Produkts"""
+        start, ende = self._abschnitte.get(produkt, (0, 0))
+        return ende - start
+
+    def _eintrag(self, position):
+        return {
+            'price': float(self.preise[position]),
+            'date': self.zeiten[position].item(),
+            'shop': self.shop_namen[self.shop_codes[position]],
+        }
+
+    def neuester(self, produkt):
+        """Jüngste Beobachtung eines Produkts (oder None)"""
+        start, ende = self._abschnitte.get(produkt, (0, 0))
+        return self._eintrag(ende - 1) if ende > start else None
+
+    def aeltester(self, produkt):
+        """Älteste Beobachtung eines Produkts (oder None)"""
+        start, ende = self._abschnitte.get(produkt, (0, 0))
+        return self._eintrag(start) if ende > start else None
+
+    def erster_ab(self, produkt, zeitpunkt):
+        """Erste Beobachtung eines Produkts zum oder nach dem Zeitpunkt (oder None)"""
+        start, ende = self._abschnitte.get(produkt, (0, 0))
+        position = start + int(np.searchsorted(
+            self.zeiten[start:ende], np.datetime64(zeitpunkt, 'us'), side='left'
+        ))
+        return self._eintrag(position) if position < ende else None
+
+    def reihe(self, produkt):
+        """Zeitstempel und Preise eines Produkts als (schreibgeschützte) Array-Sichten"""
+        start, ende = self._abschnitte.get(produkt, (0, 0))
+        return self.zeiten[start:ende], self.preise[start:ende]
@@ -0,0 +1,31 @@
+"""Produktkatalog aus einer externen JSON-Datei
+
+Format:
+    {"produkte": [{"name": "...", "url": "https://...", "kategorie": "RTX 5080"}, ...]}
+"""
+import json
+
+
+def lade_katalog(pfad):
+    """Liest den Katalog und liefert die Einträge als Liste von Dicts"""
+    with open(pfad, 'r', encoding='utf-8') as f:
+        eintraege = json.load(f)['produkte']
+
+    namen = set()
+    for eintrag in eintraege:
+        if not eintrag.get('name') or not eintrag.get('url'):
+            raise ValueError(f"Katalogeintrag ohne Name oder URL: {eintrag}")
+        if eintrag['name'] in namen:
+            raise ValueError(f"Doppelter Produktname im Katalog: {eintrag['name']}")
+        namen.add(eintrag['name'])
+        eintrag.setdefault('kategorie', None)
+    return eintraege
+
+
+def produkte(katalog, kategorie=None):
+    """Name -> URL, optional auf eine Kategorie beschränkt"""
+    return {
+        eintrag['name']: eintrag['url']
+        for eintrag in katalog
+        if kategorie is None or eintrag['kategorie'] == kategorie
+    }
@@ -0,0 +1,79 @@
+"""Gemeinsame Konfiguration für Dashboard und Hintergrund-Worker"""
+import os
+
+from .katalog import lade_katalog, produkte
+
+# ========== KONFIGURATION ==========
+TIMEZONE = None
+DATA_DIR = "preis_daten"
+os.makedirs(DATA_DIR, exist_ok=True)
+
+# SQLite-Datenbank; eine vorhandene preise_5080.json übernimmt der Worker beim ersten Start
+DATEIPFAD = os.path.join(DATA_DIR, "preise_5080.sqlite")
+JSON_DATEIPFAD = os.path.join(DATA_DIR, "preise_5080.json")
+
+# Spaltenorientierter Lese-Snapshot (benötigt pyarrow); None schaltet ihn ab
+SPALTENPFAD = os.path.join(DATA_DIR, "preise_5080.parquet")
+# Ab so vielen seit dem Snapshot angehängten Zeilen schreibt der Worker ihn neu
+KOMPAKTIERUNG_AB = 10_000
+STATUSPFAD = os.path.join(DATA_DIR, "status.json")
+# Sperrdatei: es scrapt immer nur ein Worker-Prozess
+WORKER_SPERRE = os.path.join(DATA_DIR, "worker.lock")
+
+# Metriken des Workers: Prometheus-Textdatei und JSON-Schnappschuss für das Dashboard
+METRIKEN_PROM_PFAD = os.path.join(DATA_DIR, "metriken.prom")
+METRIKEN_JSON_PFAD = os.path.join(DATA_DIR, "metriken.json")
+
+# Vollständige Angebotsliste (Shop, Preis, Versand, Verfügbarkeit) aus demselben Abruf speichern
+ANGEBOTE_ERFASSEN = True
+
+# Obergrenze für Exporte aus dem Dashboard: Streamlit hält die Datei beim Download im Speicher;
+# größere Exporte laufen gestreamt über `python -m preis_checker exportiere`
+EXPORT_MAX_ZEILEN = 1_000_000
+
+# Preisalarme: lokales Protokoll (JSON-Zeilen) und optionaler Webhook
+ALARM_PROTOKOLL = os.path.join(DATA_DIR, "alarme.jsonl")
+ALARM_WEBHOOK = os.environ.get("PREISALARM_WEBHOOK")
+
+# Startintervall für Produkte ohne Historie in Sekunden
+SCRAPE_INTERVALL = 3600
+
+# Adaptive Planung: Takt des Workers, Grenzen der Revisit-Intervalle und globales Budget
+PLANER_TAKT = 60
+MIN_INTERVALL = 15 * 60
+MAX_INTERVALL = 24 * 3600
+ABRUF_BUDGET_PRO_STUNDE = 600
+# Angestrebte erwartete Preisänderungen pro Abruf (kleiner = häufiger abrufen)
+ZIEL_AENDERUNGEN_PRO_ABRUF = 0.5
+# Produkte mit Alarmregeln oder kürzlichem Interesse im Dashboard werden so viel öfter abgerufen
+INTERESSE_FAKTOR = 2.0
+INTERESSE_TAGE = 7
+
+# Höflichkeitsbudget pro Host: (Anfragen pro Sekunde, max. gleichzeitige Anfragen)
+HOST_LIMITS = {
+    "geizhals.at": (2.0, 4),
+}
+MAX_WORKER = 16
+
+# Fehlgeschlagene Abrufe: Versuche je URL und Basis des gestreuten Backoffs (Sekunden, verdoppelt sich)
+ABRUF_VERSUCHE = 3
+BACKOFF_BASIS = 1.0
+# Sicherung je Host: nach so vielen Fehlern in Folge wird der Shop so lange (Sekunden) nicht abgerufen
+SICHERUNG_SCHWELLE = 5
+SICHERUNG_ABKUEHLZEIT = 300
+# Obergrenze für einen Abrufzyklus; was bis dahin fehlt, zeigt das Dashboard als veraltet an
+ZYKLUS_FRIST = 120
+# So lange (Sekunden) wird ein erfolgreiches Abrufergebnis je kanonischer URL wiederverwendet
+ERGEBNIS_TTL = 300
+
+# ========== PRODUKTLISTEN ==========
+# Externer Katalog (Name, URL, Kategorie); per Umgebungsvariable austauschbar
+KATALOGPFAD = os.environ.get(
+    "PREISALARM_KATALOG",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "katalog.json")
+)
+KATALOG = lade_katalog(KATALOGPFAD)
+
+# Alle Produkte, die der Worker abruft, und die RTX-5080-Auswahl des Dashboards
+alle_produkte = produkte(KATALOG)
+produkte_5080 = produkte(KATALOG, "RTX 5080")
@@ -0,0 +1,172 @@
+"""Prozessweite Metriken (Zähler, Messwerte, Laufzeit-Summaries) mit Prometheus-Export
+
+Laufzeiten werden je Label-Kombination in einem begrenzten Ringpuffer gehalten,
+aus dem Perzentile berechnet werden. Der Worker schreibt nach jedem Zyklus eine
+Prometheus-Textdatei und einen JSON-Schnappschuss, den das Dashboard anzeigt;
+optional beantwortet er /metrics per HTTP.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PERZENTILE = (0.5, 0.9, 0.99)
+PUFFERGROESSE = 1000
+
+
+def _perzentil(sortiert, q):
+    if not sortiert:
+        return None
+    return sortiert[min(len(sortiert) - 1, int(q * len(sortiert)))]
+
+
+def _labels_text(labels):
+    if not labels:
+        return ""
+    teile = []
+    for name, wert in labels:
+        wert = str(wert).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        teile.append(f'{name}="{wert}"')
+    return "{" + ",".join(teile) + "}"
+
+
+class Metriken:
+    """Thread-sichere Sammlung; Namen ohne Präfix, beim Export wird `praefix_` vorangestellt"""
+
+    def __init__(self, praefix="preis_checker"):
+        self.praefix = praefix
+        self._lock = threading.Lock()
+        self._zaehler = {}
+        self._messwerte = {}
+        self._laufzeiten = {}
+
+    def zaehle(self, name, wert=1, **labels):
+        schluessel = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._zaehler[schluessel] = self._zaehler.get(schluessel, 0) + wert
+
+    def setze(self, name, wert, **labels):
+        with self._lock:
+            self._messwerte[(name, tuple(sorted(labels.items())))] = wert
+
+    def beobachte(self, name, sekunden, **labels):
+        schluessel = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            eintrag = self._laufzeiten.get(schluessel)
+            if eintrag is None:
+                eintrag = self._laufzeiten[schluessel] = {
+                    'werte': deque(maxlen=PUFFERGROESSE), 'summe': 0.0, 'anzahl': 0
+                }
+            eintrag['werte'].append(sekunden)
+            eintrag['summe'] += sekunden
+            eintrag['anzahl'] += 1
+
+    @contextmanager
+    def stoppe(self, name, **labels):
+        """Misst die Laufzeit des Blocks als Summary `name`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.beobachte(name, time.perf_counter() - start, **labels)
+
+    def schnappschuss(self):
+        """Alle Werte als JSON-fähiges Dict, Laufzeiten mit Perzentilen"""
+        with self._lock:
+            zaehler = dict(self._zaehler)
+            messwerte = dict(self._messwerte)
+            laufzeiten = {k: (sorted(v['werte']), v['summe'], v['anzahl']) for k, v in self._laufzeiten.items()}
+
+        def zeilen(quelle, umwandeln):
+            return [{'name': name, 'labels': dict(labels), **umwandeln(wert)}
+                    for (name, labels), wert in sorted(quelle.items())]
+
+        return {
+            'zeitpunkt': time.time(),
+            'zaehler': zeilen(zaehler, lambda w: {'wert': w}),
+            'messwerte': zeilen(messwerte, lambda w: {'wert': w}),
+            'laufzeiten': zeilen(laufzeiten, lambda w: {
+                'anzahl': w[2],
+                'summe': w[1],
+                **{f"p{int(q * 100)}": _perzentil(w[0], q) for q in PERZENTILE},
+            }),
+        }
+
+    def als_prometheus(self):
+        """Prometheus-Textformat (counter, gauge, summary)"""
+        daten = self.schnappschuss()
+        zeilen = []
+        gesehen = set()
+
+        def kopf(name, typ):
+            if name not in gesehen:
+                gesehen.add(name)
+                zeilen.append(f"# TYPE {name} {typ}")
+
+        for eintrag in daten['zaehler']:
+            name = f"{self.praefix}_{eintrag['name']}_total"
+            kopf(name, "counter")
+            zeilen.append(f"{name}{_labels_text(sorted(eintrag['labels'].items()))} {eintrag['wert']}")
+        for eintrag in daten['messwerte']:
+            name = f"{self.praefix}_{eintrag['name']}"
+            kopf(name, "gauge")
+            zeilen.append(f"{name}{_labels_text(sorted(eintrag['labels'].items()))} {eintrag['wert']}")
+        for eintrag in daten['laufzeiten']:
+            name = f"{self.praefix}_{eintrag['name']}"
+            kopf(name, "summary")
+            labels = sorted(eintrag['labels'].items())
+            for q in PERZENTILE:
+                wert = eintrag[f"p{int(q * 100)}"]
+                zeilen.append(f"{name}{_labels_text(labels + [('quantile', q)])} {wert}")
+            zeilen.append(f"{name}_sum{_labels_text(labels)} {eintrag['summe']}")
+            zeilen.append(f"{name}_count{_labels_text(labels)} {eintrag['anzahl']}")
+        return "\n".join(zeilen) + "\n"
+
+    def schreibe(self, prometheus_pfad=None, json_pfad=None):
+        """Schreibt Textformat und/oder JSON-Schnappschuss atomar"""
+        for pfad, inhalt in ((prometheus_pfad, self.als_prometheus),
+                             (json_pfad, lambda: json.dumps(self.schnappschuss(), indent=2))):
+            if pfad:
+                temp_pfad = f"{pfad}.tmp"
+                with open(temp_pfad, 'w') as f:
+                    f.write(inhalt())
+                os.replace(temp_pfad, pfad)
+
+    def starte_http(self, port, host="0.0.0.0"):
+        """Beantwortet GET /metrics im Hintergrund-Thread"""
+        metriken = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                inhalt = metriken.als_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(inhalt)))
+                self.end_headers()
+                self.wfile.write(inhalt)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def lade_schnappschuss(json_pfad):
+    """Liest den vom Worker geschriebenen JSON-Schnappschuss (oder None)"""
+    try:
+        with open(json_pfad) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+METRIKEN = Metriken()
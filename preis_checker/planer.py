@@ -0,0 +1,182 @@
+"""Adaptive Abrufplanung nach Preisvolatilität
+
+Jedes Produkt bekommt ein eigenes Revisit-Intervall. Die Änderungsrate wird
+aus den eigenen Abrufen geschätzt (exponentiell gewichtete Zahl beobachteter
+Änderungen pro beobachteter Zeit mit schwachem Prior); das Intervall zielt auf
+eine feste erwartete Zahl an Änderungen pro Abruf. Produkte mit Alarmregeln
+oder kürzlichem Interesse im Dashboard werden häufiger abgerufen.
+
+Ein globales Stundenbudget deckelt die Zahl der Abrufe. Reicht es nicht für
+alle fälligen Produkte, gehen die am stärksten überfälligen vor; bleibt
+Budget übrig, werden Produkte mit der höchsten erwarteten Änderungszahl
+seit ihrem letzten Abruf vorgezogen.
+"""
+import math
+import time
+
+from .konfiguration import (
+    ABRUF_BUDGET_PRO_STUNDE, INTERESSE_FAKTOR, INTERESSE_TAGE, MAX_INTERVALL, MIN_INTERVALL,
+    PLANER_TAKT, SCRAPE_INTERVALL, ZIEL_AENDERUNGEN_PRO_ABRUF,
+)
+from .metriken import METRIKEN
+from .speicher import verbinde
+
+# Halbwertszeit, mit der alte Beobachtungen der Änderungsrate an Gewicht verlieren
+HALBWERTSZEIT = 7 * 24 * 3600
+
+PLANER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS planung (
+    product       TEXT PRIMARY KEY,
+    intervall     REAL NOT NULL,
+    naechster     REAL NOT NULL,
+    letzter_abruf REAL,
+    letzter_preis REAL,
+    letzter_shop  TEXT,
+    aenderungen   REAL NOT NULL DEFAULT 0,
+    beobachtet    REAL NOT NULL DEFAULT 0,
+    interesse     REAL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS planung_naechster ON planung (naechster);
+CREATE TABLE IF NOT EXISTS abrufprotokoll (zeit REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS abrufprotokoll_zeit ON abrufprotokoll (zeit);
+"""
+
+
+class Planer:
+    """Entscheidet pro Takt, welche Produkte abgerufen werden, und lernt aus den Ergebnissen"""
+
+    def __init__(self, dateipfad, budget_pro_stunde=ABRUF_BUDGET_PRO_STUNDE, takt=PLANER_TAKT,
+                 min_intervall=MIN_INTERVALL, max_intervall=MAX_INTERVALL,
+                 startintervall=SCRAPE_INTERVALL, ziel=ZIEL_AENDERUNGEN_PRO_ABRUF, vorziehen_ab=0.25):
+        self.dateipfad = dateipfad
+        self.budget_pro_stunde = budget_pro_stunde
+        self.takt = takt
+        self.min_intervall = min_intervall
+        self.max_intervall = max_intervall
+        self.startintervall = startintervall
+        self.ziel = ziel
+        # Ab diesem Anteil des Intervalls darf ein Produkt bei freiem Budget vorgezogen werden
+        self.vorziehen_ab = vorziehen_ab
+        with verbinde(dateipfad) as conn:
+            conn.executescript(PLANER_SCHEMA)
+
+    def intervall(self, aenderungen, beobachtet, interessant=False):
+        """Revisit-Intervall aus der geschätzten Änderungsrate"""
+        # Prior: eine halbe Änderung pro halbem Startintervall, damit neue Produkte beim Startintervall beginnen
+        rate = (aenderungen + 0.5) / (beobachtet + 0.5 * self.startintervall)
+        intervall = self.ziel / rate
+        if interessant:
+            intervall /= INTERESSE_FAKTOR
+        return min(self.max_intervall, max(self.min_intervall, intervall))
+
+    def budget_rest(self, conn, jetzt):
+        """Wie viele Abrufe in der laufenden Stunde noch erlaubt sind"""
+        verbraucht = conn.execute(
+            "SELECT COUNT(*) FROM abrufprotokoll WHERE zeit > ?", (jetzt - 3600,)
+        ).fetchone()[0]
+        return max(0, self.budget_pro_stunde - verbraucht)
+
+    def faellige(self, produkte, jetzt=None):
+        """Wählt die Produkte (Name -> URL) für diesen Takt im Rahmen des Budgets"""
+        jetzt = time.time() if jetzt is None else jetzt
+        with verbinde(self.dateipfad) as conn:
+            with conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO planung (product, intervall, naechster) VALUES (?, ?, ?)",
+                    ((name, self.startintervall, jetzt) for name in produkte)
+                )
+            rest = self.budget_rest(conn, jetzt)
+            # Priorität = erwartete Änderungen seit dem letzten Abruf relativ zum Ziel (>= 1 heißt fällig)
+            kandidaten = [
+                (name, 1 + (jetzt - naechster) / intervall)
+                for name, naechster, intervall in conn.execute(
+                    "SELECT product, naechster, intervall FROM planung "
+                    "WHERE naechster - ? <= intervall * ? AND (letzter_abruf IS NULL OR letzter_abruf <= ?)",
+                    (jetzt, 1 - self.vorziehen_ab, jetzt - self.min_intervall)
+                )
+                if name in produkte
+            ]
+        kandidaten.sort(key=lambda k: k[1], reverse=True)
+        faellig = sum(1 for _, prioritaet in kandidaten if prioritaet >= 1)
+
+        # Budget gleichmäßig über die Stunde verteilen; Rückstände fälliger Produkte dürfen
+        # den doppelten Anteil nutzen, freie Kapazität geht an die nächstwahrscheinlichen Änderungen
+        anteil = math.ceil(self.budget_pro_stunde * self.takt / 3600)
+        anzahl = min(rest, max(min(faellig, 2 * anteil), anteil), len(kandidaten))
+
+        METRIKEN.setze('planer_faellig', faellig)
+        METRIKEN.setze('planer_budget_rest', rest)
+        return {name: produkte[name] for name, _ in kandidaten[:anzahl]}
+
+    def verbuche(self, daten, fehlgeschlagen, jetzt=None):
+        """Aktualisiert Änderungsraten und nächste Abrufzeitpunkte nach einem Abrufzyklus"""
+        jetzt = time.time() if jetzt is None else jetzt
+        with verbinde(self.dateipfad) as conn, conn:
+            interessant = self._interessante_produkte(conn, jetzt)
+            for eintrag in daten:
+                self._verbuche_ergebnis(conn, eintrag, eintrag['product'] in interessant, jetzt)
+            # Fehlschläge nicht als Beobachtung werten, aber bald erneut versuchen
+            conn.executemany(
+                "UPDATE planung SET naechster = ? WHERE product = ?",
+                ((jetzt + self.min_intervall, name) for name in fehlgeschlagen)
+            )
+            conn.executemany(
+                "INSERT INTO abrufprotokoll (zeit) VALUES (?)",
+                [(jetzt,)] * (len(daten) + len(fehlgeschlagen))
+            )
+            conn.execute("DELETE FROM abrufprotokoll WHERE zeit <= ?", (jetzt - 3600,))
+
+    def _verbuche_ergebnis(self, conn, eintrag, interessant, jetzt):
+        zeile = conn.execute(
+            "SELECT letzter_abruf, letzter_preis, letzter_shop, aenderungen, beobachtet "
+            "FROM planung WHERE product = ?", (eintrag['product'],)
+        ).fetchone()
+        letzter_abruf, letzter_preis, letzter_shop, aenderungen, beobachtet = zeile or (None, None, None, 0, 0)
+
+        if letzter_abruf is not None:
+            dauer = max(0.0, jetzt - letzter_abruf)
+            gewicht = 0.5 ** (dauer / HALBWERTSZEIT)
+            geaendert = eintrag['price'] != letzter_preis or eintrag['shop'] != letzter_shop
+            aenderungen = aenderungen * gewicht + geaendert
+            beobachtet = beobachtet * gewicht + dauer
+            if geaendert:
+                METRIKEN.zaehle('planer_aenderungen')
+
+        intervall = self.intervall(aenderungen, beobachtet, interessant)
+        conn.execute(
+            "INSERT OR REPLACE INTO planung (product, intervall, naechster, letzter_abruf, letzter_preis, "
+            "letzter_shop, aenderungen, beobachtet, interesse) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, (SELECT interesse FROM planung WHERE product = ?))",
+            (eintrag['product'], intervall, jetzt + intervall, jetzt, eintrag['price'], eintrag['shop'],
+             aenderungen, beobachtet, eintrag['product'])
+        )
+
+    def _interessante_produkte(self, conn, jetzt):
+        """Produkte mit Alarmregeln oder kürzlicher Auswahl im Dashboard"""
+        return {
+            name for (name,) in conn.execute(
+                "SELECT product FROM regeln UNION SELECT product FROM planung WHERE interesse > ?",
+                (jetzt - INTERESSE_TAGE * 24 * 3600,)
+            )
+        }
+
+
+def merke_interesse(dateipfad, produkte, jetzt=None):
+    """Vermerkt, dass Produkte im Dashboard gewählt wurden, und zieht ihren nächsten Abruf vor"""
+    jetzt = time.time() if jetzt is None else jetzt
+    with verbinde(dateipfad) as conn:
+        conn.executescript(PLANER_SCHEMA)
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO planung (product, intervall, naechster) VALUES (?, ?, ?)",
+                ((name, SCRAPE_INTERVALL, jetzt) for name in produkte)
+            )
+            # Nur bisher uninteressante Produkte vorziehen, ihr Intervall enthält den Faktor noch nicht
+            conn.executemany(
+                "UPDATE planung SET naechster = MIN(naechster, COALESCE(letzter_abruf, 0) + intervall / ?) "
+                "WHERE product = ? AND (interesse IS NULL OR interesse <= ?)",
+                ((INTERESSE_FAKTOR, name, jetzt - INTERESSE_TAGE * 24 * 3600) for name in produkte)
+            )
+            conn.executemany(
+                "UPDATE planung SET interesse = ? WHERE product = ?", ((jetzt, name) for name in produkte)
+            )
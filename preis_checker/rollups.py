@@ -0,0 +1,226 @@
+"""Inkrementell gepflegte OHLC-Rollups (Stunde/Tag/Woche) je Produkt
+
+Jeder Bucket speichert Open/High/Low/Close, Anzahl, Summe und Quadratsumme
+sowie ein exaktes Histogramm der Preise in Cent für den Median. Neue Beobachtungen
+aktualisieren nur ihre eigenen Buckets; Statistiken über ein Zeitfenster
+werden aus den Buckets zusammengeführt statt aus den Rohdaten berechnet.
+"""
+import json
+import math
+from datetime import datetime, timedelta
+
+BUCKETFORMAT = '%Y-%m-%d %H:%M'
+
+GRANULARITAETEN = ('stunde', 'tag', 'woche')
+
+# Passende Granularität für die Zeitraum-Buttons des Dashboards (Tage -> Bucketgröße)
+GRANULARITAET_FUER_TAGE = {7: 'stunde', 30: 'tag', 365: 'woche'}
+
+ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollups (
+    granularitaet  TEXT NOT NULL,
+    product        TEXT NOT NULL,
+    bucket         TEXT NOT NULL,
+    open           REAL NOT NULL,
+    open_ts        TEXT NOT NULL,
+    high           REAL NOT NULL,
+    low            REAL NOT NULL,
+    close          REAL NOT NULL,
+    close_ts       TEXT NOT NULL,
+    anzahl         INTEGER NOT NULL,
+    summe          REAL NOT NULL,
+    summe_quadrate REAL NOT NULL,
+    histogramm     TEXT NOT NULL,
+    PRIMARY KEY (granularitaet, product, bucket)
+) WITHOUT ROWID;
+"""
+
+_SPALTEN = ('open', 'open_ts', 'high', 'low', 'close', 'close_ts',
+            'anzahl', 'summe', 'summe_quadrate', 'histogramm')
+
+
+def bucket_start(datum, granularitaet):
+    """Beginn des Buckets, in den der Zeitpunkt fällt"""
+    stunde = datum.replace(minute=0, second=0, microsecond=0)
+    if granularitaet == 'stunde':
+        return stunde
+    tag = stunde.replace(hour=0)
+    if granularitaet == 'tag':
+        return tag
+    if granularitaet == 'woche':
+        return tag - timedelta(days=tag.weekday())
+    raise ValueError(f"Unbekannte Granularität: {granularitaet}")
+
+
+class PreisHistogramm:
+    """Exaktes Histogramm der Preise in ganzen Cent ({Cent: Anzahl}), per Addition mergebar"""
+
+    def __init__(self, zaehler=None):
+        self.zaehler = dict(zaehler or {})
+
+    def fuege_hinzu(self, preis, anzahl=1):
+        cent = round(preis * 100)
+        self.zaehler[cent] = self.zaehler.get(cent, 0) + anzahl
+
+    def vereinige(self, andere):
+        for cent, anzahl in andere.zaehler.items():
+            self.zaehler[cent] = self.zaehler.get(cent, 0) + anzahl
+
+    def median(self):
+        """Median wie bei pandas: bei gerader Anzahl das Mittel der beiden mittleren Preise"""
+        gesamt = sum(self.zaehler.values())
+        if not gesamt:
+            return None
+        raenge = [(gesamt - 1) // 2, gesamt // 2]
+        mitte = []
+        kumuliert = 0
+        for cent in sorted(self.zaehler):
+            kumuliert += self.zaehler[cent]
+            while raenge and kumuliert > raenge[0]:
+                mitte.append(cent)
+                raenge.pop(0)
+            if not raenge:
+                break
+        return (mitte[0] + mitte[1]) / 200
+
+    def als_json(self):
+        return json.dumps(self.zaehler, separators=(',', ':'))
+
+    @classmethod
+    def aus_json(cls, text):
+        return cls(zaehler={int(k): v for k, v in json.loads(text).items()})
+
+
+class Kerze:
+    """Aggregat eines Buckets; Zeitstempel als sortierbare Strings"""
+
+    def __init__(self, preis, zeitstempel):
+        self.open = self.high = self.low = self.close = preis
+        self.open_ts = self.close_ts = zeitstempel
+        self.anzahl = 1
+        self.summe = preis
+        self.summe_quadrate = preis * preis
+        self.histogramm = PreisHistogramm()
+        self.histogramm.fuege_hinzu(preis)
+
+    @classmethod
+    def aus_zeile(cls, zeile):
+        kerze = cls.__new__(cls)
+        for spalte, wert in zip(_SPALTEN, zeile):
+            setattr(kerze, spalte, wert)
+        kerze.histogramm = PreisHistogramm.aus_json(kerze.histogramm)
+        return kerze
+
+    def als_zeile(self):
+        return tuple(self.histogramm.als_json() if s == 'histogramm' else getattr(self, s) for s in _SPALTEN)
+
+    def fuege_hinzu(self, preis, zeitstempel):
+        if zeitstempel < self.open_ts:
+            self.open, self.open_ts = preis, zeitstempel
+        if zeitstempel >= self.close_ts:
+            self.close, self.close_ts = preis, zeitstempel
+        self.high = max(self.high, preis)
+        self.low = min(self.low, preis)
+        self.anzahl += 1
+        self.summe += preis
+        self.summe_quadrate += preis * preis
+        self.histogramm.fuege_hinzu(preis)
+
+    def vereinige(self, andere):
+        if andere.open_ts < self.open_ts:
+            self.open, self.open_ts = andere.open, andere.open_ts
+        if andere.close_ts >= self.close_ts:
+            self.close, self.close_ts = andere.close, andere.close_ts
+        self.high = max(self.high, andere.high)
+        self.low = min(self.low, andere.low)
+        self.anzahl += andere.anzahl
+        self.summe += andere.summe
+        self.summe_quadrate += andere.summe_quadrate
+        self.histogramm.vereinige(andere.histogramm)
+
+    def statistik(self):
+        """Kennzahlen im Format der bisherigen Preisstatistik"""
+        n = self.anzahl
+        varianz = (self.summe_quadrate - self.summe * self.summe / n) / (n - 1) if n > 1 else float('nan')
+        return {
+            'min': self.low,
+            'max': self.high,
+            'mean': self.summe / n,
+            'median': self.histogramm.median(),
+            'std': math.sqrt(max(varianz, 0.0)) if n > 1 else float('nan'),
+            'count': n,
+            'open': self.open,
+            'close': self.close,
+        }
+
+
+def _sammle(zeilen):
+    """Fasst (product, price, date-String) zu Kerzen je (Granularität, Produkt, Bucket) zusammen"""
+    kerzen = {}
+    for product, preis, zeitstempel in zeilen:
+        datum = datetime.fromisoformat(zeitstempel)
+        for granularitaet in GRANULARITAETEN:
+            schluessel = (granularitaet, product,
+                          bucket_start(datum, granularitaet).strftime(BUCKETFORMAT))
+            if schluessel in kerzen:
+                kerzen[schluessel].fuege_hinzu(preis, zeitstempel)
+            else:
+                kerzen[schluessel] = Kerze(preis, zeitstempel)
+    return kerzen
+
+
+def aktualisiere_rollups(conn, zeilen):
+    """Verrechnet neue Beobachtungen (product, price, date-String) in ihre Buckets
+
+    Muss innerhalb der Transaktion aufgerufen werden, die die Beobachtungen einfügt.
+    """
+    for (granularitaet, product, bucket), kerze in _sammle(zeilen).items():
+        bestehend = conn.execute(
+            f"SELECT {', '.join(_SPALTEN)} FROM rollups "
+            "WHERE granularitaet = ? AND product = ? AND bucket = ?",
+            (granularitaet, product, bucket)
+        ).fetchone()
+        if bestehend:
+            kerze.vereinige(Kerze.aus_zeile(bestehend))
+        conn.execute(
+            f"INSERT OR REPLACE INTO rollups (granularitaet, product, bucket, {', '.join(_SPALTEN)}) "
+            f"VALUES (?, ?, ?, {', '.join('?' * len(_SPALTEN))})",
+            (granularitaet, product, bucket, *kerze.als_zeile())
+        )
+
+
+def baue_rollups_neu(conn, blockgroesse=50_000):
+    """Berechnet alle Rollups aus der Rohhistorie (einmalig nach Migrationen)
+
+    Blockweise nach Produkt und Zeit, damit nur die Kerzen eines Blocks im
+    Speicher liegen; Buckets an Blockgrenzen werden mit dem gespeicherten Stand vereinigt.
+    """
+    with conn:
+        conn.execute("DELETE FROM rollups")
+        cursor = conn.execute("SELECT product, price, date FROM preise ORDER BY product, date")
+        while True:
+            block = cursor.fetchmany(blockgroesse)
+            if not block:
+                break
+            aktualisiere_rollups(conn, block)
+
+
+def statistik(conn, granularitaet, von=None, produkte=None):
+    """Führt die Buckets ab `von` je Produkt zusammen und liefert {Produkt: Kennzahlen}"""
+    sql = f"SELECT product, {', '.join(_SPALTEN)} FROM rollups WHERE granularitaet = ?"
+    parameter = [granularitaet]
+    if von is not None:
+        sql += " AND bucket >= ?"
+        parameter.append(bucket_start(von, granularitaet).strftime(BUCKETFORMAT))
+    if produkte is not None:
+        sql += f" AND product IN ({', '.join('?' * len(produkte))})"
+        parameter.extend(produkte)
+
+    gesamt = {}
+    for product, *zeile in conn.execute(sql + " ORDER BY product, bucket", parameter):
+        kerze = Kerze.aus_zeile(zeile)
+        if product in gesamt:
+            gesamt[product].vereinige(kerze)
+        else:
+            gesamt[product] = kerze
+    return {product: kerze.statistik() for product, kerze in gesamt.items()}
@@ -0,0 +1,205 @@
+"""Abruf und Auswertung einzelner Geizhals-Produktseiten
+
+Sessions werden je Host in einem Pool gehalten und wiederverwendet (Keep-Alive,
+einmal gelöste Cloudflare-Challenge). Jede URL merkt sich ETag/Last-Modified und
+einen Hash des letzten Seiteninhalts in der Preisdatenbank: Bei 304 oder
+unverändertem Inhalt wird das zuletzt geparste Ergebnis mit neuem Zeitstempel
+zurückgegeben, auch im ersten Zyklus eines neu gestarteten Prozesses.
+"""
+import hashlib
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import partial
+
+from .engine import STANDARD_LIMIT, EinzelFlug, HostLimiter, Sicherungen, host_von, scrape_parallel
+from .extraktor import extrahiere, mit_angeboten
+from .konfiguration import (
+    ANGEBOTE_ERFASSEN, BACKOFF_BASIS, DATEIPFAD, ERGEBNIS_TTL, HOST_LIMITS, SICHERUNG_ABKUEHLZEIT, SICHERUNG_SCHWELLE, TIMEZONE,
+    ZYKLUS_FRIST,
+)
+from .metriken import METRIKEN
+from .speicher import lade_validatoren, speichere_validatoren
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                  '(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36'
+}
+
+
+def neue_session():
+    """Cloudflare-fähige Session; cloudscraper wird erst beim ersten Abruf importiert"""
+    import cloudscraper
+
+    return cloudscraper.create_scraper()
+
+
+class SessionPool:
+    """Wiederverwendbare Scraper-Sessions, höchstens `max_parallel` je Host gleichzeitig"""
+
+    def __init__(self, limits=None, standard=STANDARD_LIMIT, fabrik=neue_session):
+        self._limits = {host.lower(): wert for host, wert in (limits or {}).items()}
+        self._standard = standard
+        self._fabrik = fabrik
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _host_pool(self, host):
+        with self._lock:
+            if host not in self._hosts:
+                _, max_parallel = self._limits.get(host, self._standard)
+                self._hosts[host] = (queue.LifoQueue(), threading.BoundedSemaphore(max(1, int(max_parallel))))
+            return self._hosts[host]
+
+    @contextmanager
+    def session(self, url):
+        """Leiht eine Session für den Host der URL aus; nach Fehlern wird sie verworfen"""
+        frei, belegt = self._host_pool(host_von(url))
+        with belegt:
+            try:
+                session = frei.get_nowait()
+            except queue.Empty:
+                session = self._fabrik()
+                session.headers.update(HEADERS)
+            try:
+                yield session
+            except BaseException:
+                session.close()
+                raise
+            frei.put(session)
+
+    def schliessen(self):
+        """Schließt alle freien Sessions (z. B. beim Beenden des Workers)"""
+        with self._lock:
+            hosts, self._hosts = self._hosts, {}
+        for frei, _ in hosts.values():
+            while not frei.empty():
+                frei.get_nowait().close()
+
+
+class Revalidierung:
+    """Merkt sich je URL Validatoren, Inhalts-Hash und zuletzt geparstes Ergebnis
+
+    Mit `dateipfad` liegen die Einträge zusätzlich in der Preisdatenbank, damit
+    auch einmalige Läufe (cron, `python -m preis_checker scrape`) bedingt abrufen.
+    """
+
+    def __init__(self, dateipfad=None):
+        self.dateipfad = dateipfad
+        self._eintraege = {}
+        self._lock = threading.Lock()
+
+    def _eintrag(self, url):
+        with self._lock:
+            if url in self._eintraege:
+                return self._eintraege[url]
+        # Einmal je URL und Prozess aus der Datenbank nachladen
+        eintrag = lade_validatoren(self.dateipfad, url) if self.dateipfad else None
+        with self._lock:
+            return self._eintraege.setdefault(url, eintrag)
+
+    def header(self, url):
+        """Bedingte Request-Header für die URL"""
+        eintrag = self._eintrag(url)
+        if not eintrag:
+            return {}
+        header = {}
+        if eintrag.get('etag'):
+            header['If-None-Match'] = eintrag['etag']
+        if eintrag.get('last_modified'):
+            header['If-Modified-Since'] = eintrag['last_modified']
+        return header
+
+    def letztes_ergebnis(self, url, inhalt_hash=None):
+        """Zuletzt geparste Werte; mit `inhalt_hash` nur, wenn der Inhalt identisch ist"""
+        eintrag = self._eintrag(url)
+        if not eintrag or (inhalt_hash is not None and eintrag['hash'] != inhalt_hash):
+            return None
+        return eintrag['werte']
+
+    def merke(self, url, antwort, inhalt_hash, werte):
+        eintrag = {
+            'etag': antwort.headers.get('ETag'),
+            'last_modified': antwort.headers.get('Last-Modified'),
+            'hash': inhalt_hash,
+            'werte': werte,
+        }
+        with self._lock:
+            unveraendert = self._eintraege.get(url) == eintrag
+            self._eintraege[url] = eintrag
+        # Geschrieben wird nur, wenn sich etwas geändert hat
+        if self.dateipfad and not unveraendert:
+            speichere_validatoren(self.dateipfad, url, eintrag)
+
+
+SESSION_POOL = SessionPool(HOST_LIMITS)
+REVALIDIERUNG = Revalidierung(DATEIPFAD)
+# Prozessweit: gleichzeitige Abrufe derselben kanonischen URL teilen sich eine Anfrage
+EINZELFLUG = EinzelFlug(ttl=ERGEBNIS_TTL)
+# Prozessweit, damit ein ausgefallener Shop auch über Zyklen hinweg gesperrt bleibt
+SICHERUNGEN = Sicherungen(SICHERUNG_SCHWELLE, SICHERUNG_ABKUEHLZEIT)
+HOST_LIMITER = HostLimiter(HOST_LIMITS)
+
+
+def scrape_versuch(url, pool=SESSION_POOL, revalidierung=REVALIDIERUNG, timeout=15):
+    """Ein einzelner Abrufversuch; liefert die Werte oder None und wirft bei Netzwerk- und HTTP-Fehlern"""
+    host = host_von(url)
+    start = time.perf_counter()
+    try:
+        with pool.session(url) as scraper:
+            res = scraper.get(url, headers=revalidierung.header(url), timeout=timeout)
+    finally:
+        dauer = time.perf_counter() - start
+        METRIKEN.beobachte('abruf_sekunden', dauer, host=host)
+        METRIKEN.setze('letzter_abruf_sekunden', dauer, url=url)
+    METRIKEN.zaehle('http_antworten', host=host, status=res.status_code)
+    METRIKEN.zaehle('bytes_geladen', len(res.content), host=host)
+
+    if res.status_code == 304:
+        METRIKEN.zaehle('unveraendert', host=host, grund='304')
+        werte = revalidierung.letztes_ergebnis(url)
+    else:
+        res.raise_for_status()
+        inhalt_hash = hashlib.sha1(res.content).hexdigest()
+        # Identischer Inhalt muss nicht erneut geparst werden
+        werte = revalidierung.letztes_ergebnis(url, inhalt_hash)
+        if werte is None:
+            with METRIKEN.stoppe('parse_sekunden', host=host):
+                werte = extrahiere(res.text)
+                # Die ganze Angebotsliste kommt aus demselben Abruf mit
+                if werte and ANGEBOTE_ERFASSEN:
+                    werte = mit_angeboten(werte, res.text)
+            if werte:
+                revalidierung.merke(url, res, inhalt_hash, werte)
+        else:
+            METRIKEN.zaehle('unveraendert', host=host, grund='hash')
+            # Neue Validatoren übernehmen, damit der nächste Abruf wieder bedingt gestellt wird
+            revalidierung.merke(url, res, inhalt_hash, werte)
+
+    if not werte:
+        METRIKEN.zaehle('kein_preis', host=host)
+        return None
+    return {
+        **werte,
+        'date': datetime.now(TIMEZONE),
+        'url': url
+    }
+
+
+def robust_scrape(url, max_retries=3, pool=SESSION_POOL, revalidierung=REVALIDIERUNG):
+    """Robuste Funktion zum Scrapen von Preisdaten mit Cloudflare-Umgehung
+
+    Einzelne URL mit Wiederholungen; geplant wird wie in scrape_parallel
+    (gestreuter Backoff, Sicherung je Host, Frist).
+    """
+    return scrape_parallel(
+        {url: url},
+        partial(scrape_versuch, pool=pool, revalidierung=revalidierung),
+        limiter=HOST_LIMITER,
+        versuche=max_retries,
+        backoff_basis=BACKOFF_BASIS,
+        sicherungen=SICHERUNGEN,
+        frist=ZYKLUS_FRIST,
+    )[url]
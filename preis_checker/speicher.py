@@ -0,0 +1,540 @@
+"""Persistenz der Preishistorie und des Worker-Status
+
+Die Historie liegt in einer SQLite-Datei im WAL-Modus. Neue Beobachtungen
+werden nur angehängt; ein eindeutiger Index über (Produkt, Shop, Preis, Tag)
+verwirft Duplikate direkt beim Einfügen.
+
+Optional wird daraus ein spaltenorientierter Parquet-Snapshot kompaktiert
+(datetime64-Zeitstempel, float64-Preise, kategoriale Produkt-/Shop-Spalten).
+Leser kombinieren den Snapshot mit den seitdem angehängten SQLite-Zeilen.
+
+Start: python -m preis_checker.speicher {migriere,kompaktiere}
+"""
+import argparse
+import json
+import os
+import sqlite3
+from contextlib import closing, contextmanager
+from datetime import datetime
+from urllib.request import pathname2url
+
+from . import alarme, angebote
+from .metriken import METRIKEN
+from .rollups import ROLLUP_SCHEMA, aktualisiere_rollups, baue_rollups_neu, statistik
+
+DATUMSFORMAT = '%Y-%m-%d %H:%M:%S.%f'
+SPALTEN = ['id', 'product', 'shop', 'price', 'date', 'url']
+KATEGORIALE_SPALTEN = ['product', 'shop', 'url']
+
+# Schlüssel in den Parquet-Metadaten: höchste SQLite-id, die im Snapshot steckt
+_SNAPSHOT_MAX_ID = b'preis_checker_max_id'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS preise (
+    id      INTEGER PRIMARY KEY,
+    product TEXT NOT NULL,
+    shop    TEXT NOT NULL,
+    price   REAL NOT NULL,
+    date    TEXT NOT NULL,
+    day     TEXT NOT NULL,
+    url     TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS preise_eindeutig ON preise (product, shop, price, day);
+CREATE INDEX IF NOT EXISTS preise_produkt_datum ON preise (product, date);
+CREATE TABLE IF NOT EXISTS meta (
+    schluessel TEXT PRIMARY KEY,
+    wert       TEXT
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS ausfaelle (
+    product TEXT PRIMARY KEY,
+    grund   TEXT NOT NULL,
+    seit    TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS revalidierung (
+    url           TEXT PRIMARY KEY,
+    etag          TEXT,
+    last_modified TEXT,
+    hash          TEXT NOT NULL,
+    werte         TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+# Schlüssel in `meta`: gesetzt, sobald die frühere JSON-Historie vollständig übernommen ist
+_JSON_MIGRIERT = 'json_migriert'
+
+# Datenbanken, deren Schema in diesem Prozess bereits angelegt ist
+_SCHEMA_ANGELEGT = set()
+
+
+@contextmanager
+def verbinde(dateipfad, lesend=False):
+    """Öffnet die Preisdatenbank und schließt sie danach wieder
+
+    Datei und Schema werden einmal pro Prozess angelegt; Übernahmen und
+    Neuberechnungen erledigt nur `richte_ein`. Mit `lesend` ist die Verbindung
+    schreibgeschützt.
+    """
+    if dateipfad not in _SCHEMA_ANGELEGT:
+        _lege_schema_an(dateipfad)
+    if lesend:
+        uri = f"file:{pathname2url(os.path.abspath(dateipfad))}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, timeout=30)
+    else:
+        conn = sqlite3.connect(dateipfad, timeout=30)
+    with closing(conn):
+        if not lesend:
+            conn.execute("PRAGMA synchronous=NORMAL")
+        yield conn
+
+
+def _lege_schema_an(dateipfad):
+    with closing(sqlite3.connect(dateipfad, timeout=30)) as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA + ROLLUP_SCHEMA + alarme.ALARM_SCHEMA + angebote.ANGEBOTE_SCHEMA)
+    _SCHEMA_ANGELEGT.add(dateipfad)
+
+
+def richte_ein(dateipfad):
+    """Einmalige Arbeiten beim Start des Workers: frühere JSON-Historie übernehmen, fehlende Rollups berechnen
+
+    Das Dashboard ruft dies nie auf, damit kein Rendern einen langen Import anstößt.
+    """
+    with verbinde(dateipfad) as conn:
+        if not _json_migriert(conn):
+            _migriere_json(conn, dateipfad)
+        if _rollups_fehlen(conn):
+            baue_rollups_neu(conn)
+
+
+def _json_migriert(conn):
+    return conn.execute("SELECT 1 FROM meta WHERE schluessel = ?", (_JSON_MIGRIERT,)).fetchone() is not None
+
+
+def _merke_json_migriert(conn, json_pfad):
+    conn.execute("INSERT OR REPLACE INTO meta (schluessel, wert) VALUES (?, ?)", (_JSON_MIGRIERT, json_pfad))
+
+
+def _rollups_fehlen(conn):
+    """True für Datenbanken aus der Zeit vor den Rollups"""
+    return conn.execute(
+        "SELECT EXISTS (SELECT 1 FROM preise) AND NOT EXISTS (SELECT 1 FROM rollups)"
+    ).fetchone()[0]
+
+
+def _migriere_json(conn, dateipfad):
+    """Übernimmt einmalig die Historie aus der früheren JSON-Datei neben der Datenbank
+
+    Erledigt ist die Migration erst mit dem Eintrag in `meta`, der in derselben
+    Transaktion wie die Zeilen geschrieben wird. Ein abgebrochener Import
+    hinterlässt weder Zeilen noch Eintrag und wird beim nächsten Start wiederholt.
+    """
+    json_pfad = f"{os.path.splitext(dateipfad)[0]}.json"
+    if not os.path.exists(json_pfad):
+        with conn:
+            _merke_json_migriert(conn, None)
+        return
+    try:
+        anzahl = _importiere_json(conn, json_pfad)
+    except (OSError, ValueError, KeyError, sqlite3.Error) as e:
+        print(f"Übernahme aus {json_pfad} fehlgeschlagen, wird beim nächsten Start wiederholt: {e}")
+        return
+    print(f"{anzahl} Einträge aus {json_pfad} übernommen")
+
+
+def _lese_json_eintraege(json_pfad, puffergroesse=1 << 20):
+    """Liefert die Einträge eines JSON-Arrays (oder JSON Lines) einzeln, ohne die Datei ganz zu laden"""
+    decoder = json.JSONDecoder()
+    with open(json_pfad, 'r', encoding='utf-8') as f:
+        puffer, pos, dateiende = '', 0, False
+        while True:
+            # Klammern, Kommas und Leerraum zwischen den Einträgen überspringen
+            while pos < len(puffer) and puffer[pos] in ' \t\r\n,[]':
+                pos += 1
+            if pos < len(puffer):
+                try:
+                    eintrag, pos = decoder.raw_decode(puffer, pos)
+                    yield eintrag
+                    continue
+                except json.JSONDecodeError:
+                    # Eintrag am Pufferende abgeschnitten: nachladen, außer die Datei ist zu Ende
+                    if dateiende:
+                        raise
+            elif dateiende:
+                return
+            nachschub = f.read(puffergroesse)
+            puffer, pos, dateiende = puffer[pos:] + nachschub, 0, not nachschub
+
+
+def _importiere_json(conn, json_pfad):
+    """Importiert eine Historie im alten JSON-Schema und liefert die Zahl neuer Zeilen
+
+    Die Datei wird gestreamt; der Speicherbedarf hängt nicht von ihrer Größe ab.
+    """
+    daten = _lese_json_eintraege(json_pfad)
+
+    vorher = conn.total_changes
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO preise (product, shop, price, date, day, url) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (eintrag['product'], eintrag['shop'], eintrag['price'],
+                 datum.strftime(DATUMSFORMAT), datum.date().isoformat(), eintrag.get('url'))
+                for eintrag in daten
+                for datum in (datetime.fromisoformat(eintrag['date']),)
+            )
+        )
+        anzahl = conn.total_changes - vorher
+        _merke_json_migriert(conn, json_pfad)
+    if anzahl:
+        baue_rollups_neu(conn)
+    return anzahl
+
+
+def _fuege_ein(conn, daten):
+    """Fügt Beobachtungen samt Rollups und Marktbildern in einer Transaktion ein und liefert die neuen"""
+    neue_daten = []
+    neue_zeilen = []
+    with conn:
+        for eintrag in daten:
+            zeitstempel = eintrag['date'].strftime(DATUMSFORMAT)
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO preise (product, shop, price, date, day, url) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (eintrag['product'], eintrag['shop'], eintrag['price'],
+                 zeitstempel, eintrag['date'].date().isoformat(), eintrag.get('url'))
+            )
+            if cursor.rowcount:
+                neue_daten.append(eintrag)
+                neue_zeilen.append((eintrag['product'], eintrag['price'], zeitstempel))
+        aktualisiere_rollups(conn, neue_zeilen)
+        METRIKEN.zaehle('marktbilder_gespeichert', angebote.speichere(conn, daten))
+    return neue_daten
+
+
+def speichere_daten(daten, dateipfad):
+    """Hängt neue Beobachtungen an und liefert die Einträge, die keine Duplikate waren"""
+    with METRIKEN.stoppe('speichern_sekunden'), verbinde(dateipfad) as conn:
+        neue_daten = _fuege_ein(conn, daten)
+    METRIKEN.zaehle('zeilen_gespeichert', len(neue_daten))
+    METRIKEN.zaehle('duplikate_verworfen', len(daten) - len(neue_daten))
+    return neue_daten
+
+
+def lade_statistik(dateipfad, granularitaet, von=None, produkte=None):
+    """Preisstatistik je Produkt ab `von`, zusammengeführt aus den Rollups"""
+    if not os.path.exists(dateipfad):
+        return {}
+    with verbinde(dateipfad, lesend=True) as conn:
+        return statistik(conn, granularitaet, von=von, produkte=produkte)
+
+
+def lade_marktbild(dateipfad, product, zeitpunkt=None):
+    """Alle Angebote eines Produkts laut jüngstem Marktbild bis `zeitpunkt`"""
+    if not os.path.exists(dateipfad):
+        return []
+    with verbinde(dateipfad, lesend=True) as conn:
+        return angebote.marktbild(conn, product, zeitpunkt)
+
+
+def werte_alarme_aus(dateipfad, neue_daten):
+    """Prüft die Preisalarme gegen neu gespeicherte Beobachtungen und liefert die ausgelösten"""
+    if not neue_daten:
+        return []
+    with METRIKEN.stoppe('alarme_sekunden'), verbinde(dateipfad) as conn:
+        ausgeloest = alarme.werte_aus(conn, neue_daten)
+    METRIKEN.zaehle('alarme_ausgeloest', len(ausgeloest))
+    return ausgeloest
+
+
+def lege_regel_an(dateipfad, product, typ, schwelle=None, fenster_tage=None):
+    """Legt eine Alarmregel an und liefert ihre id"""
+    with verbinde(dateipfad) as conn:
+        return alarme.lege_regel_an(conn, product, typ, schwelle, fenster_tage)
+
+
+def loesche_regel(dateipfad, regel_id):
+    """Löscht eine Alarmregel"""
+    with verbinde(dateipfad) as conn:
+        alarme.loesche_regel(conn, regel_id)
+
+
+def lade_regeln(dateipfad):
+    """Alle Alarmregeln"""
+    with verbinde(dateipfad, lesend=True) as conn:
+        return alarme.regeln(conn)
+
+
+def lade_alarme(dateipfad, limit=100):
+    """Die zuletzt ausgelösten Alarme"""
+    with verbinde(dateipfad, lesend=True) as conn:
+        return alarme.alarme(conn, limit)
+
+
+def lade_ausstehende_alarme(dateipfad, limit=100):
+    """Alarme, deren Zustellung bisher fehlgeschlagen ist"""
+    if not os.path.exists(dateipfad):
+        return []
+    with verbinde(dateipfad, lesend=True) as conn:
+        return alarme.ausstehende(conn, limit)
+
+
+def markiere_zugestellt(dateipfad, alarm_ids):
+    """Vermerkt zugestellte Alarme"""
+    if alarm_ids:
+        with verbinde(dateipfad) as conn:
+            alarme.markiere_zugestellt(conn, alarm_ids)
+
+
+def datenstand(dateipfad):
+    """Liefert einen Schlüssel, der sich mit jeder neu gespeicherten Beobachtung ändert"""
+    if not os.path.exists(dateipfad):
+        return None
+    with verbinde(dateipfad, lesend=True) as conn:
+        return conn.execute("SELECT MAX(id) FROM preise").fetchone()[0]
+
+
+def verbuche_ausfaelle(dateipfad, ausfaelle, abgerufen, jetzt=None):
+    """Merkt Produkte ohne Ergebnis bis zu ihrem nächsten erfolgreichen Abruf
+
+    `ausfaelle` ist {Produkt: Grund} dieses Zyklus, `abgerufen` die Produkte mit
+    Ergebnis. Liefert alle weiterhin veralteten Produkte als {Produkt: Grund}.
+    """
+    zeitpunkt = (jetzt or datetime.now()).strftime(DATUMSFORMAT)
+    with verbinde(dateipfad) as conn, conn:
+        conn.executemany("DELETE FROM ausfaelle WHERE product = ?", ((product,) for product in abgerufen))
+        # `seit` bleibt beim ersten Ausfall einer Serie, der Grund ist der jüngste
+        conn.executemany(
+            "INSERT INTO ausfaelle (product, grund, seit) VALUES (?, ?, ?) "
+            "ON CONFLICT (product) DO UPDATE SET grund = excluded.grund",
+            ((product, grund, zeitpunkt) for product, grund in ausfaelle.items())
+        )
+        return dict(conn.execute("SELECT product, grund FROM ausfaelle ORDER BY product"))
+
+
+def lade_validatoren(dateipfad, url):
+    """Gespeicherte Validatoren, Inhalts-Hash und geparste Werte einer URL oder None"""
+    if not os.path.exists(dateipfad):
+        return None
+    with verbinde(dateipfad, lesend=True) as conn:
+        zeile = conn.execute(
+            "SELECT etag, last_modified, hash, werte FROM revalidierung WHERE url = ?", (url,)
+        ).fetchone()
+    if not zeile:
+        return None
+    return {'etag': zeile[0], 'last_modified': zeile[1], 'hash': zeile[2], 'werte': json.loads(zeile[3])}
+
+
+def speichere_validatoren(dateipfad, url, eintrag):
+    with verbinde(dateipfad) as conn, conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO revalidierung (url, etag, last_modified, hash, werte) VALUES (?, ?, ?, ?, ?)",
+            (url, eintrag['etag'], eintrag['last_modified'], eintrag['hash'], json.dumps(eintrag['werte']))
+        )
+
+
+def letzte_beobachtungen(dateipfad, produkte):
+    """Jüngste gespeicherte Beobachtung je Produkt als {product: {'price', 'shop', 'date'}}"""
+    if not produkte or not os.path.exists(dateipfad):
+        return {}
+    letzte = {}
+    with verbinde(dateipfad, lesend=True) as conn:
+        for product in produkte:
+            zeile = conn.execute(
+                "SELECT price, shop, date FROM preise WHERE product = ? ORDER BY date DESC LIMIT 1", (product,)
+            ).fetchone()
+            if zeile:
+                letzte[product] = {'price': zeile[0], 'shop': zeile[1],
+                                   'date': datetime.strptime(zeile[2], DATUMSFORMAT)}
+    return letzte
+
+
+def _typisiere(df):
+    """Bringt Spalten auf ihre Zieltypen (datetime64, float64, category)"""
+    import pandas as pd
+
+    if 'date' in df and not pd.api.types.is_datetime64_any_dtype(df['date']):
+        df['date'] = pd.to_datetime(df['date'], format=DATUMSFORMAT)
+    if 'price' in df:
+        df['price'] = df['price'].astype('float64')
+    for spalte in KATEGORIALE_SPALTEN:
+        if spalte in df and df[spalte].dtype.name != 'category':
+            df[spalte] = df[spalte].astype('category')
+    return df
+
+
+def hat_pyarrow():
+    """Prüft, ob pyarrow für den Parquet-Snapshot installiert ist"""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _snapshot_max_id(spaltenpfad):
+    """Liefert die höchste im Parquet-Snapshot enthaltene id (oder None ohne Snapshot)"""
+    if not spaltenpfad or not os.path.exists(spaltenpfad) or not hat_pyarrow():
+        return None
+    import pyarrow.parquet as pq
+
+    metadaten = pq.read_schema(spaltenpfad).metadata or {}
+    return int(metadaten.get(_SNAPSHOT_MAX_ID, b'0'))
+
+
+def _lese_sql(conn, spalten, ab_id=None, von=None, bis=None):
+    """Liest Zeilen aus SQLite mit optionalem id- und Datumsfilter"""
+    import pandas as pd
+
+    bedingungen, parameter = [], []
+    if ab_id is not None:
+        bedingungen.append("id > ?")
+        parameter.append(ab_id)
+    if von is not None:
+        bedingungen.append("date >= ?")
+        parameter.append(von.strftime(DATUMSFORMAT))
+    if bis is not None:
+        bedingungen.append("date < ?")
+        parameter.append(bis.strftime(DATUMSFORMAT))
+
+    sql = f"SELECT {', '.join(spalten)} FROM preise"
+    if bedingungen:
+        sql += " WHERE " + " AND ".join(bedingungen)
+    return pd.read_sql_query(sql + " ORDER BY date", conn, params=parameter)
+
+
+def _haenge_an(alt, neu):
+    """Hängt neue Zeilen an den Snapshot an, ohne die Kategorien neu zu kodieren"""
+    import pandas as pd
+
+    for spalte in KATEGORIALE_SPALTEN:
+        if spalte in alt:
+            fehlend = neu[spalte].cat.categories.difference(alt[spalte].cat.categories)
+            if len(fehlend):
+                alt[spalte] = alt[spalte].cat.add_categories(fehlend)
+            neu[spalte] = neu[spalte].cat.set_categories(alt[spalte].cat.categories)
+
+    df = pd.concat([alt, neu], ignore_index=True)
+    if not df['date'].is_monotonic_increasing:
+        df = df.sort_values('date', kind='stable', ignore_index=True)
+    return df
+
+
+def lade_tabelle(dateipfad, spalten=None, von=None, bis=None, spaltenpfad=None):
+    """Lädt die Historie als typisierten DataFrame, optional nur Spalten und Zeitraum [von, bis)
+
+    Mit Parquet-Snapshot wird nur dessen benötigter Ausschnitt gelesen und um die
+    danach in SQLite angehängten Zeilen ergänzt.
+    """
+    with METRIKEN.stoppe('laden_sekunden', quelle='parquet' if spaltenpfad and os.path.exists(spaltenpfad) else 'sqlite'):
+        df = _lade_tabelle(dateipfad, spalten, von, bis, spaltenpfad)
+    METRIKEN.setze('geladene_zeilen', len(df))
+    return df
+
+
+def _lade_tabelle(dateipfad, spalten, von, bis, spaltenpfad):
+    import pandas as pd
+
+    spalten = [s for s in SPALTEN if s in (spalten or SPALTEN)]
+    # Ohne Datumsspalte lässt sich weder filtern noch sortieren
+    lese_spalten = spalten if 'date' in spalten else spalten + ['date']
+    if not os.path.exists(dateipfad):
+        return _typisiere(pd.DataFrame({s: pd.Series(dtype=object) for s in spalten}))
+
+    snapshot_id = _snapshot_max_id(spaltenpfad)
+    with verbinde(dateipfad, lesend=True) as conn:
+        neu = _lese_sql(conn, lese_spalten, ab_id=snapshot_id, von=von, bis=bis)
+
+    if snapshot_id is None:
+        return _typisiere(neu)[spalten]
+
+    filter_ = []
+    if von is not None:
+        filter_.append(('date', '>=', pd.Timestamp(von)))
+    if bis is not None:
+        filter_.append(('date', '<', pd.Timestamp(bis)))
+    df = _typisiere(pd.read_parquet(spaltenpfad, columns=lese_spalten, filters=filter_ or None))
+    if len(neu):
+        df = _haenge_an(df, _typisiere(neu))
+    return df[spalten]
+
+
+def ungepackte_zeilen(dateipfad, spaltenpfad):
+    """Zahl der Zeilen, die seit dem letzten Parquet-Snapshot angehängt wurden"""
+    with verbinde(dateipfad, lesend=True) as conn:
+        return conn.execute(
+            "SELECT COUNT(*) FROM preise WHERE id > ?", (_snapshot_max_id(spaltenpfad) or 0,)
+        ).fetchone()[0]
+
+
+def kompaktiere(dateipfad, spaltenpfad):
+    """Schreibt die komplette Historie nach Datum sortiert als Parquet-Snapshot"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    with verbinde(dateipfad, lesend=True) as conn:
+        df = _typisiere(_lese_sql(conn, SPALTEN))
+
+    tabelle = pa.Table.from_pandas(df, preserve_index=False)
+    max_id = int(df['id'].max()) if len(df) else 0
+    tabelle = tabelle.replace_schema_metadata({
+        **(tabelle.schema.metadata or {}),
+        _SNAPSHOT_MAX_ID: str(max_id).encode(),
+    })
+
+    temp_pfad = f"{spaltenpfad}.tmp"
+    pq.write_table(tabelle, temp_pfad, row_group_size=100_000)
+    os.replace(temp_pfad, spaltenpfad)
+    return len(df)
+
+
+def migriere_json(json_pfad, dateipfad, spaltenpfad=None):
+    """Einmalige Migration einer JSON-Historie in SQLite (und optional Parquet)"""
+    with verbinde(dateipfad) as conn:
+        anzahl = _importiere_json(conn, json_pfad)
+    if spaltenpfad:
+        kompaktiere(dateipfad, spaltenpfad)
+    return anzahl
+
+
+def schreibe_status(status, statuspfad):
+    """Schreibt den Worker-Status atomar, damit Leser nie eine halbe Datei sehen"""
+    temp_pfad = f"{statuspfad}.tmp"
+    with open(temp_pfad, 'w') as f:
+        json.dump(status, f, indent=2, default=str)
+    os.replace(temp_pfad, statuspfad)
+
+
+def lade_status(statuspfad):
+    """Lädt den zuletzt geschriebenen Worker-Status (oder None)"""
+    try:
+        with open(statuspfad, 'r') as f:
+            status = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+    if status.get('letzte_aktualisierung'):
+        status['letzte_aktualisierung'] = datetime.fromisoformat(status['letzte_aktualisierung'])
+    return status
+
+
+def main(argv=None):
+    from .konfiguration import DATEIPFAD, JSON_DATEIPFAD, SPALTENPFAD
+
+    parser = argparse.ArgumentParser(description="Wartung des Preisspeichers")
+    befehle = parser.add_subparsers(dest="befehl", required=True)
+    migration = befehle.add_parser("migriere", help="JSON-Historie in SQLite/Parquet übernehmen")
+    migration.add_argument("json_pfad", nargs="?", default=JSON_DATEIPFAD)
+    befehle.add_parser("kompaktiere", help="Parquet-Snapshot neu schreiben")
+    args = parser.parse_args(argv)
+
+    if args.befehl == "migriere":
+        anzahl = migriere_json(args.json_pfad, DATEIPFAD, SPALTENPFAD if hat_pyarrow() else None)
+        print(f"{anzahl} Einträge aus {args.json_pfad} übernommen")
+    else:
+        print(f"{kompaktiere(DATEIPFAD, SPALTENPFAD)} Einträge nach {SPALTENPFAD} geschrieben")
+
+
+if __name__ == "__main__":
+    main()
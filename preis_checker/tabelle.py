@@ -0,0 +1,86 @@
+"""Serverseitige Datenquelle für die Tabelle "Alle Daten"
+
+Die Tabelle wird einmal pro Datenstand vorbereitet (Preisänderungen vektorisiert
+je Produkt); jede Anfrage filtert, sortiert und schneidet danach nur die
+angeforderte Seite heraus. Alle Zahlen bleiben numerisch.
+"""
+import numpy as np
+from pandas.api.types import is_datetime64_dtype, is_numeric_dtype
+
+TABELLEN_SPALTEN = ['product', 'date', 'price', 'shop', 'price_change', 'percent_change', 'url']
+
+
+def bereite_tabelle_vor(historie):
+    """Sortiert nach Produkt/Datum (neueste zuerst) und berechnet die Änderung zum Vorgänger"""
+    spalten = [s for s in ('product', 'date', 'price', 'shop', 'url') if s in historie]
+    df = historie[spalten].sort_values(['product', 'date'], ascending=[True, False], ignore_index=True)
+
+    # Vorgänger ist die nächstältere Beobachtung desselben Produkts
+    vorheriger_preis = df.groupby('product', observed=True)['price'].shift(-1)
+    df['price_change'] = df['price'] - vorheriger_preis
+    df['percent_change'] = df['price_change'] / vorheriger_preis * 100
+    return df[[s for s in TABELLEN_SPALTEN if s in df]]
+
+
+def filtere(tabelle, produkte=None, von=None, bis=None):
+    """Positionen aller Zeilen, die zu Produktauswahl und Zeitraum [von, bis) passen"""
+    maske = np.ones(len(tabelle), dtype=bool)
+    if produkte:
+        maske &= tabelle['product'].isin(produkte).to_numpy()
+    if von is not None or bis is not None:
+        zeiten = tabelle['date'].to_numpy()
+        if von is not None:
+            maske &= zeiten >= np.datetime64(von)
+        if bis is not None:
+            maske &= zeiten < np.datetime64(bis)
+    return np.flatnonzero(maske)
+
+
+def _kategorienrang(spalte):
+    """Rang der Kategorie jeder Zeile als float, fehlende Werte als NaN
+
+    Die Kategorien sind nicht zwingend sortiert (add_categories hängt neue hinten
+    an), die Codes daher nicht direkt vergleichbar.
+    """
+    rang = np.argsort(np.argsort(spalte.cat.categories.to_numpy())).astype('float64')
+    # Code -1 (fehlender Wert) trifft das angehängte NaN
+    return np.append(rang, np.nan)[spalte.cat.codes.to_numpy()]
+
+
+def _sortierschluessel(spalte, absteigend):
+    """Numerischer Schlüssel, bei dem fehlende Werte immer am Ende landen"""
+    if spalte.dtype.name == 'category':
+        werte = _kategorienrang(spalte)
+    elif is_datetime64_dtype(spalte.dtype):
+        zeiten = spalte.to_numpy()
+        werte = np.where(np.isnat(zeiten), np.nan, zeiten.astype('int64').astype('float64'))
+    elif is_numeric_dtype(spalte.dtype):
+        werte = spalte.to_numpy(dtype='float64', na_value=np.nan)
+    else:
+        werte = _kategorienrang(spalte.astype('category'))
+
+    if absteigend:
+        werte = -werte
+    return np.where(np.isnan(werte), np.inf, werte)
+
+
+def hole_seite(tabelle, positionen, seite=0, seitengroesse=10, sortierung=None, absteigend=False):
+    """Liefert die Zeilen der angeforderten Seite (0-basiert) aus den gefilterten Positionen
+
+    Für vordere Seiten wird nur per argpartition vorsortiert statt alles zu sortieren.
+    """
+    start = seite * seitengroesse
+    ende = min(start + seitengroesse, len(positionen))
+    if start >= ende:
+        return tabelle.iloc[0:0]
+
+    if sortierung:
+        schluessel = _sortierschluessel(tabelle[sortierung], absteigend)[positionen]
+        if ende < len(positionen) // 2:
+            kandidaten = np.argpartition(schluessel, ende - 1)[:ende]
+            reihenfolge = kandidaten[np.argsort(schluessel[kandidaten], kind='stable')]
+        else:
+            reihenfolge = np.argsort(schluessel, kind='stable')
+        positionen = positionen[reihenfolge]
+
+    return tabelle.iloc[positionen[start:ende]]
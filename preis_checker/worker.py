@@ -0,0 +1,194 @@
+"""Hintergrund-Worker: ruft in jedem Takt die fälligen Produkte ab und schreibt in den Preisspeicher
+
+Wann ein Produkt fällig ist, entscheidet der adaptive Planer anhand seines eigenen Revisit-Intervalls
+und des Abrufbudgets; der Takt (--takt) legt nur fest, wie oft der Planer gefragt wird.
+
+Start: python -m preis_checker.worker [--takt SEKUNDEN] [--einmal [--nur-faellige]] [--metrics-port PORT]
+       (oder kurz: python -m preis_checker worker|scrape)
+"""
+import argparse
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from .alarme import DateiBenachrichtiger, WebhookBenachrichtiger, benachrichtige
+from .engine import scrape_parallel
+from .konfiguration import (
+    ABRUF_VERSUCHE, ALARM_PROTOKOLL, ALARM_WEBHOOK, BACKOFF_BASIS, DATEIPFAD, KOMPAKTIERUNG_AB, MAX_WORKER,
+    METRIKEN_JSON_PFAD, METRIKEN_PROM_PFAD, PLANER_TAKT, SPALTENPFAD, STATUSPFAD, TIMEZONE, WORKER_SPERRE,
+    ZYKLUS_FRIST, alle_produkte,
+)
+from .metriken import METRIKEN
+from .planer import Planer
+from .scraper import EINZELFLUG, HOST_LIMITER, SESSION_POOL, SICHERUNGEN, scrape_versuch
+from .speicher import (
+    hat_pyarrow, kompaktiere, lade_ausstehende_alarme, letzte_beobachtungen, markiere_zugestellt, schreibe_status, speichere_daten,
+    richte_ein, ungepackte_zeilen, verbuche_ausfaelle, werte_alarme_aus,
+)
+
+
+def sammle_preise(produkte, bei_fortschritt=None):
+    """Ruft alle Produkte parallel ab und liefert (Beobachtungen, {fehlgeschlagenes Produkt: Grund})"""
+    ausfaelle = {}
+    ergebnisse = scrape_parallel(
+        produkte,
+        scrape_versuch,
+        limiter=HOST_LIMITER,
+        max_worker=MAX_WORKER,
+        bei_fortschritt=bei_fortschritt,
+        einzelflug=EINZELFLUG,
+        versuche=ABRUF_VERSUCHE,
+        backoff_basis=BACKOFF_BASIS,
+        sicherungen=SICHERUNGEN,
+        frist=ZYKLUS_FRIST,
+        ausfaelle=ausfaelle
+    )
+
+    daten = []
+    for name in produkte:
+        produkt_daten = ergebnisse.get(name)
+        if produkt_daten:
+            produkt_daten['product'] = name
+            daten.append(produkt_daten)
+    return daten, {name: ausfaelle[name] for name in produkte if name in ausfaelle}
+
+
+def veraltete_werte(dateipfad, ausfaelle):
+    """Letzter bekannter Preis je veraltetem Produkt, markiert mit dem Ausfallgrund"""
+    letzte = letzte_beobachtungen(dateipfad, list(ausfaelle))
+    return {name: {**letzte.get(name, {}), 'grund': grund} for name, grund in ausfaelle.items()}
+
+
+@contextmanager
+def worker_sperre(pfad=WORKER_SPERRE):
+    """Exklusive Sperre für einen Worker-Prozess; liefert False, wenn schon einer läuft"""
+    try:
+        import fcntl
+    except ImportError:
+        # Ohne fcntl (Windows) wird nicht gesperrt
+        yield True
+        return
+
+    with open(pfad, 'a+') as datei:
+        try:
+            fcntl.flock(datei, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        datei.truncate(0)
+        datei.write(str(os.getpid()))
+        datei.flush()
+        yield True
+
+
+def benachrichtiger():
+    """Konfigurierte Zustellwege für Preisalarme"""
+    kanaele = [DateiBenachrichtiger(ALARM_PROTOKOLL)]
+    if ALARM_WEBHOOK:
+        kanaele.append(WebhookBenachrichtiger(ALARM_WEBHOOK))
+    return kanaele
+
+
+def aktualisiere(produkte=alle_produkte, dateipfad=DATEIPFAD, statuspfad=STATUSPFAD, planer=None):
+    """Führt einen Abrufzyklus für die übergebenen Produkte aus und liefert die Anzahl neuer Preise"""
+    start = time.monotonic()
+    # Vor der Auswertung laden, damit die Alarme dieses Zyklus nicht doppelt zugestellt werden
+    nachzuliefern = lade_ausstehende_alarme(dateipfad)
+    with METRIKEN.stoppe('stufe_sekunden', stufe='abruf'):
+        daten, ausfaelle = sammle_preise(produkte)
+    fehlgeschlagen = list(ausfaelle)
+    if planer:
+        planer.verbuche(daten, fehlgeschlagen)
+
+    # Veraltet bleibt ein Produkt bis zu seinem nächsten erfolgreichen Abruf, auch über Takte ohne Abruf hinweg
+    veraltet = verbuche_ausfaelle(dateipfad, ausfaelle, [eintrag['product'] for eintrag in daten])
+
+    # Duplikate (gleiches Produkt, gleicher Preis, gleicher Shop, gleicher Tag)
+    # werden vom eindeutigen Index des Speichers verworfen
+    neue_daten = speichere_daten(daten, dateipfad)
+
+    # Alarmregeln nur gegen die tatsächlich neuen Beobachtungen prüfen
+    ausgeloest = werte_alarme_aus(dateipfad, neue_daten)
+    if nachzuliefern:
+        METRIKEN.zaehle('alarme_nachgeliefert', len(nachzuliefern))
+    if nachzuliefern or ausgeloest:
+        markiere_zugestellt(dateipfad, benachrichtige(nachzuliefern + ausgeloest, benachrichtiger()))
+
+    # Parquet-Snapshot nur neu schreiben, wenn sich genug angesammelt hat
+    if neue_daten and SPALTENPFAD and hat_pyarrow():
+        if ungepackte_zeilen(dateipfad, SPALTENPFAD) >= KOMPAKTIERUNG_AB:
+            with METRIKEN.stoppe('stufe_sekunden', stufe='kompaktierung'):
+                kompaktiere(dateipfad, SPALTENPFAD)
+
+    dauer = time.monotonic() - start
+    METRIKEN.beobachte('zyklus_sekunden', dauer)
+    METRIKEN.setze('produkte_fehlgeschlagen', len(fehlgeschlagen))
+    METRIKEN.setze('letzter_zyklus_zeitstempel', time.time())
+
+    schreibe_status({
+        'letzte_aktualisierung': datetime.now(TIMEZONE).isoformat(),
+        'dauer_sekunden': round(dauer, 2),
+        'abgerufen': len(daten),
+        'neue_preise': len(neue_daten),
+        'alarme': len(ausgeloest),
+        'fehlgeschlagen': fehlgeschlagen,
+        # Produkte ohne aktuellen Preis: letzter gespeicherter Preis, damit das Dashboard ihn als veraltet zeigt
+        'veraltet': veraltete_werte(dateipfad, {name: grund for name, grund in veraltet.items()
+                                                if name in alle_produkte}),
+    }, statuspfad)
+
+    return len(neue_daten)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scrapt die Produkte des Katalogs im Hintergrund")
+    parser.add_argument("--takt", type=int, default=PLANER_TAKT,
+                        help="Sekunden zwischen zwei Planungsschritten")
+    parser.add_argument("--einmal", action="store_true",
+                        help="Alle Produkte des Katalogs einmal abrufen und beenden")
+    parser.add_argument("--nur-faellige", action="store_true",
+                        help="Mit --einmal nur die laut Planer fälligen Produkte abrufen")
+    parser.add_argument("--metrics-port", type=int,
+                        help="Metriken zusätzlich unter http://0.0.0.0:PORT/metrics anbieten")
+    args = parser.parse_args(argv)
+
+    with worker_sperre() as gesperrt:
+        if not gesperrt:
+            print(f"Es läuft bereits ein Worker (Sperre: {WORKER_SPERRE})")
+            return 1
+        if args.metrics_port:
+            METRIKEN.starte_http(args.metrics_port)
+        richte_ein(DATEIPFAD)
+        schleife(args)
+
+
+def schleife(args):
+    """Abrufschleife des Workers"""
+    planer = Planer(DATEIPFAD, takt=args.takt)
+    try:
+        while True:
+            zyklus_start = time.monotonic()
+            if args.einmal and not args.nur_faellige:
+                produkte = alle_produkte
+            else:
+                produkte = planer.faellige(alle_produkte)
+            if produkte:
+                try:
+                    neue = aktualisiere(produkte, planer=planer)
+                    print(f"{datetime.now():%d.%m.%Y %H:%M:%S} – {len(produkte)} abgerufen, "
+                          f"{neue} neue Preise gespeichert")
+                except Exception as e:
+                    METRIKEN.zaehle('zyklus_fehler')
+                    print(f"Fehler im Abrufzyklus: {e}")
+                METRIKEN.schreibe(METRIKEN_PROM_PFAD, METRIKEN_JSON_PFAD)
+
+            if args.einmal:
+                break
+            time.sleep(max(0.0, args.takt - (time.monotonic() - zyklus_start)))
+    finally:
+        SESSION_POOL.schliessen()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())